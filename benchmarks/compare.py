@@ -0,0 +1,52 @@
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+# Compares two benchmark result files and flags regressions.
+# Usage: python -m benchmarks.compare baseline.json current.json --threshold 0.2
+# Exits with status 1 if any benchmark got slower or used more memory than the threshold allows.
+
+DEFAULT_THRESHOLD = 0.2
+# Timings of very fast benchmarks are noisy, smaller slowdowns are never flagged
+MIN_SECONDS_DELTA = 0.001
+
+def load_results(file_path: str) -> Dict[Tuple[str, int], dict]:
+    with open(file_path, "r") as file:
+        data = json.load(file)
+    return {(result["benchmark"], result["size"]): result for result in data["results"]}
+
+# Returns (Benchmark, Size, Metric, Baseline, Current, Ratio) rows for every metric present in both files
+def compare_results(baseline: Dict[Tuple[str, int], dict], current: Dict[Tuple[str, int], dict]) -> List[tuple]:
+    rows = []
+    for key in sorted(baseline.keys() & current.keys()):
+        for metric in ["seconds", "peak_memory_bytes"]:
+            before, after = baseline[key][metric], current[key][metric]
+            ratio = after / before if before else float("inf") if after else 1.0
+            rows.append((key[0], key[1], metric, before, after, ratio))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two Quizly benchmark result files.")
+    parser.add_argument("baseline", help="Results of the reference run")
+    parser.add_argument("current", help="Results of the run to check")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown or memory growth, f.e. 0.2 for 20%%")
+    args = parser.parse_args()
+
+    regressions = 0
+    for benchmark, size, metric, before, after, ratio in compare_results(load_results(args.baseline), load_results(args.current)):
+        flag = ""
+        if metric == "seconds" and abs(after - before) < MIN_SECONDS_DELTA:
+            pass
+        elif ratio > 1 + args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "improved"
+        print(f"{benchmark:<28} {size:>10} {metric:<18} {before:>14.6g} -> {after:<14.6g} x{ratio:<7.2f} {flag}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%}.")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import csv
+import json
+import os
+import random
+from typing import Iterator
+from models.question import QUESTION_HEADERS, Question
+from models.question_statistics import QuestionStatistics
+from models.review_schedule import SECONDS_PER_DAY
+
+# Deterministic synthetic data for the benchmarks. The same size and seed always produce the same files.
+
+# Question k has the tag "chapter <k % TAG_COUNT>"
+TAG_COUNT = 100
+# Answered questions were last answered within LAST_ANSWERED_DAYS before this time
+GENERATED_AT = 1700000000.0
+LAST_ANSWERED_DAYS = 90
+
+WORDS = [
+    "capital", "river", "protocol", "theorem", "element", "planet", "author", "battle", "enzyme", "function",
+    "island", "language", "mountain", "network", "painting", "reaction", "symphony", "treaty", "vector", "volcano"
+]
+
+def generate_questions(count: int, seed: int = 0) -> Iterator[Question]:
+    rng = random.Random(seed)
+    for question_id in range(count):
+        title = f"What is the {rng.choice(WORDS)} of {rng.choice(WORDS)} {question_id}?"
+        answer = f"{rng.choice(WORDS)} {question_id}"
+        choices = [f"{rng.choice(WORDS)} {rng.randrange(count)}" for _ in range(2)] if rng.random() < 0.5 else None
+        tags = [f"chapter {question_id % TAG_COUNT}"]
+        yield Question(question_id, title.capitalize(), answer, enabled=rng.random() < 0.9, choices=choices, tags=tags)
+
+def generate_statistics(count: int, seed: int = 0) -> Iterator[QuestionStatistics]:
+    rng = random.Random(seed + 1)
+    for _ in range(count):
+        times_answered = rng.randrange(20)
+        times_answered_correctly = rng.randint(0, times_answered)
+        weight = round(rng.uniform(QuestionStatistics.MIN_WEIGHT, QuestionStatistics.MAX_WEIGHT), 2)
+        last_answered = GENERATED_AT - rng.randrange(LAST_ANSWERED_DAYS * SECONDS_PER_DAY) if times_answered else 0.0
+        yield QuestionStatistics(times_answered, times_answered_correctly, weight, last_answered)
+
+def write_questions(file_path: str, count: int, seed: int = 0) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as file:
+        writer = csv.DictWriter(file, QUESTION_HEADERS)
+        writer.writeheader()
+        writer.writerows(question.to_dict() for question in generate_questions(count, seed))
+
+def write_profiles(file_path: str, count: int) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as file:
+        writer = csv.DictWriter(file, ["id", "name"])
+        writer.writeheader()
+        writer.writerows({"id": profile_id, "name": f"profile {profile_id}"} for profile_id in range(count))
+
+# Writes one statistics row per question for the profile, in the per-profile statistics layout
+def write_profile_statistics(file_path: str, profile_id: int, count: int, seed: int = 0) -> None:
+    headers = ["profile_id", "question_id", "times_answered", "times_answered_correctly", "weight", "last_answered"]
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as file:
+        writer = csv.DictWriter(file, headers)
+        writer.writeheader()
+        writer.writerows(
+            statistics.to_dict(profile_id, question_id)
+            for question_id, statistics in enumerate(generate_statistics(count, seed + profile_id))
+        )
+
+# Writes answer records of the given profiles to random questions, about half of them correct
+def write_answer_sheets(file_path: str, question_count: int, answer_count: int, profile_count: int, seed: int = 0) -> None:
+    rng = random.Random(seed + 2)
+    answers = [question.answer for question in generate_questions(question_count, seed)]
+    with open(file_path, "w") as file:
+        for _ in range(answer_count):
+            question_id = rng.randrange(question_count)
+            answer = answers[question_id] if rng.random() < 0.5 else "wrong answer"
+            file.write(json.dumps({"profile": f"profile {rng.randrange(profile_count)}", "question_id": question_id, "answer": answer}) + "\n")
@@ -0,0 +1,340 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Callable, List
+from tabulate import tabulate
+from benchmarks import generator
+import helpers.csv_helper as csv_helper
+import helpers.question_helper as question_helper
+import helpers.statistics_helper as statistics_helper
+from helpers.table_helper import PAGE_SIZE
+from models.profile import Profile
+from models.question_bank import QuestionBank
+from models.question_aggregates import QuestionAggregates
+from models.review_schedule import SECONDS_PER_DAY, ReviewSchedule, ReviewState
+from models.weight_policy import WeightPolicy
+from repositories import csv_to_snapshot
+from repositories.csv_repository import CsvRepository
+from session import batch_grading, paper_generator, scripted_adapter
+
+# Times the hot paths on synthetic data and records peak memory.
+# Usage: python -m benchmarks.run --sizes 1000,100000 --output benchmark_results.json
+
+RESULTS_FILE_PATH = "benchmark_results.json"
+DEFAULT_SIZES = [1000, 10000, 100000]
+RANDOM_DRAWS = 10000
+ANALYTICS_PROFILES = 10
+REPLAYED_ANSWERS = 10000
+GRADED_PROFILES = 100
+GRADED_ANSWERS = 10000
+TEST_PAPERS = 1000
+TEST_PAPER_QUESTIONS = 20
+ANSWER_SHEETS_FILE_PATH = "answers.jsonl"
+# Tag of one in generator.TAG_COUNT questions, for the draws limited to a tag
+BENCHMARK_TAG = "chapter 7"
+# Word, two words and word prefix queries over the generated titles
+SEARCH_QUERIES = ["capital", "river of", "what is the volcano of isl", "sym"]
+
+@dataclass
+class Benchmark:
+    name: str
+    # Prepares the state for a run inside the data folder, not part of the measurement
+    setup: Callable[[int], Any]
+    run: Callable[[Any], Any]
+
+@dataclass
+class BenchmarkResult:
+    benchmark: str
+    size: int
+    seconds: float
+    peak_memory_bytes: int
+
+def _write_bank(size: int) -> None:
+    generator.write_questions(csv_helper.QUESTIONS_FILE_PATH, size)
+    generator.write_profiles(csv_helper.PROFILES_FILE_PATH, 2)
+    generator.write_profile_statistics(csv_helper.get_profile_statistics_file_path(1), 1, size)
+
+def _loaded_profile(size: int):
+    _write_bank(size)
+    profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}))
+    csv_helper.close_statistics_journal(profile)
+    return profile
+
+def _answered_profile(size: int):
+    # Saves only write once something changed, one answered question is enough to rewrite the file
+    profile = _loaded_profile(size)
+    profile.update_statistics(profile.question_statistics.question_ids[0], True)
+    return profile
+
+def _practice_state(size: int):
+    profile = _loaded_profile(size)
+    questions = csv_helper.load_question_bank()
+    profile.init_statistics(questions)
+    return profile, questions
+
+def _static_practice_state(size: int):
+    # Draws with the stored weights only, the baseline of the decayed draws of get_random_questions
+    profile = _loaded_profile(size)
+    questions = csv_helper.load_question_bank()
+    profile.init_statistics(questions, WeightPolicy())
+    return profile, questions
+
+def _tag_practice_state(size: int):
+    # The tag index and sampler are built on the first draw, not part of the measurement
+    profile, questions = _practice_state(size)
+    profile.tag_sampler(questions, BENCHMARK_TAG)
+    return profile, questions
+
+def _get_random_questions_tag(state) -> Any:
+    profile, questions = state
+    return [question_helper.get_random_questions(profile, questions, tag=BENCHMARK_TAG)[0] for _ in range(RANDOM_DRAWS)]
+
+def _load_questions(_) -> Any:
+    return csv_helper.load_questions()
+
+def _load_profile_statistics(_) -> Any:
+    profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}))
+    csv_helper.close_statistics_journal(profile)
+    return profile
+
+def _save_question_statistics(profile) -> None:
+    csv_helper.save_question_statistics(profile)
+
+def _get_random_questions(state) -> Any:
+    profile, questions = state
+    return [question_helper.get_random_questions(profile, questions)[0] for _ in range(RANDOM_DRAWS)]
+
+def _replay_state(size: int):
+    # Half of the recorded answers are correct, so both weight updates are exercised
+    profile, questions = _practice_state(size)
+    answers = []
+    for index, question in enumerate(question_helper.get_random_questions(profile, questions, REPLAYED_ANSWERS)):
+        answers.append((question.id, question.answer if index % 2 else "wrong answer"))
+    return profile, questions, answers
+
+def _replay_session(state) -> Any:
+    profile, questions, answers = state
+    return scripted_adapter.replay(profile, questions, answers)
+
+def _review_state(size: int):
+    # Half of the questions were reviewed before, with due times spread over a month
+    rng = random.Random(size)
+    states = {question_id: ReviewState(1, 1.0, 2.5, rng.uniform(0, 30 * SECONDS_PER_DAY)) for question_id in range(0, size, 2)}
+    schedule = ReviewSchedule(states)
+    schedule.start(range(size))
+    return schedule
+
+def _review_next_question(schedule) -> None:
+    now = 15 * SECONDS_PER_DAY
+    for _ in range(RANDOM_DRAWS):
+        schedule.review(schedule.next_question(now), True, now)
+
+def _analytics_state(size: int) -> None:
+    # `size` statistics rows spread over several profiles
+    question_count = max(1, size // ANALYTICS_PROFILES)
+    generator.write_profiles(csv_helper.PROFILES_FILE_PATH, ANALYTICS_PROFILES)
+    for profile_id in range(ANALYTICS_PROFILES):
+        generator.write_profile_statistics(csv_helper.get_profile_statistics_file_path(profile_id), profile_id, question_count, seed=profile_id)
+
+def _cross_profile_analytics(_) -> Any:
+    return QuestionAggregates.from_records(csv_helper.iter_question_statistics()).select(50)
+
+def _stored_analytics_state(size: int) -> None:
+    _analytics_state(size)
+    csv_helper.load_question_aggregates()
+
+# The aggregates kept up to date by saves, as the analytics command loads them
+def _stored_analytics(_) -> Any:
+    return csv_helper.load_question_aggregates().select(50)
+
+def _snapshot_state(size: int) -> None:
+    _write_bank(size)
+    csv_to_snapshot.convert_to_snapshots()
+
+def _cold_start(snapshot: bool) -> Callable[[Any], Any]:
+    # Everything a session loads before the first mode: the question bank and the profile statistics
+    def run(_) -> Any:
+        questions = csv_helper.load_question_bank(snapshot=snapshot)
+        profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}), snapshot)
+        csv_helper.close_statistics_journal(profile)
+        return questions, profile
+    return run
+
+def _search_state(size: int):
+    # The index is built once, like on the first search of a session
+    _write_bank(size)
+    questions = csv_helper.load_question_bank()
+    questions.index
+    return questions
+
+def _search_questions(questions) -> Any:
+    return [question_helper.search_questions(questions, query) for query in SEARCH_QUERIES]
+
+def _grading_state(size: int):
+    # `size` questions and `size` answers of GRADED_PROFILES profiles
+    _write_bank(size)
+    generator.write_answer_sheets(ANSWER_SHEETS_FILE_PATH, size, size, GRADED_PROFILES)
+    return csv_helper.load_question_bank()
+
+def _grade_answer_sheets(workers: int) -> Callable[[Any], Any]:
+    # 0 workers uses one per CPU
+    def run(questions) -> Any:
+        return batch_grading.grade_answer_sheets(CsvRepository(), questions, ANSWER_SHEETS_FILE_PATH, workers)
+    return run
+
+def _answers_state(size: int):
+    # Answers of two generated words, so longer ones accept typos. A quarter each is exact, differs in case,
+    # spacing and punctuation, has a typo or is wrong
+    rng = random.Random(size)
+    questions = QuestionBank(
+        replace(question, answer=" ".join(rng.sample(generator.WORDS, 2))) for question in generator.generate_questions(size)
+    )
+    variants = [
+        lambda answer: answer,
+        lambda answer: f"  {answer.upper()}. ",
+        lambda answer: answer[:2] + answer[3] + answer[2] + answer[4:],
+        lambda _: "wrong answer"
+    ]
+    answers = []
+    for _ in range(GRADED_ANSWERS):
+        question = questions.get(rng.randrange(size))
+        answers.append((question.id, rng.choice(variants)(question.answer)))
+    return questions, answers
+
+def _grade_answers_exact(state) -> Any:
+    # The comparison used before answers were matched, as a baseline
+    questions, answers = state
+    return sum(answer.strip().lower() == questions.get(question_id).answer.lower() for question_id, answer in answers)
+
+def _grade_answers_matcher_state(size: int):
+    # Matchers are built on first use, a session has them cached after its first answer to every question
+    questions, answers = _answers_state(size)
+    for question_id, _ in answers:
+        questions.answer_matcher(question_id)
+    return questions, answers
+
+def _grade_answers_matcher(state) -> Any:
+    questions, answers = state
+    return sum(questions.answer_matcher(question_id).matches(answer) for question_id, answer in answers)
+
+def _draw_test_papers(state) -> Any:
+    # The draw of Test Mode, one paper at a time
+    _, questions = state
+    rng = random.Random(0)
+    return [question_helper.sample_enabled_ids(questions, TEST_PAPER_QUESTIONS, rng) for _ in range(TEST_PAPERS)]
+
+def _draw_test_papers_tag(state) -> Any:
+    _, questions = state
+    rng = random.Random(0)
+    count = min(TEST_PAPER_QUESTIONS, questions.tag_enabled_count(BENCHMARK_TAG))
+    return [question_helper.sample_enabled_ids(questions, count, rng, BENCHMARK_TAG) for _ in range(TEST_PAPERS)]
+
+def _generate_papers(state) -> Any:
+    _, questions = state
+    return paper_generator.generate_papers(questions, TEST_PAPERS, TEST_PAPER_QUESTIONS, 0)
+
+def _view_statistics(state) -> str:
+    # The non-interactive part of the statistics view: selecting the worst questions and rendering the first page
+    profile, questions = state
+    rows = statistics_helper.select_statistics(profile, questions, limit=50)
+    page = []
+    for row in rows[:PAGE_SIZE]:
+        q = questions.get(row.question_id)
+        page.append([q.id, q.title, q.answer, q.enabled, row.attempts, round(row.weight, 2), round(row.score)])
+    return tabulate(page, tablefmt="grid")
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("load_questions", _write_bank, _load_questions),
+    Benchmark("load_profile_statistics", _write_bank, _load_profile_statistics),
+    Benchmark("save_question_statistics", _answered_profile, _save_question_statistics),
+    Benchmark("get_random_questions", _practice_state, _get_random_questions),
+    Benchmark("get_random_questions_static", _static_practice_state, _get_random_questions),
+    Benchmark("get_random_questions_tag", _tag_practice_state, _get_random_questions_tag),
+    Benchmark("replay_session", _replay_state, _replay_session),
+    Benchmark("review_next_question", _review_state, _review_next_question),
+    Benchmark("view_statistics", _practice_state, _view_statistics),
+    Benchmark("search_questions", _search_state, _search_questions),
+    Benchmark("cold_start_csv", _write_bank, _cold_start(False)),
+    Benchmark("cold_start_snapshot", _snapshot_state, _cold_start(True)),
+    Benchmark("cross_profile_analytics", _analytics_state, _cross_profile_analytics),
+    Benchmark("stored_analytics", _stored_analytics_state, _stored_analytics),
+    Benchmark("grade_answer_sheets_1_worker", _grading_state, _grade_answer_sheets(1)),
+    Benchmark("grade_answer_sheets", _grading_state, _grade_answer_sheets(0)),
+    Benchmark("draw_test_papers", _practice_state, _draw_test_papers),
+    Benchmark("draw_test_papers_tag", _tag_practice_state, _draw_test_papers_tag),
+    Benchmark("generate_papers", _practice_state, _generate_papers),
+    Benchmark("grade_answers_exact", _answers_state, _grade_answers_exact),
+    Benchmark("grade_answers_matcher", _grade_answers_matcher_state, _grade_answers_matcher),
+]
+
+def measure(benchmark: Benchmark, size: int, repeat: int) -> BenchmarkResult:
+    # Every benchmark runs in its own data folder, the best of `repeat` timings is kept.
+    # Peak memory is measured in a separate run, since tracing slows the code down.
+    folder_path = tempfile.mkdtemp(prefix="quizly_benchmark_")
+    working_directory = os.getcwd()
+    os.chdir(folder_path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            best = float("inf")
+            for _ in range(repeat):
+                state = benchmark.setup(size)
+                start = time.perf_counter()
+                benchmark.run(state)
+                best = min(best, time.perf_counter() - start)
+
+            state = benchmark.setup(size)
+            tracemalloc.start()
+            benchmark.run(state)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        os.chdir(working_directory)
+        shutil.rmtree(folder_path)
+
+    return BenchmarkResult(benchmark.name, size, best, peak_memory)
+
+def run_benchmarks(sizes: List[int], names: List[str], repeat: int) -> List[BenchmarkResult]:
+    results = []
+    for size in sizes:
+        for benchmark in BENCHMARKS:
+            if names and benchmark.name not in names:
+                continue
+            result = measure(benchmark, size, repeat)
+            print(f"{result.benchmark:<28} {result.size:>10} rows {result.seconds * 1000:>12.2f} ms {result.peak_memory_bytes / 1024 / 1024:>10.2f} MiB")
+            results.append(result)
+    return results
+
+def write_results(results: List[BenchmarkResult], file_path: str) -> None:
+    with open(file_path, "w") as file:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "results": [asdict(result) for result in results]
+        }, file, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Quizly hot paths on synthetic data.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma separated row counts, f.e. 1000,10000000")
+    parser.add_argument("--only", default="", help="Comma separated benchmark names, all benchmarks by default")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark, the best one is kept")
+    parser.add_argument("--output", default=RESULTS_FILE_PATH, help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    names = [name for name in args.only.split(",") if name]
+    results = run_benchmarks(sizes, names, max(args.repeat, 1))
+    write_results(results, args.output)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Tuple
+from benchmarks import generator
+import helpers.csv_helper as csv_helper
+from enums.mode import ModeEnum
+
+# Times how long quizly.py takes until the mode menu is shown, and until it quit again,
+# on generated data folders. Imports are measured with -X importtime in the same run.
+# Usage: python -m benchmarks.startup --sizes 1000,1000000 --output startup_results.json
+
+RESULTS_FILE_PATH = "startup_results.json"
+DEFAULT_SIZES = [1000, 100000, 1000000]
+QUIZLY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quizly.py")
+MENU_PROMPT = b"Mode ("
+SLOWEST_IMPORTS = 5
+
+@dataclass
+class StartupResult:
+    size: int
+    menu_seconds: float # Until the mode menu asks for input
+    quit_seconds: float # Until the process exited after quitting from the menu
+    import_seconds: float # Sum of the top level imports
+    # List structure: [(Module, Seconds)], the slowest top level imports
+    slowest_imports: List[Tuple[str, float]] = field(default_factory=list)
+
+def _write_data(folder_path: str, size: int) -> None:
+    generator.write_questions(os.path.join(folder_path, csv_helper.QUESTIONS_FILE_PATH), size)
+    generator.write_profiles(os.path.join(folder_path, csv_helper.PROFILES_FILE_PATH), 1)
+    generator.write_profile_statistics(os.path.join(folder_path, csv_helper.get_profile_statistics_file_path(0)), 0, size)
+
+def parse_import_times(output: str) -> List[Tuple[str, float]]:
+    # Lines look like "import time: self [us] | cumulative | name", nested imports are indented further
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1_000_000))
+    return imports
+
+def measure_startup(python: str, folder_path: str, size: int) -> StartupResult:
+    with tempfile.TemporaryFile() as errors:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [python, "-X", "importtime", QUIZLY_PATH, "--autosave-interval", "0"],
+            cwd=folder_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"}
+        )
+        output = b""
+        while MENU_PROMPT not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                process.wait()
+                errors.seek(0)
+                raise RuntimeError(f"quizly.py exited before showing the menu:\n{errors.read().decode()}")
+            output += chunk
+        menu_seconds = time.perf_counter() - start
+
+        process.communicate(f"{ModeEnum.QUIT.value}\n".encode())
+        quit_seconds = time.perf_counter() - start
+        errors.seek(0)
+        imports = parse_import_times(errors.read().decode())
+
+    slowest = sorted(imports, key=lambda item: item[1], reverse=True)[:SLOWEST_IMPORTS]
+    return StartupResult(size, menu_seconds, quit_seconds, sum(seconds for _, seconds in imports), slowest)
+
+def run_startup(python: str, sizes: List[int], repeat: int) -> List[StartupResult]:
+    # The best of `repeat` runs is kept, by time until the menu is shown
+    results = []
+    for size in sizes:
+        folder_path = tempfile.mkdtemp(prefix="quizly_startup_")
+        try:
+            _write_data(folder_path, size)
+            result = min((measure_startup(python, folder_path, size) for _ in range(repeat)), key=lambda result: result.menu_seconds)
+        finally:
+            shutil.rmtree(folder_path)
+
+        slowest = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in result.slowest_imports[:3])
+        print(f"{result.size:>10} rows  menu {result.menu_seconds * 1000:>9.1f} ms  quit {result.quit_seconds * 1000:>9.1f} ms  imports {result.import_seconds * 1000:>7.1f} ms ({slowest})")
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Quizly startup on generated data.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma separated question counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size, the fastest one is kept")
+    parser.add_argument("--python", default=sys.executable, help="Python interpreter that runs quizly.py")
+    parser.add_argument("--output", default=RESULTS_FILE_PATH, help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run_startup(args.python, sizes, max(args.repeat, 1))
+    with open(args.output, "w") as file:
+        json.dump({
+            "python": args.python,
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "results": [asdict(result) for result in results]
+        }, file, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,6 @@ class ModeEnum(Enum):
     PRACTICE_MODE = 4
     TEST_MODE = 5
     SELECT_PROFILE = 6
-    QUIT = 7
\ No newline at end of file
+    SPACED_REPETITION_MODE = 7
+    SEARCH_QUESTIONS = 8
+    QUIT = 9
\ No newline at end of file
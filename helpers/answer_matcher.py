@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from typing import Iterable, Optional, Tuple
+from models.question import Question
+
+# Free-form answers are compared by normalized keys, which ignore case, accents, punctuation around words and repeated whitespace.
+# Longer answers also accept a few typos, counted as inserted, deleted, replaced or swapped neighbouring characters.
+# Quiz answers and answers containing digits have to match their key exactly.
+
+# Keys up to this length accept no typos, up to LONG_ANSWER_LENGTH one and longer keys MAX_TYPOS
+SHORT_ANSWER_LENGTH = 4
+LONG_ANSWER_LENGTH = 8
+MAX_TYPOS = 2
+
+# Stripped from both ends of every word, f.e. in "Paris." or "(Paris)". Characters inside words count, like in "3.14" or "C++",
+# except apostrophes. Other Unicode punctuation is treated like an apostrophe
+EDGE_PUNCTUATION = "!\"'(),.:;?[]{}"
+_APOSTROPHES = str.maketrans("", "", "'")
+# Anything a stripped and lowered ASCII answer still has to be cleaned of: punctuation, repeated or other whitespace
+_NEEDS_CLEANUP = re.compile(f"[{re.escape(EDGE_PUNCTUATION)}]|\\s\\s|[^\\S ]")
+
+# Keys structure: ((Key, AcceptedTypos), ...), one per accepted answer
+MatcherKeys = Tuple[Tuple[str, int], ...]
+_DIGIT = re.compile(r"\d")
+
+def normalize_answer(answer: str) -> str:
+    # Most answers are typed as plain ASCII words, those are returned without splitting them
+    if answer.isascii():
+        key = answer.strip().lower()
+        if _NEEDS_CLEANUP.search(key) is None:
+            return key
+        # Already lowered, only apostrophes and the punctuation around words are left to remove
+        words = (word.strip(EDGE_PUNCTUATION) for word in key.replace("'", "").split())
+        return " ".join(word for word in words if word)
+
+    answer = "".join(
+        "'" if not character.isascii() and unicodedata.category(character).startswith("P") else character
+        for character in unicodedata.normalize("NFKD", answer)
+        if not unicodedata.combining(character)
+    )
+    words = (word.strip(EDGE_PUNCTUATION) for word in answer.translate(_APOSTROPHES).casefold().split())
+    return " ".join(word for word in words if word)
+
+def accepted_typos(key: str) -> int:
+    if len(key) <= SHORT_ANSWER_LENGTH or _DIGIT.search(key):
+        return 0
+    return 1 if len(key) <= LONG_ANSWER_LENGTH else MAX_TYPOS
+
+def within_distance(first: str, second: str, max_distance: int) -> bool:
+    # Optimal string alignment distance, only the cells within max_distance of the diagonal are computed.
+    # Stops as soon as a whole row is over max_distance
+    if abs(len(first) - len(second)) > max_distance:
+        return False
+    if first == second:
+        return True
+    # Every typo adds or removes at most two distinct characters, texts whose characters differ more are too far apart
+    if len(set(first).symmetric_difference(second)) > 2 * max_distance:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    # Typos are usually in one place, the common start and end of the texts do not change the distance
+    start = _common_prefix_length(first, second, len(first))
+    end = _common_prefix_length(first[::-1], second[::-1], len(first) - start)
+    first, second = first[start:len(first) - end], second[start:len(second) - end]
+    # No distance is longer than the longer text, f.e. after swapped neighbours only the two swapped characters are left
+    if len(second) <= max_distance:
+        return True
+
+    over = max_distance + 1
+    width = len(second) + 1
+    before_previous = None
+    previous = [column if column <= max_distance else over for column in range(width)]
+    for row in range(1, len(first) + 1):
+        current = [over] * width
+        current[0] = row if row <= max_distance else over
+        row_min = current[0]
+        character = first[row - 1]
+        for column in range(max(1, row - max_distance), min(len(second), row + max_distance) + 1):
+            value = previous[column - 1] + (character != second[column - 1])
+            if previous[column] + 1 < value:
+                value = previous[column] + 1
+            if current[column - 1] + 1 < value:
+                value = current[column - 1] + 1
+            if (row > 1 and column > 1 and character == second[column - 2] and first[row - 2] == second[column - 1]
+                    and before_previous[column - 2] + 1 < value):
+                value = before_previous[column - 2] + 1
+            current[column] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return False
+        before_previous, previous = previous, current
+    return previous[-1] <= max_distance
+
+# Compares halves of the texts instead of single characters, `limit` is at most the length of the shorter text
+def _common_prefix_length(first: str, second: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def build_keys(answers: Iterable[str], fuzzy: bool = True, max_typos: Optional[int] = None) -> MatcherKeys:
+    keys = {}
+    for answer in answers:
+        # Answers made of punctuation only are compared as they are
+        key = normalize_answer(answer) or answer.strip().casefold()
+        if key and key not in keys:
+            keys[key] = (accepted_typos(key) if max_typos is None else max_typos) if fuzzy else 0
+    return tuple(keys.items())
+
+def match_keys(keys: MatcherKeys, answer: str) -> bool:
+    # Answers typed exactly like a key are not normalized
+    for key, _ in keys:
+        if answer == key:
+            return True
+    answer_key = normalize_answer(answer) or answer.strip().casefold()
+    for key, _ in keys:
+        if answer_key == key:
+            return True
+    # The distance is only computed for keys whose length is within their accepted typos
+    length = len(answer_key)
+    for key, typos in keys:
+        if typos and abs(length - len(key)) <= typos and within_distance(answer_key, key, typos):
+            return True
+    return False
+
+class AnswerMatcher:
+    # Normalized keys of a question's answer and aliases, computed once and kept by the question bank
+
+    __slots__ = ("keys",)
+
+    def __init__(self, keys: MatcherKeys) -> None:
+        self.keys = keys
+
+    @classmethod
+    def for_question(cls, question: Question, max_typos: Optional[int] = None) -> "AnswerMatcher":
+        # Choices of a quiz can be close to each other, so they are never matched with typos
+        return cls(build_keys([question.answer, *(question.aliases or [])], not question.is_quiz(), max_typos))
+
+    def matches(self, answer: str) -> bool:
+        return match_keys(self.keys, answer)
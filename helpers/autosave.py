@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Callable, Optional, Tuple
+from models.profile import Profile
+from models.question_bank import QuestionBank
+
+# Seconds of unsaved changes at most, and seconds without changes before saving early
+AUTOSAVE_INTERVAL = 30.0
+AUTOSAVE_DEBOUNCE = 2.0
+
+class AutosaveWorker(threading.Thread):
+    # Background thread that saves the watched question bank and profile after they change.
+    # A save happens once no change came in for `debounce` seconds, but never later than
+    # `interval` seconds after the first unsaved change, so a crash loses at most one interval.
+
+    def __init__(
+        self,
+        save: Callable[[QuestionBank, Profile], None],
+        interval: float = AUTOSAVE_INTERVAL,
+        debounce: float = AUTOSAVE_DEBOUNCE
+    ) -> None:
+        super().__init__(name="autosave", daemon=True)
+        self.save = save
+        self.interval = interval
+        self.debounce = min(debounce, interval)
+        self._condition = threading.Condition()
+        self._targets: Optional[Tuple[QuestionBank, Profile]] = None
+        self._first_change: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._stopped = False
+
+    def watch(self, questions: QuestionBank, profile: Profile) -> None:
+        # Pending changes of the previous profile are saved before switching
+        self.flush()
+        with self._condition:
+            if self._targets:
+                self._targets[0].on_change = None
+                self._targets[1].listeners.remove(self._on_answer)
+            questions.on_change = self.notify
+            profile.listeners.append(self._on_answer)
+            self._targets = (questions, profile)
+
+    def notify(self) -> None:
+        with self._condition:
+            self._last_change = time.monotonic()
+            if self._first_change is None:
+                self._first_change = self._last_change
+            self._condition.notify()
+
+    def _on_answer(self, *_) -> None:
+        self.notify()
+
+    def flush(self) -> None:
+        with self._condition:
+            targets = self._targets
+            self._first_change = self._last_change = None
+        if targets:
+            self._save(targets)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
+
+    def run(self) -> None:
+        with self._condition:
+            while not self._stopped:
+                if self._first_change is None:
+                    self._condition.wait()
+                    continue
+
+                deadline = min(self._last_change + self.debounce, self._first_change + self.interval)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+
+                self._first_change = self._last_change = None
+                targets = self._targets
+                # Changes made during the save schedule the next one
+                self._condition.release()
+                try:
+                    self._save(targets)
+                finally:
+                    self._condition.acquire()
+
+    def _save(self, targets: Tuple[QuestionBank, Profile]) -> None:
+        try:
+            self.save(*targets)
+        except OSError as e:
+            print(f"Autosave failed: {e}")
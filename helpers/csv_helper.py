@@ -1,39 +1,94 @@
 import csv
 import os
-from typing import List
-print(os.getcwd())
-from models.question_statistics import QuestionStatistics
+import re
+import shutil
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.statistics_store import StatisticsStore
+from models.question_aggregates import QuestionAggregates
+from models.review_schedule import ReviewSchedule, ReviewState
 from models.profile import Profile
-from models.question import Question
+from models.question import LEGACY_QUESTION_HEADERS, QUESTION_HEADERS, Question
+from models.question_bank import QuestionBank
+from helpers.lazy_question_bank import LazyQuestionBank
+from helpers.file_lock import locked, try_lock_file
+from helpers.statistics_journal import JournalLockedError, StatisticsJournal, read_journal_changes
 
 QUESTIONS_FILE_PATH = "data/questions.csv"
+# Binary snapshots used instead of the CSV files when snapshots are enabled, see helpers/snapshot.py
+QUESTIONS_SNAPSHOT_FILE_PATH = "data/questions.snapshot"
+# Legacy single file with statistics of every profile, migrated into QUESTIONS_STATISTICS_DIR_PATH
 QUESTIONS_STATISTICS_FILE_PATH = "data/questions_statistics.csv"
+# Statistics are stored in one file per profile, so loading and saving only touches that profile's rows
+QUESTIONS_STATISTICS_DIR_PATH = "data/statistics"
 PROFILES_FILE_PATH = "data/profiles.csv"
+STATISTICS_HEADERS = ["profile_id", "question_id", "times_answered", "times_answered_correctly", "weight", "last_answered"]
+# Statistics files written before the last answered time existed
+LEGACY_STATISTICS_HEADERS = [STATISTICS_HEADERS[:-1]]
+REVIEW_HEADERS = ["profile_id", "question_id", "repetitions", "interval", "ease", "due"]
+# Per-question totals over the statistics of every profile, see models/question_aggregates.py.
+# Stored next to the statistics with the version of every profile's statistics they include
+AGGREGATES_HEADERS = ["question_id", "learners", "attempts", "correct", "weight_sum", "weight_histogram"]
+AGGREGATE_VERSIONS_HEADERS = ["profile_id", "inode", "modified_time", "size"]
+# Processes sharing the data folder lock a data file while changing it, see helpers/file_lock.py.
+# Questions and profiles are locked through QUESTIONS_FILE_PATH and PROFILES_FILE_PATH,
+# statistics through the profile's statistics CSV path, which also covers its snapshot
+
+# Journals of loaded profiles are named after the process and a counter, f.e. profile_0.1234-0.journal
+_journal_owners = count()
 
 def validate_file(file_path: str, expected_headers: List[str]) -> bool:
     folder_path = os.path.dirname(file_path)
     if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
+        os.makedirs(folder_path, exist_ok=True)
     
-    file_exists = os.path.exists(file_path)
-    if file_exists:
-        with open(file_path, "r") as file:
-            reader = csv.reader(file)
-            first_line = next(reader, None)
-            
-            if first_line == expected_headers:
-                return True
-    
-    with open(file_path, "w") as file:
-        writer = csv.writer(file)
-        writer.writerow(expected_headers)
+    with locked(file_path):
+        file_exists = os.path.exists(file_path)
+        if file_exists:
+            with open(file_path, "r") as file:
+                reader = csv.reader(file)
+                first_line = next(reader, None)
+                
+                if first_line == expected_headers:
+                    return True
+        
+        with open(file_path, "w") as file:
+            writer = csv.writer(file)
+            writer.writerow(expected_headers)
     
     return False
 
+# Questions files of earlier versions are upgraded to the current columns instead of being reset.
+# Their rows are kept as they are, rows without the aliases or tags column are read without aliases or tags
+def validate_questions_file() -> bool:
+    return _validate_upgradable_file(QUESTIONS_FILE_PATH, QUESTION_HEADERS, LEGACY_QUESTION_HEADERS)
+
+# Same for statistics files, rows without the last answered column are read as never answered
+def validate_statistics_file(file_path: str) -> bool:
+    return _validate_upgradable_file(file_path, STATISTICS_HEADERS, LEGACY_STATISTICS_HEADERS)
+
+def _validate_upgradable_file(file_path: str, headers: List[str], legacy_headers: List[List[str]]) -> bool:
+    with locked(file_path):
+        if os.path.exists(file_path):
+            with open(file_path, "r", newline="") as file:
+                first_line = next(csv.reader(file), None)
+            if first_line in legacy_headers:
+                _upgrade_file_headers(file_path, headers)
+        return validate_file(file_path, headers)
+
+def _upgrade_file_headers(file_path: str, headers: List[str]) -> None:
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w") as file:
+        csv.writer(file).writerow(headers)
+    with open(file_path, "rb") as source, open(temp_file_path, "ab") as target:
+        source.readline()
+        shutil.copyfileobj(source, target)
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(temp_file_path, file_path)
+
 def load_questions() -> List[Question]:
-    headers = ["id", "title", "answer", "enabled", "choices"]
-    
-    if not validate_file(QUESTIONS_FILE_PATH, headers):
+    if not validate_questions_file():
         return []
     
     questions = []
@@ -42,51 +97,78 @@ def load_questions() -> List[Question]:
         
         for line in reader:
             try:
-                choices = line["choices"].split("|") if line["choices"] else []
-                questions.append(Question(
-                    id = int(line["id"]), 
-                    title = line["title"], 
-                    answer = line["answer"], 
-                    enabled = line["enabled"] == 'True',
-                    choices = choices
-                ))
+                questions.append(Question.from_dict(line))
             except ValueError:
-                print(f"Invalid id found: {line[0]}. Skipping question.")
+                print(f"Invalid id found: {line['id']}. Skipping question.")
             except IndexError:
                 print(f"Skipping incomplete line: {line}.")
     
     return questions
 
+# Lazy banks read questions from the file on demand instead of loading the whole file.
+# Snapshot banks do the same over the questions snapshot, which is created from the CSV file on first use
+def load_question_bank(lazy: bool = False, snapshot: bool = False) -> QuestionBank:
+    if snapshot:
+        # Snapshots, with mmap and zlib, are only imported while --snapshots is given
+        from helpers.snapshot import SnapshotQuestionBank, write_questions_snapshot
+        with locked(QUESTIONS_FILE_PATH):
+            if not os.path.exists(QUESTIONS_SNAPSHOT_FILE_PATH):
+                write_questions_snapshot(QUESTIONS_SNAPSHOT_FILE_PATH, load_questions())
+            return SnapshotQuestionBank(QUESTIONS_SNAPSHOT_FILE_PATH)
+    
+    if lazy:
+        validate_questions_file()
+        return LazyQuestionBank(QUESTIONS_FILE_PATH)
+    
+    questions = QuestionBank(load_questions())
+    questions.mark_saved()
+    return questions
+
+# If another process took the profile's id in the meantime, the profile gets the next free id
 def create_new_profile(profile: Profile) -> bool:
     headers = ["id", "name"]
     
-    validate_file(PROFILES_FILE_PATH, headers)
-    
-    with open(PROFILES_FILE_PATH) as file:
-        reader = csv.DictReader(file)
-        for line in reader:
-            if line["name"] == profile.name:
-                print(f"Profile with name {profile.name} already exists!")
-                return False
+    with locked(PROFILES_FILE_PATH):
+        validate_file(PROFILES_FILE_PATH, headers)
         
-    with open(PROFILES_FILE_PATH, "a") as file:
-        writer = csv.DictWriter(file, headers)
+        max_id = -1
+        id_taken = False
+        with open(PROFILES_FILE_PATH) as file:
+            reader = csv.DictReader(file)
+            for line in reader:
+                if line["name"] == profile.name:
+                    print(f"Profile with name {profile.name} already exists!")
+                    return False
+                try:
+                    max_id = max(max_id, int(line["id"]))
+                    id_taken = id_taken or int(line["id"]) == profile.id
+                except ValueError:
+                    continue
         
-        new_profile = {
-            "id": profile.id,
-            "name": profile.name
-        }
-        writer.writerow(new_profile)
+        if id_taken:
+            profile.id = max_id + 1
+        
+        with open(PROFILES_FILE_PATH, "a") as file:
+            writer = csv.DictWriter(file, headers)
+            
+            new_profile = {
+                "id": profile.id,
+                "name": profile.name
+            }
+            writer.writerow(new_profile)
+            file.flush()
+            os.fsync(file.fileno())
     
     return True
 
-def load_profile_with_statistics(profile_name: str) -> Profile:
+def load_profile_with_statistics(profile_name: str, snapshot: bool = False) -> Profile:
     headers = ["id", "name"]
-    default_profile = Profile("0", "default", {})
+    default_profile = Profile(0, "default", {})
     # If profile file has not been created or is invalid, correct it and return a default profile
-    if not validate_file(PROFILES_FILE_PATH, headers):
-        create_new_profile(default_profile)
-        return default_profile
+    with locked(PROFILES_FILE_PATH):
+        if not validate_file(PROFILES_FILE_PATH, headers):
+            create_new_profile(default_profile)
+            return load_profile_statistics(default_profile, snapshot)
     
     profile_id = None
     with open(PROFILES_FILE_PATH, "r") as file:
@@ -103,39 +185,196 @@ def load_profile_with_statistics(profile_name: str) -> Profile:
     
     # If profile was not found, return default profile
     if profile_id == None:
-        return default_profile
+        return load_profile_statistics(default_profile, snapshot)
+
+    return load_profile_statistics(Profile(profile_id, profile_name, {}), snapshot)
+
+def get_profile_statistics_file_path(profile_id: int) -> str:
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, f"profile_{profile_id}.csv")
 
-    return load_profile_statistics(Profile(profile_id, profile_name, {}))
+def get_profile_snapshot_file_path(profile_id: int) -> str:
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, f"profile_{profile_id}.snapshot")
 
-def load_profile_statistics(profile: Profile) -> Profile:
-    headers = ["profile_id", "question_id", "times_answered", "times_answered_correctly", "weight"]
+# Without an owner, returns the path of the single journal used by earlier versions
+def get_profile_journal_file_path(profile_id: int, owner: str = "") -> str:
+    file_name = f"profile_{profile_id}.{owner}.journal" if owner else f"profile_{profile_id}.journal"
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, file_name)
+
+# Returns (FilePath, IsLegacy) of every journal of the profile, including journals of running processes.
+# The legacy journal comes first, it holds counts that the other journals' changes are added to
+def find_profile_journals(profile_id: int) -> List[Tuple[str, bool]]:
+    if not os.path.isdir(QUESTIONS_STATISTICS_DIR_PATH):
+        return []
     
-    if not validate_file(QUESTIONS_STATISTICS_FILE_PATH, headers):
-        return Profile(profile.id, profile.name, {})
+    journals = []
+    for file_name in sorted(os.listdir(QUESTIONS_STATISTICS_DIR_PATH)):
+        match = re.fullmatch(rf"profile_{profile_id}(\.[\w-]+)?\.journal", file_name)
+        if match:
+            journals.append((os.path.join(QUESTIONS_STATISTICS_DIR_PATH, file_name), match.group(1) is None))
+    return sorted(journals, key=lambda journal: not journal[1])
+
+def get_profile_review_file_path(profile_id: int) -> str:
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, f"profile_{profile_id}.reviews.csv")
+
+# Also locks the aggregate versions file
+def get_aggregates_file_path() -> str:
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, "aggregates.csv")
+
+def get_aggregate_versions_file_path() -> str:
+    return os.path.join(QUESTIONS_STATISTICS_DIR_PATH, "aggregates.versions.csv")
+
+def load_review_schedule(profile: Profile) -> ReviewSchedule:
+    file_path = get_profile_review_file_path(profile.id)
+    states = {}
+    if os.path.exists(file_path) and validate_file(file_path, REVIEW_HEADERS):
+        with open(file_path, "r") as file:
+            reader = csv.DictReader(file)
+            for line in reader:
+                try:
+                    states[int(line["question_id"])] = ReviewState(
+                        int(line["repetitions"]),
+                        float(line["interval"]),
+                        float(line["ease"]),
+                        float(line["due"])
+                    )
+                except ValueError:
+                    print(f"Failed to convert data for review line: {line}")
+                except KeyError:
+                    print(f"Missing data in line: {line}")
+    return ReviewSchedule(states)
+
+def save_review_schedule(profile: Profile, schedule: ReviewSchedule) -> None:
+    if not schedule.dirty_ids:
+        return
     
-    # Load the question statistics 
-    question_statistics = {}
-    with open(QUESTIONS_STATISTICS_FILE_PATH, "r") as file:
-        reader = csv.DictReader(file)
-        for line in reader:
+    file_path = get_profile_review_file_path(profile.id)
+    with locked(file_path):
+        validate_file(file_path, REVIEW_HEADERS)
+        temp_file_path = file_path + ".tmp"
+        with open(temp_file_path, "w") as file:
+            writer = csv.DictWriter(file, REVIEW_HEADERS)
+            writer.writeheader()
+            writer.writerows(state.to_dict(profile.id, question_id) for question_id, state in schedule.states.items())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_path, file_path)
+    schedule.dirty_ids.clear()
+
+# Loads the stored statistics and attaches a new journal to the profile. Journals left behind by stopped
+# processes are merged into the stored statistics first. With snapshots enabled, the binary snapshot
+# is used once it exists and the CSV file until then
+def load_profile_statistics(profile: Profile, snapshot: bool = False) -> Profile:
+    with locked(get_profile_statistics_file_path(profile.id)):
+        question_statistics = _read_statistics(profile.id, snapshot)
+        
+        # Answers of processes that stopped before saving, f.e. after a crash
+        recovered_count = 0
+        recovered_journals = []
+        for journal_file_path, is_legacy in find_profile_journals(profile.id):
+            journal_file = open(journal_file_path, "a")
+            if not try_lock_file(journal_file):
+                journal_file.close()
+                continue
+            recovered_journals.append((journal_file_path, journal_file))
+            
+            for question_id, times_answered, times_answered_correctly, weight, last_answered in read_journal_changes(journal_file_path).values():
+                if not is_legacy:
+                    stored = question_statistics.get(question_id)
+                    if stored:
+                        times_answered = max(stored.times_answered + times_answered, 0)
+                        times_answered_correctly = max(stored.times_answered_correctly + times_answered_correctly, 0)
+                question_statistics.set_values(question_id, times_answered, times_answered_correctly, weight, last_answered or None)
+                recovered_count += 1
+        
+        if recovered_count:
+            print(f"Recovered {recovered_count} answer(s) from the statistics journal.")
+            _write_statistics(profile.id, question_statistics, snapshot)
+        question_statistics.dirty_rows.clear()
+        
+        # Removed only once the recovered answers are stored
+        for journal_file_path, journal_file in recovered_journals:
+            os.remove(journal_file_path)
+            journal_file.close()
+        
+        loaded_profile = Profile(profile.id, profile.name, question_statistics)
+        loaded_profile.stored_version = _get_statistics_version(profile.id, snapshot)
+        # A journal name can be taken by another process, f.e. one with a reused process id, the next name is tried then
+        while loaded_profile.journal is None:
+            journal_file_path = get_profile_journal_file_path(profile.id, f"{os.getpid()}-{next(_journal_owners)}")
             try:
-                if int(line["profile_id"]) == profile.id:
-                    question_id = int(line["question_id"])
-                    question_statistics[question_id] = (QuestionStatistics(
-                        times_answered = int(line["times_answered"]),
-                        times_answered_correctly = int(line["times_answered_correctly"]),
-                        weight = float(line["weight"])
-                    ))
-            except ValueError:
-                print(f"Failed to convert data for question statistics line: {line}")
-            except KeyError:
-                print(f"Missing data in line: {line}")
+                loaded_profile.journal = StatisticsJournal(
+                    journal_file_path,
+                    lambda: compact_statistics_journal(loaded_profile, snapshot),
+                    question_statistics.baseline
+                )
+            except JournalLockedError as e:
+                print(e)
+    
+    return loaded_profile
+
+def _get_statistics_version(profile_id: int, snapshot: bool) -> Optional[tuple]:
+    file_path = get_profile_snapshot_file_path(profile_id)
+    if not (snapshot and os.path.exists(file_path)):
+        file_path = get_profile_statistics_file_path(profile_id)
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    # Files are replaced on every write, so the inode changes even if time and size do not
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+# Reads the stored statistics of a profile, without any journal
+def _read_statistics(profile_id: int, snapshot: bool) -> StatisticsStore:
+    file_path = get_profile_statistics_file_path(profile_id)
+    snapshot_file_path = get_profile_snapshot_file_path(profile_id)
+    
+    question_statistics = StatisticsStore()
+    if snapshot and os.path.exists(snapshot_file_path):
+        from helpers.snapshot import load_statistics_snapshot
+        question_statistics = load_statistics_snapshot(snapshot_file_path)
+    elif os.path.exists(file_path) and validate_statistics_file(file_path):
+        with open(file_path, "r") as file:
+            reader = csv.DictReader(file)
+            for line in reader:
+                try:
+                    question_statistics.set_values(
+                        int(line["question_id"]),
+                        int(line["times_answered"]),
+                        int(line["times_answered_correctly"]),
+                        float(line["weight"]),
+                        float(line["last_answered"] or 0)
+                    )
+                except ValueError:
+                    print(f"Failed to convert data for question statistics line: {line}")
+                except KeyError:
+                    print(f"Missing data in line: {line}")
     
-    return Profile(profile.id, profile.name, question_statistics)
+    question_statistics.dirty_rows.clear()
+    return question_statistics
+
+# Replaces the stored statistics of a profile atomically
+def _write_statistics(profile_id: int, question_statistics: StatisticsStore, snapshot: bool) -> None:
+    os.makedirs(QUESTIONS_STATISTICS_DIR_PATH, exist_ok=True)
+    if snapshot:
+        from helpers.snapshot import write_statistics_snapshot
+        write_statistics_snapshot(get_profile_snapshot_file_path(profile_id), question_statistics)
+        return
+    
+    file_path = get_profile_statistics_file_path(profile_id)
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w") as file:
+        writer = csv.DictWriter(file, STATISTICS_HEADERS)
+        writer.writeheader()
+        writer.writerows(statistics.to_dict(profile_id, question_id) for question_id, statistics in question_statistics.items())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file_path, file_path)
 
 # Loads all profile names from file
 def load_profile_names() -> List[Profile]:
     profiles = []
+    if not os.path.exists(PROFILES_FILE_PATH):
+        return profiles
     with open(PROFILES_FILE_PATH, "r") as file:
         reader = csv.DictReader(file)
         for line in reader:
@@ -143,50 +382,328 @@ def load_profile_names() -> List[Profile]:
     
     return profiles
 
-def save_questions(questions: List[Question]) -> None:
-    headers = ["id", "title", "answer", "enabled", "choices"]
+def save_questions(questions: QuestionBank) -> None:
+    # Questions are not merged, the last process saving them wins
+    with questions.lock, locked(QUESTIONS_FILE_PATH):
+        if isinstance(questions, LazyQuestionBank):
+            questions.save()
+            return
+        
+        # Written to a temporary file first, so a crash can not leave a half written questions file
+        temp_file_path = QUESTIONS_FILE_PATH + ".tmp"
+        with open(temp_file_path, "w") as file:
+            writer = csv.DictWriter(file, QUESTION_HEADERS)
+            writer.writeheader()
+            writer.writerows(question.to_dict() for question in questions)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_path, QUESTIONS_FILE_PATH)
+        questions.mark_saved()
+
+def append_questions(questions: List[Question], snapshot: bool = False) -> None:
+    with locked(QUESTIONS_FILE_PATH):
+        # Snapshots can not grow in place, the text heap follows the fixed width columns
+        if snapshot:
+            bank = load_question_bank(snapshot=True)
+            try:
+                for question in questions:
+                    bank.append(question)
+                bank.save()
+            finally:
+                bank.close()
+            return
+        
+        validate_questions_file()
+        with open(QUESTIONS_FILE_PATH, "a") as file:
+            writer = csv.DictWriter(file, QUESTION_HEADERS)
+            writer.writerows(question.to_dict() for question in questions)
+
+def save_question_statistics(profile: Profile, snapshot: bool = False) -> None:
+    if not profile.question_statistics:
+        return
     
-    with open(QUESTIONS_FILE_PATH, "w") as file:
-        writer = csv.DictWriter(file, headers)
-        writer.writeheader()
-        writer.writerows(question.to_dict() for question in questions)
+    compact_statistics_journal(profile, snapshot)
+
+# Writes every row of the profile's statistics, replacing the stored ones without merging.
+# Used to convert statistics between snapshots and CSV files
+def write_profile_statistics(profile: Profile, snapshot: bool = False) -> None:
+    with locked(get_profile_statistics_file_path(profile.id)), profile.lock:
+        _write_statistics(profile.id, profile.question_statistics, snapshot)
+        profile.question_statistics.dirty_rows.clear()
+        profile.stored_version = _get_statistics_version(profile.id, snapshot)
+
+# Merges the changes since the last save into the stored statistics and empties the journal.
+# If another process saved in the meantime, the stored statistics are read again and its answers are kept:
+# counts get the difference to the baseline of each changed question added, weights are replaced
+# and the later of both last answered times is kept.
+# The stored statistics are replaced atomically before the journal is emptied
+def compact_statistics_journal(profile: Profile, snapshot: bool = False) -> None:
+    # Answers wait for the profile lock, so no journal record is truncated before it is stored
+    with locked(get_profile_statistics_file_path(profile.id)), profile.lock:
+        store = profile.question_statistics
+        if not store.dirty_rows:
+            if profile.journal:
+                profile.journal.truncate()
+            return
+        
+        # Changes structure: [(QuestionID, stored values, written values)], values are (TimesAnswered, TimesAnsweredCorrectly, Weight)
+        changes = []
+        if profile.stored_version is not None and profile.stored_version == _get_statistics_version(profile.id, snapshot):
+            for row, (base_times_answered, base_times_answered_correctly, base_weight) in store.dirty_rows.items():
+                changes.append((
+                    store.question_ids[row],
+                    (base_times_answered, base_times_answered_correctly, _stored_weight(base_weight, snapshot)),
+                    (store.times_answered[row], store.times_answered_correctly[row], _stored_weight(store.weight[row], snapshot))
+                ))
+            _write_statistics(profile.id, store, snapshot)
+            if profile.journal:
+                profile.journal.truncate()
+            store.dirty_rows.clear()
+            previous_version, profile.stored_version = profile.stored_version, _get_statistics_version(profile.id, snapshot)
+            _update_aggregates(profile.id, previous_version, profile.stored_version, changes)
+            return
+        
+        previous_version = _get_statistics_version(profile.id, snapshot)
+        stored = _read_statistics(profile.id, snapshot)
+        # Dict structure: [Row, (TimesAnswered, TimesAnsweredCorrectly, LastAnswered)]
+        merged: Dict[int, Tuple[int, int, float]] = {}
+        for row, (base_times_answered, base_times_answered_correctly, _) in store.dirty_rows.items():
+            question_id = store.question_ids[row]
+            times_answered = store.times_answered[row] - base_times_answered
+            times_answered_correctly = store.times_answered_correctly[row] - base_times_answered_correctly
+            last_answered = store.last_answered[row]
+            weight = _stored_weight(store.weight[row], snapshot)
+            current = stored.get(question_id)
+            previous = (0, 0, weight)
+            if current:
+                previous = (current.times_answered, current.times_answered_correctly, current.weight)
+                times_answered += current.times_answered
+                times_answered_correctly += current.times_answered_correctly
+                last_answered = max(last_answered, current.last_answered)
+            merged[row] = (max(times_answered, 0), max(times_answered_correctly, 0), last_answered)
+            stored.set_values(question_id, merged[row][0], merged[row][1], store.weight[row], last_answered)
+            changes.append((question_id, previous, (merged[row][0], merged[row][1], weight)))
+        
+        _write_statistics(profile.id, stored, snapshot)
+        if profile.journal:
+            profile.journal.truncate()
+        profile.stored_version = None
+        _update_aggregates(profile.id, previous_version, _get_statistics_version(profile.id, snapshot), changes)
+        
+        # Counts in memory include the answers other processes saved for the same questions
+        for row, (times_answered, times_answered_correctly, last_answered) in merged.items():
+            store.times_answered[row] = times_answered
+            store.times_answered_correctly[row] = times_answered_correctly
+            store.last_answered[row] = last_answered
+        store.dirty_rows.clear()
+
+# CSV files keep two decimals of the weight, see QuestionStatistics.to_dict()
+def _stored_weight(weight: float, snapshot: bool) -> float:
+    return weight if snapshot else round(weight, 2)
+
+# Returns the per-question totals over the saved statistics of every profile, answers not saved yet are not included.
+# Saves keep the stored totals up to date, they are only built from all statistics again if statistics were written
+# without them, f.e. by a conversion, a recovered journal or an earlier version
+def load_question_aggregates(snapshot: bool = False) -> QuestionAggregates:
+    with locked(get_aggregates_file_path()):
+        profile_ids = _find_statistics_profile_ids(snapshot)
+        stored = _read_aggregates()
+        if stored is not None:
+            aggregates, versions = stored
+            if versions == {profile_id: _get_statistics_version(profile_id, snapshot) for profile_id in profile_ids}:
+                return aggregates
+        
+        aggregates = QuestionAggregates()
+        versions = {}
+        for profile_id in profile_ids:
+            # Saves replace the statistics before they wait for this lock, so they are read again if that happened meanwhile
+            while True:
+                version = _get_statistics_version(profile_id, snapshot)
+                records = list(_read_statistics_records(profile_id, snapshot))
+                if version == _get_statistics_version(profile_id, snapshot):
+                    break
+            for question_id, times_answered, times_answered_correctly, weight in records:
+                aggregates.add(question_id, times_answered, times_answered_correctly, weight)
+            versions[profile_id] = version
+        _write_aggregates(aggregates, versions)
     
-    print("Successfully saved questions!")
+    return aggregates
 
-def save_question_statistics(profile: Profile) -> None:
-    if not profile.question_statistics:
+# Replaces the stored values of the changed questions in the stored aggregates, called while the statistics are locked.
+# Aggregates that do not include the previous statistics of the profile are left as they are, the next load builds them again
+def _update_aggregates(profile_id: int, previous_version: Optional[tuple], version: Optional[tuple], changes: List[tuple]) -> None:
+    if not os.path.exists(get_aggregates_file_path()):
         return
     
-    headers = ["profile_id", "question_id", "times_answered", "times_answered_correctly", "weight"]
+    try:
+        with locked(get_aggregates_file_path()):
+            stored = _read_aggregates()
+            if stored is None:
+                return
+            aggregates, versions = stored
+            if versions.get(profile_id) != previous_version:
+                return
+            for question_id, previous, current in changes:
+                aggregates.on_statistics_changed(profile_id, question_id, previous, current)
+            versions[profile_id] = version
+            _write_aggregates(aggregates, versions)
+    except OSError as e:
+        print(f"Failed to update the question aggregates: {e}")
+
+# Returns None if the aggregates or their versions are missing or invalid
+def _read_aggregates() -> Optional[Tuple[QuestionAggregates, Dict[int, tuple]]]:
+    file_path = get_aggregates_file_path()
+    versions_file_path = get_aggregate_versions_file_path()
+    if not (os.path.exists(file_path) and os.path.exists(versions_file_path)):
+        return None
     
-    validate_file(QUESTIONS_STATISTICS_FILE_PATH, headers)
+    try:
+        with open(versions_file_path, "r") as file:
+            reader = csv.reader(file)
+            if next(reader, None) != AGGREGATE_VERSIONS_HEADERS:
+                return None
+            # Dict structure: [ProfileID, (Inode, ModifiedTime, Size)]
+            versions = {int(profile_id): (int(inode), int(modified_time), int(size)) for profile_id, inode, modified_time, size in reader}
+        with open(file_path, "r") as file:
+            reader = csv.reader(file)
+            if next(reader, None) != AGGREGATES_HEADERS:
+                return None
+            aggregates = QuestionAggregates.from_stored_rows(
+                (int(question_id), int(learners), int(attempts), int(correct), float(weight_sum), [int(count) for count in histogram.split("|")])
+                for question_id, learners, attempts, correct, weight_sum, histogram in reader
+            )
+    except ValueError:
+        print("Failed to read the stored question aggregates, they are built again.")
+        return None
     
-    existing_data = []
-    with open(QUESTIONS_STATISTICS_FILE_PATH) as file:
+    return aggregates, versions
+
+# The versions are removed first and written last, so aggregates of an interrupted write are built again
+def _write_aggregates(aggregates: QuestionAggregates, versions: Dict[int, tuple]) -> None:
+    versions_file_path = get_aggregate_versions_file_path()
+    if os.path.exists(versions_file_path):
+        os.remove(versions_file_path)
+    _replace_file(get_aggregates_file_path(), AGGREGATES_HEADERS, (
+        (question_id, learners, attempts, correct, weight_sum, "|".join(map(str, histogram)))
+        for question_id, learners, attempts, correct, weight_sum, histogram in aggregates.stored_rows()
+    ))
+    _replace_file(versions_file_path, AGGREGATE_VERSIONS_HEADERS, (
+        (profile_id, *version) for profile_id, version in sorted(versions.items())
+    ))
+
+def _replace_file(file_path: str, headers: List[str], rows: Iterator[tuple]) -> None:
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w") as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(rows)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file_path, file_path)
+
+def close_statistics_journal(profile: Profile) -> None:
+    with profile.lock:
+        if profile.journal:
+            profile.journal.close()
+            profile.journal = None
+
+# Streams (ProfileID, QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight) of every profile in one pass.
+# Journal records, also of running processes, are applied on top of the stored rows like load_profile_statistics does
+def iter_question_statistics(snapshot: bool = False) -> Iterator[Tuple[int, int, int, int, float]]:
+    for profile_id in _find_statistics_profile_ids(snapshot):
+        counts = {} # Dict structure: [QuestionID, (TimesAnswered, TimesAnsweredCorrectly)], legacy journal counts
+        changes = {} # Dict structure: [QuestionID, (TimesAnswered, TimesAnsweredCorrectly, Weight)], summed changes
+        for journal_file_path, is_legacy in find_profile_journals(profile_id):
+            for question_id, times_answered, times_answered_correctly, weight, _ in read_journal_changes(journal_file_path).values():
+                if is_legacy:
+                    counts[question_id] = (times_answered, times_answered_correctly)
+                    times_answered = times_answered_correctly = 0
+                previous = changes.get(question_id, (0, 0, weight))
+                changes[question_id] = (previous[0] + times_answered, previous[1] + times_answered_correctly, weight)
+        
+        for question_id, times_answered, times_answered_correctly, weight in _read_statistics_records(profile_id, snapshot):
+            if question_id in changes:
+                yield (profile_id, question_id, *_apply_changes(counts.pop(question_id, (times_answered, times_answered_correctly)), changes.pop(question_id)))
+            else:
+                yield profile_id, question_id, times_answered, times_answered_correctly, weight
+        
+        for question_id, change in changes.items():
+            yield (profile_id, question_id, *_apply_changes(counts.get(question_id, (0, 0)), change))
+
+# Returns the ids of the profiles with stored statistics
+def _find_statistics_profile_ids(snapshot: bool) -> List[int]:
+    if not os.path.isdir(QUESTIONS_STATISTICS_DIR_PATH):
+        return []
+    
+    file_pattern = r"profile_(\d+)\.(csv|snapshot)" if snapshot else r"profile_(\d+)\.csv"
+    profile_ids = set()
+    for file_name in os.listdir(QUESTIONS_STATISTICS_DIR_PATH):
+        match = re.fullmatch(file_pattern, file_name)
+        if match:
+            profile_ids.add(int(match.group(1)))
+    return sorted(profile_ids)
+
+def _apply_changes(counts: Tuple[int, int], change: Tuple[int, int, float]) -> Tuple[int, int, float]:
+    return max(counts[0] + change[0], 0), max(counts[1] + change[1], 0), change[2]
+
+# Streams the stored (QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight) rows of a profile
+def _read_statistics_records(profile_id: int, snapshot: bool) -> Iterator[Tuple[int, int, int, float]]:
+    snapshot_file_path = get_profile_snapshot_file_path(profile_id)
+    if snapshot and os.path.exists(snapshot_file_path):
+        from helpers.snapshot import load_statistics_snapshot
+        store = load_statistics_snapshot(snapshot_file_path)
+        yield from zip(store.question_ids, store.times_answered, store.times_answered_correctly, store.weight)
+        return
+    
+    with open(get_profile_statistics_file_path(profile_id), "r") as file:
         reader = csv.DictReader(file)
         for line in reader:
-            if int(line["profile_id"]) != profile.id:
-                existing_data.append({
-                    "profile_id": line["profile_id"],
-                    "question_id": line["question_id"],
-                    "times_answered": line["times_answered"],
-                    "times_answered_correctly": line["times_answered_correctly"],
-                    "weight": line["weight"]
-                })
-        
-    rows = [
-        statistics.to_dict(profile.id, question_id) 
-        for question_id, statistics in profile.question_statistics.items()
-    ]
-    
-    rows.extend(existing_data)
-    
-    with open(QUESTIONS_STATISTICS_FILE_PATH, "w") as file:
-        writer = csv.DictWriter(file, headers)
-        writer.writeheader()
-        writer.writerows(rows)
+            try:
+                yield int(line["question_id"]), int(line["times_answered"]), int(line["times_answered_correctly"]), float(line["weight"])
+            except (ValueError, KeyError, TypeError):
+                continue
+
+# Splits the legacy statistics file into per-profile files. Runs once, the legacy file is renamed afterwards
+def migrate_question_statistics() -> bool:
+    with locked(QUESTIONS_STATISTICS_FILE_PATH):
+        return _migrate_question_statistics()
+
+def _migrate_question_statistics() -> bool:
+    if not os.path.exists(QUESTIONS_STATISTICS_FILE_PATH):
+        return False
     
-    print("Successfully saved question statistics!")
+    rows_by_profile = {}
+    with open(QUESTIONS_STATISTICS_FILE_PATH, "r") as file:
+        reader = csv.DictReader(file)
+        for line in reader:
+            try:
+                rows_by_profile.setdefault(int(line["profile_id"]), []).append(line)
+            except (ValueError, KeyError, TypeError):
+                print(f"Skipping invalid question statistics line: {line}")
+    
+    migrated = 0
+    for profile_id, rows in rows_by_profile.items():
+        file_path = get_profile_statistics_file_path(profile_id)
+        with locked(file_path):
+            # Statistics saved per profile are newer than the legacy ones, f.e. of a migration that stopped midway
+            if os.path.exists(file_path):
+                print(f"Keeping the saved statistics of profile {profile_id}, its legacy statistics are not migrated")
+                continue
+            
+            # Written to a temporary file first, so a crash never leaves a truncated file behind
+            temp_file_path = file_path + ".tmp"
+            with open(temp_file_path, "w") as file:
+                writer = csv.DictWriter(file, STATISTICS_HEADERS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_file_path, file_path)
+            migrated += 1
+    
+    os.replace(QUESTIONS_STATISTICS_FILE_PATH, QUESTIONS_STATISTICS_FILE_PATH + ".migrated")
+    print(f"Migrated question statistics of {migrated} profile(s)!")
+    return True
     
 # Finds the maximum ID in a CSV file
 def find_max_id(id_column_name: str, file_path: str) -> int:
@@ -203,7 +720,4 @@ def find_max_id(id_column_name: str, file_path: str) -> int:
     return max_id
 
 def find_profile_max_id() -> int:
-    return find_max_id("id", PROFILES_FILE_PATH)
-
-def find_questions_max_id() -> int:
-    return find_max_id("id", QUESTIONS_FILE_PATH)
\ No newline at end of file
+    return find_max_id("id", PROFILES_FILE_PATH)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+import threading
+from typing import Dict, IO, Optional
+
+# fcntl is not available on Windows, there files are not locked between processes
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_FILE_SUFFIX = ".lock"
+
+class FileLock:
+    # Advisory lock between processes for a data file, held on a separate <file>.lock file,
+    # so the data file itself can be replaced while the lock is held.
+    # Reentrant like threading.RLock, threads of one process wait for each other too.
+
+    def __init__(self, file_path: str) -> None:
+        self.lock_file_path = file_path + LOCK_FILE_SUFFIX
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file: Optional[IO] = None
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                folder_path = os.path.dirname(self.lock_file_path)
+                if folder_path:
+                    os.makedirs(folder_path, exist_ok=True)
+                self._file = open(self.lock_file_path, "a")
+                if fcntl:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            # Closing the file releases the flock
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+_locks: Dict[str, FileLock] = {} # Dict structure: [Absolute file path, FileLock]
+_locks_lock = threading.Lock()
+
+# Returns the lock of the data file, the same object for every caller in this process
+def locked(file_path: str) -> FileLock:
+    with _locks_lock:
+        key = os.path.abspath(file_path)
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = FileLock(file_path)
+        return lock
+
+# Takes an exclusive lock on an open file without waiting. Journals are locked by their owner while it runs,
+# so a journal that can be locked belongs to a process that stopped
+def try_lock_file(file: IO) -> bool:
+    if not fcntl:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,132 @@
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterator, List, Tuple, Union
+from helpers import question_helper
+from models.question import Question, normalize_tags
+from models.question_index import DuplicateIndex
+from repositories.repository import Repository
+
+IMPORT_CHUNK_SIZE = 1000
+REPORT_HEADERS = ["line", "reason", "row"]
+# JSONL lines that are not objects are kept under this key for the report
+RAW_LINE_KEY = "raw"
+
+@dataclass
+class ImportReport:
+    imported_count: int = 0
+    # List structure: [(LineNumber, Reason, Row)]
+    rejected: List[Tuple[int, str, dict]] = field(default_factory=list)
+
+def detect_format(file_path: str) -> str:
+    return "jsonl" if os.path.splitext(file_path)[1].lower() in [".jsonl", ".json"] else "csv"
+
+# Streams (LineNumber, Row) pairs. CSV files use the questions.csv columns, JSONL lines are objects with the same keys
+def read_rows(file_path: str, file_format: str) -> Iterator[Tuple[int, dict]]:
+    with open(file_path, "r", newline="" if file_format == "csv" else None) as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for line in reader:
+                yield reader.line_num, line
+            return
+
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = line.strip()
+            yield line_number, row if isinstance(row, dict) else {RAW_LINE_KEY: row}
+
+# Applies the same normalization and rules as adding questions by hand.
+# Returns the question, or the reason why the row was rejected
+def question_from_row(question_id: int, row: dict) -> Union[Question, str]:
+    if list(row) == [RAW_LINE_KEY]:
+        return "Line is not a JSON object!"
+    choices = row.get("choices") or []
+    if isinstance(choices, str):
+        choices = choices.split("|")
+    if not isinstance(choices, list):
+        return "Choices must be a list or a '|' separated string!"
+    aliases = row.get("aliases") or []
+    if isinstance(aliases, str):
+        aliases = aliases.split("|")
+    if not isinstance(aliases, list):
+        return "Aliases must be a list or a '|' separated string!"
+    tags = row.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split("|")
+    if not isinstance(tags, list):
+        return "Tags must be a list or a '|' separated string!"
+
+    title = str(row.get("title") or "").capitalize().strip()
+    answer = str(row.get("answer") or "").strip()
+    choices = [str(choice).strip() for choice in choices]
+    aliases = [alias for alias in (str(alias).strip() for alias in aliases) if alias]
+    tags = normalize_tags(str(tag) for tag in tags)
+    enabled = str(row.get("enabled", True)).strip().lower() not in ["false", "0", "no"]
+
+    error = question_helper.validate_question(title, answer, choices)
+    if error:
+        return error
+    return Question(question_id, title, answer, enabled=enabled, choices=choices or None, aliases=aliases, tags=tags)
+
+def import_questions(
+    repository: Repository,
+    file_path: str,
+    file_format: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    allow_duplicates: bool = False
+) -> ImportReport:
+    # Validates rows chunk by chunk and writes every chunk with one repository call.
+    # Unless duplicates are allowed, rows duplicating a stored or an earlier imported question are rejected
+    questions = repository.load_questions()
+    next_id = questions.max_id + 1
+    try:
+        duplicates = None
+        if not allow_duplicates:
+            imported = {} # Dict structure: [QuestionID, (Title, Answer)]
+            get_question = lambda question_id: Question(question_id, *imported[question_id]) if question_id in imported else questions.get(question_id)
+            duplicates = DuplicateIndex.build(questions.scan(), get_question)
+
+        report = ImportReport()
+        rows = read_rows(file_path, file_format)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            batch = []
+            for line_number, row in chunk:
+                result = question_from_row(next_id, row)
+                if isinstance(result, Question) and duplicates:
+                    duplicate_id = duplicates.find_duplicate(result.title, result.answer)
+                    if duplicate_id is not None:
+                        result = f"Duplicate of question {duplicate_id}!"
+                    else:
+                        imported[result.id] = (result.title, result.answer)
+                        duplicates.add(result)
+
+                if isinstance(result, Question):
+                    batch.append(result)
+                    next_id += 1
+                else:
+                    report.rejected.append((line_number, result, row))
+
+            if batch:
+                repository.append_questions(batch)
+                report.imported_count += len(batch)
+    finally:
+        questions.close()
+
+    return report
+
+def write_rejected_report(report: ImportReport, report_file_path: str) -> None:
+    with open(report_file_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(REPORT_HEADERS)
+        for line_number, reason, row in report.rejected:
+            writer.writerow([line_number, reason, json.dumps(row)])
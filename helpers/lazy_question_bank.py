@@ -0,0 +1,277 @@
+import csv
+import io
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.question import QUESTION_HEADERS, Question
+from models.question_bank import QuestionBank
+
+# Index header: magic, version, questions file mtime (ns), questions file size, question count
+INDEX_HEADER = struct.Struct("<8sIqqQ")
+INDEX_MAGIC = b"QZLYIDX\0"
+INDEX_VERSION = 1
+# Questions read from the file that stay parsed, the least recently used ones are dropped first
+READ_CACHE_SIZE = 1024
+
+class LazyQuestionBank(QuestionBank):
+    # Question bank over the questions CSV file that keeps only a compact byte-offset
+    # index in memory. Question objects are parsed from the file when first accessed.
+    # The index is cached next to the CSV file and rebuilt when the file mtime or size changes.
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.index_file_path = file_path + ".idx"
+        self._ids = array("q")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._enabled = bytearray()
+        self._positions: Dict[int, int] = {} # Dict structure: [QuestionID, Row in index]
+        # Dict structure: [QuestionID, Question], changed and appended questions, kept until they are saved
+        self._materialized: Dict[int, Question] = {}
+        # OrderedDict structure: [QuestionID, Question], unchanged questions in the order they were last read
+        self._read_cache: "OrderedDict[int, Question]" = OrderedDict()
+        self._appended: List[Question] = []
+        self._file = None
+        self._headers: List[str] = []
+        self.max_id = -1
+        self.enabled_count = 0
+        self._init_tracking()
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._appended)
+
+    def __iter__(self) -> Iterator[Question]:
+        # Materializes every question, modes that only need a few should use get()
+        for question_id in self._ids:
+            yield self.get(question_id)
+        yield from self._appended
+
+    def get(self, question_id: int) -> Optional[Question]:
+        question = self._materialized.get(question_id)
+        if question is not None:
+            return question
+
+        with self.lock:
+            question = self._read_cache.get(question_id)
+            if question is not None:
+                self._read_cache.move_to_end(question_id)
+                return question
+
+            position = self._positions.get(question_id)
+            if position is None:
+                return None
+
+            question = self._read(position)
+            self._read_cache[question_id] = question
+            if len(self._read_cache) > READ_CACHE_SIZE:
+                self._read_cache.popitem(last=False)
+        return question
+
+    def scan(self) -> Iterator[Question]:
+        for position, question_id in enumerate(self._ids):
+            yield self._materialized.get(question_id) or self._read(position)
+        yield from self._appended
+
+    def _read(self, position: int) -> Question:
+        with self.lock:
+            self._file.seek(self._offsets[position])
+            data = self._file.read(self._lengths[position]).decode()
+        line = next(csv.DictReader(io.StringIO(data, newline=""), fieldnames=self._headers))
+        return Question.from_dict(line)
+
+    def ids(self) -> List[int]:
+        return list(self._ids) + [q.id for q in self._appended]
+
+    def id_at(self, position: int) -> int:
+        if position < len(self._ids):
+            return self._ids[position]
+        return self._appended[position - len(self._ids)].id
+
+    def is_enabled(self, question_id: int) -> bool:
+        question = self._materialized.get(question_id)
+        if question is not None:
+            return question.enabled
+        position = self._positions.get(question_id)
+        return position is not None and bool(self._enabled[position])
+
+    def enabled_states(self) -> Iterator[Tuple[int, bool]]:
+        for question_id in self._ids:
+            yield question_id, self.is_enabled(question_id)
+        for q in self._appended:
+            yield q.id, q.enabled
+
+    # Copies of the index columns, only changed and appended questions can differ from them
+    def _build_enabled_columns(self) -> Tuple[array, bytearray]:
+        ids, enabled = array("q", bytes(self._ids)), bytearray(self._enabled)
+        for question_id, question in self._materialized.items():
+            position = self._positions.get(question_id)
+            if position is not None:
+                enabled[position] = question.enabled
+        for question in self._appended:
+            ids.append(question.id)
+            enabled.append(question.enabled)
+        return ids, enabled
+
+    # Changed questions are kept until they are saved, the file still has their old rows
+    def _set_enabled(self, question: Question, enabled: bool) -> bool:
+        if not super()._set_enabled(question, enabled):
+            return False
+        self._read_cache.pop(question.id, None)
+        self._materialized[question.id] = question
+        return True
+
+    def append(self, question: Question) -> None:
+        with self.lock:
+            self._appended.append(question)
+            self._materialized[question.id] = question
+            self._track_append(question)
+        self._changed()
+
+    def save(self) -> None:
+        with self.lock:
+            self._save()
+            self.mark_saved()
+
+    def _save(self) -> None:
+        # Copies unchanged rows byte for byte and serializes only materialized questions
+        headers = QUESTION_HEADERS
+        temp_file_path = self.file_path + ".tmp"
+        ids, offsets, lengths, enabled = array("q"), array("Q"), array("I"), bytearray()
+
+        with open(temp_file_path, "wb") as file:
+            offset = file.write(_to_csv_bytes(headers))
+            for position, question_id in enumerate(self._ids):
+                question = self._materialized.get(question_id)
+                if question is None:
+                    self._file.seek(self._offsets[position])
+                    data = self._file.read(self._lengths[position])
+                    is_enabled = bool(self._enabled[position])
+                else:
+                    data = _to_csv_bytes([question.to_dict()[header] for header in headers])
+                    is_enabled = question.enabled
+                ids.append(question_id)
+                offsets.append(offset)
+                lengths.append(len(data))
+                enabled.append(is_enabled)
+                offset += file.write(data)
+
+            for question in self._appended:
+                data = _to_csv_bytes([question.to_dict()[header] for header in headers])
+                ids.append(question.id)
+                offsets.append(offset)
+                lengths.append(len(data))
+                enabled.append(question.enabled)
+                offset += file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.close()
+        os.replace(temp_file_path, self.file_path)
+        self._headers = headers
+        self._set_index(ids, offsets, lengths, enabled)
+        self._materialized.clear()
+        self._read_cache.clear()
+        self._appended.clear()
+        self._write_index()
+        self._file = open(self.file_path, "rb")
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _open(self) -> None:
+        self._file = open(self.file_path, "rb")
+        self._headers = next(csv.reader([self._file.readline().decode()]), [])
+        if not self._read_index():
+            self._build_index()
+            self._write_index()
+
+    def _build_index(self) -> None:
+        ids, offsets, lengths, enabled = array("q"), array("Q"), array("I"), bytearray()
+        id_column = self._headers.index("id")
+        enabled_column = self._headers.index("enabled")
+
+        self._file.seek(0)
+        offset = len(self._file.readline())
+        record = b""
+        record_offset = offset
+        for line in self._file:
+            if not record:
+                record_offset = offset
+            record += line
+            offset += len(line)
+            # An odd number of quotes means a quoted field continues on the next line
+            if record.count(b'"') % 2:
+                continue
+
+            row = next(csv.reader(io.StringIO(record.decode(), newline="")), None)
+            length = len(record)
+            record = b""
+            if not row:
+                continue
+            try:
+                question_id = int(row[id_column])
+                is_enabled = row[enabled_column] == 'True'
+            except (ValueError, IndexError):
+                print(f"Skipping invalid question line: {row}")
+                continue
+
+            ids.append(question_id)
+            offsets.append(record_offset)
+            lengths.append(length)
+            enabled.append(is_enabled)
+
+        self._set_index(ids, offsets, lengths, enabled)
+
+    def _set_index(self, ids: array, offsets: array, lengths: array, enabled: bytearray) -> None:
+        self._ids, self._offsets, self._lengths, self._enabled = ids, offsets, lengths, enabled
+        self._positions = {question_id: position for position, question_id in enumerate(ids)}
+        self.max_id = max(ids, default=-1)
+        self.enabled_count = enabled.count(1)
+
+    def _read_index(self) -> bool:
+        if not os.path.exists(self.index_file_path):
+            return False
+
+        stat = os.stat(self.file_path)
+        with open(self.index_file_path, "rb") as file:
+            header = file.read(INDEX_HEADER.size)
+            if len(header) != INDEX_HEADER.size:
+                return False
+            magic, version, mtime, size, count = INDEX_HEADER.unpack(header)
+            if (magic, version, mtime, size) != (INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size):
+                return False
+
+            ids, offsets, lengths = array("q"), array("Q"), array("I")
+            try:
+                ids.fromfile(file, count)
+                offsets.fromfile(file, count)
+                lengths.fromfile(file, count)
+            except EOFError:
+                return False
+            enabled = bytearray(file.read(count))
+            if len(enabled) != count:
+                return False
+
+        self._set_index(ids, offsets, lengths, enabled)
+        return True
+
+    def _write_index(self) -> None:
+        stat = os.stat(self.file_path)
+        temp_file_path = self.index_file_path + ".tmp"
+        with open(temp_file_path, "wb") as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size, len(self._ids)))
+            self._ids.tofile(file)
+            self._offsets.tofile(file)
+            self._lengths.tofile(file)
+            file.write(self._enabled)
+        os.replace(temp_file_path, self.index_file_path)
+
+def _to_csv_bytes(row: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode()
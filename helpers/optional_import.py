@@ -0,0 +1,13 @@
+import importlib
+from functools import cache
+from types import ModuleType
+from typing import Optional
+
+# Optional dependencies that are slow to import, f.e. NumPy, are imported by the first call that uses them
+# instead of at startup. Returns None if the module is not installed, the result is cached either way.
+@cache
+def optional_import(name: str) -> Optional[ModuleType]:
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
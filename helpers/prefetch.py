@@ -0,0 +1,25 @@
+import threading
+from typing import Any, Callable, Optional
+
+class Prefetch(threading.Thread):
+    # Runs `load` on a daemon thread as soon as it is created, f.e. while the user reads the menu.
+    # result() waits for the load to finish and raises its error in the calling thread
+
+    def __init__(self, load: Callable[[], Any]) -> None:
+        super().__init__(name="quizly-prefetch", daemon=True)
+        self._load = load
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self.start()
+
+    def run(self) -> None:
+        try:
+            self._result = self._load()
+        except BaseException as error:
+            self._error = error
+
+    def result(self) -> Any:
+        self.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
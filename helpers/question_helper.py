@@ -1,18 +1,70 @@
-from models.profile import Profile
-from models.question import Question
-from typing import List
 import random
+from models.profile import Profile
+from models.question import Question, normalize_tag
+from models.question_bank import QuestionBank
+from typing import List, Optional
+
+# Quizzes store the wrong choices, the answer is added as the third choice when asked
+QUIZ_CHOICE_COUNT = 2
+
+def get_random_questions(
+    profile: Profile, questions: QuestionBank, k: int = 1, now: Optional[float] = None, tag: Optional[str] = None
+) -> List[Question]:
+    # The profile sampler keeps the weight bounds of enabled questions up to date and the effective weights are
+    # computed for drawn questions only, so a draw is O(log n) instead of a pass over the whole bank.
+    # With a tag the draws come from the tag's sampler, in O(log m) for m questions with the tag
+    sampler = profile.tag_sampler(questions, tag) if tag else None
+    return [questions.get(question_id) for question_id in profile.sample_questions(k, now, sampler)]
+
+def sample_enabled_ids(questions: QuestionBank, k: int, rng: random.Random, tag: Optional[str] = None) -> List[int]:
+    # Draws k distinct enabled question ids in random order without changing the bank.
+    # While k is under a quarter of the enabled questions, random positions are drawn until k enabled ones are found,
+    # which takes under a third of the draws of a pass over the bank. Larger draws collect the enabled ids in one pass.
+    # With a tag the positions are those of the tag's questions, so the bank size does not matter
+    if tag:
+        tagged_ids = questions.tag_index.get(normalize_tag(tag), [])
+        size, id_at, enabled_count = len(tagged_ids), tagged_ids.__getitem__, questions.tag_enabled_count(tag)
+        description = f"enabled questions tagged '{tag}'"
+    else:
+        size, id_at, enabled_count = len(questions), questions.id_at, questions.enabled_count
+        description = "enabled questions"
+
+    if k > enabled_count:
+        raise ValueError(f"Can not draw {k} of {enabled_count} {description}")
+    if 4 * k >= enabled_count:
+        if tag:
+            enabled_ids = [question_id for question_id in tagged_ids if questions.is_enabled(question_id)]
+        else:
+            enabled_ids = [question_id for question_id, enabled in questions.enabled_states() if enabled]
+        return rng.sample(enabled_ids, k)
+
+    drawn = {} # Dict structure: [QuestionID, None], keeps the order of the draws
+    while len(drawn) < k:
+        question_id = id_at(rng.randrange(size))
+        if question_id not in drawn and questions.is_enabled(question_id):
+            drawn[question_id] = None
+    return list(drawn)
+
+# Sessions grade through QuestionBank.answer_matcher(), which keeps the matcher of every question
+def is_correct_answer(question: Question, answer: str) -> bool:
+    from helpers.answer_matcher import AnswerMatcher
+    return AnswerMatcher.for_question(question).matches(answer)
+
+# Returns the reason why a question is invalid, or None if it is valid
+def validate_question(title: str, answer: str, choices: Optional[List[str]] = None) -> Optional[str]:
+    if choices:
+        if len(choices) != QUIZ_CHOICE_COUNT:
+            return f"Quiz questions need exactly {QUIZ_CHOICE_COUNT} choices!"
+        if not title or not answer or not all(choices):
+            return "Title, Answer or Choices can not be empty!"
+    elif not title or not answer:
+        return "Title or Answer can not be empty!"
+    return None
 
-def get_random_questions(profile, questions: List[Question], k: int = 1) -> Question:
-    weighted_questions = []
-    weights = []
-    for q in questions:
-        if not q.enabled:
-            continue
-        stats = profile.get_statistics_for_question(q.id)
-        # if question stats for this question do not exist, set 1.0 as the value
-        weight = stats.weight if stats else 1.0
-        weighted_questions.append(q)
-        weights.append(weight)
-    
-    return random.choices(weighted_questions, weights, k=k)
\ No newline at end of file
+# Matches a question id exactly, or questions containing every word of the text in their title or answer.
+# The last word also matches longer words, so partly typed words find results
+def search_questions(questions: QuestionBank, text: str, limit: Optional[int] = None) -> List[int]:
+    text = text.strip()
+    if text.isdigit():
+        return [int(text)] if questions.get(int(text)) is not None else []
+    return questions.index.search(text, limit)
@@ -0,0 +1,201 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+from models.question import Question
+from models.statistics_store import StatisticsStore
+from helpers.lazy_question_bank import LazyQuestionBank
+
+# Binary snapshots of the questions and of a profile's statistics, read through mmap.
+# Layout: header, fixed width columns, then (questions only) a heap with the UTF-8 text of every question.
+#   Questions:  ids q[n], text offsets Q[4n + 1], enabled B[n], heap
+#               Title, answer, choices, aliases and tags of question k are heap[offsets[5k + i]:offsets[5k + i + 1]].
+#               Version 1 snapshots have only the first three texts per question, version 2 and 3 snapshots have no tags
+#   Statistics: question ids q[n], weights d[n], last answered d[n], times answered I[n], times answered correctly I[n]
+#               Version 1 and 2 snapshots have no last answered column
+# The 8 byte columns come first, so every column is aligned in the mapping.
+
+# Header: magic, version, kind, row count, heap size, CRC32 of everything after the header
+SNAPSHOT_HEADER = struct.Struct("<8sIIQQI4x")
+SNAPSHOT_MAGIC = b"QZLYSNAP"
+SNAPSHOT_VERSION = 4
+QUESTIONS_KIND = 1
+STATISTICS_KIND = 2
+QUESTION_FIELDS = 5 # Title, answer, choices, aliases and tags
+TAGS_FIELD = 4
+
+class SnapshotError(Exception):
+    pass
+
+def open_snapshot(file_path: str, kind: int) -> Tuple[mmap.mmap, int, int, int]:
+    # Maps the file copy-on-write, so rows can be changed in memory without touching the file.
+    # Returns the mapping, the row count, the heap size and the version
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < SNAPSHOT_HEADER.size:
+            raise SnapshotError(f"{file_path} is not a Quizly snapshot!")
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, version, file_kind, count, heap_size, checksum = SNAPSHOT_HEADER.unpack_from(mapping)
+    if magic != SNAPSHOT_MAGIC or file_kind != kind:
+        raise SnapshotError(f"{file_path} is not a Quizly {'questions' if kind == QUESTIONS_KIND else 'statistics'} snapshot!")
+    if not 1 <= version <= SNAPSHOT_VERSION:
+        raise SnapshotError(f"{file_path} has snapshot version {version}, expected at most {SNAPSHOT_VERSION}!")
+
+    expected_size = SNAPSHOT_HEADER.size + _body_size(kind, count, version) + heap_size
+    with memoryview(mapping) as view:
+        if len(view) != expected_size or zlib.crc32(view[SNAPSHOT_HEADER.size:]) != checksum:
+            raise SnapshotError(f"{file_path} is corrupt, the checksum or size does not match!")
+    return mapping, count, heap_size, version
+
+def _question_fields(version: int) -> int:
+    if version >= 4:
+        return QUESTION_FIELDS
+    return QUESTION_FIELDS - 1 if version >= 2 else QUESTION_FIELDS - 2
+
+def _body_size(kind: int, count: int, version: int = SNAPSHOT_VERSION) -> int:
+    if kind == QUESTIONS_KIND:
+        return 8 * count + 8 * (_question_fields(version) * count + 1) + count
+    return (32 if version >= 3 else 24) * count
+
+def _write_snapshot(file_path: str, kind: int, count: int, parts: Iterable[bytes], heap_size: int = 0) -> None:
+    # Written to a temporary file first, like the CSV files, so a crash keeps the previous snapshot
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "wb") as file:
+        file.write(bytes(SNAPSHOT_HEADER.size))
+        checksum = 0
+        for part in parts:
+            checksum = zlib.crc32(part, checksum)
+            file.write(part)
+        file.seek(0)
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind, count, heap_size, checksum))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file_path, file_path)
+
+def write_questions_snapshot(file_path: str, questions: Iterable[Question]) -> None:
+    ids, offsets, enabled, heap = array("q"), array("Q", [0]), bytearray(), bytearray()
+    for question in questions:
+        ids.append(question.id)
+        enabled.append(question.enabled)
+        for text in _encode(question):
+            heap += text
+            offsets.append(len(heap))
+    _write_snapshot(file_path, QUESTIONS_KIND, len(ids), [ids.tobytes(), offsets.tobytes(), bytes(enabled), bytes(heap)], len(heap))
+
+def write_statistics_snapshot(file_path: str, store: StatisticsStore) -> None:
+    columns = [store.question_ids, store.weight, store.last_answered, store.times_answered, store.times_answered_correctly]
+    _write_snapshot(file_path, STATISTICS_KIND, len(store), [memoryview(column).cast("B") for column in columns])
+
+def load_statistics_snapshot(file_path: str) -> StatisticsStore:
+    # The columns are typed views of the mapping, nothing is parsed or copied until a row is added
+    mapping, count, _, version = open_snapshot(file_path, STATISTICS_KIND)
+    view = memoryview(mapping)[SNAPSHOT_HEADER.size:]
+    counts = 24 * count if version >= 3 else 16 * count
+    return StatisticsStore.from_columns(
+        view[:8 * count].cast("q"),
+        view[counts:counts + 4 * count].cast("I"),
+        view[counts + 4 * count:counts + 8 * count].cast("I"),
+        view[8 * count:16 * count].cast("d"),
+        view[16 * count:24 * count].cast("d") if version >= 3 else None
+    )
+
+class SnapshotQuestionBank(LazyQuestionBank):
+    # Question bank over a questions snapshot. Ids and enabled flags are views of the mapping,
+    # question text is decoded from the heap when a question is first accessed
+
+    def __init__(self, file_path: str) -> None:
+        self._mapping: Optional[mmap.mmap] = None
+        self._fields = QUESTION_FIELDS
+        super().__init__(file_path)
+
+    def _open(self) -> None:
+        mapping, count, _, version = open_snapshot(self.file_path, QUESTIONS_KIND)
+        view = memoryview(mapping)[SNAPSHOT_HEADER.size:]
+        self._fields = _question_fields(version)
+        offsets_end = 8 * count + 8 * (self._fields * count + 1)
+        self._mapping = mapping
+        self._ids = view[:8 * count].cast("q")
+        self._offsets = view[8 * count:offsets_end].cast("Q")
+        self._enabled = view[offsets_end:offsets_end + count]
+        self._heap = view[offsets_end + count:]
+        self._positions = {question_id: position for position, question_id in enumerate(self._ids)}
+        self.max_id = max(self._ids, default=-1)
+        self.enabled_count = bytes(self._enabled).count(1)
+
+    def _read(self, position: int) -> Question:
+        title, answer, choices, aliases, tags = (bytes(text).decode() for text in self._texts(position))
+        return Question(
+            self._ids[position],
+            title,
+            answer,
+            enabled=bool(self._enabled[position]),
+            choices=choices.split("|") if choices else [],
+            aliases=aliases.split("|") if aliases else [],
+            tags=tags.split("|") if tags else []
+        )
+
+    # Decodes only the tags of questions that were not changed
+    def question_tags(self) -> Iterator[Tuple[int, List[str]]]:
+        for position, question_id in enumerate(self._ids):
+            question = self._materialized.get(question_id)
+            if question is not None:
+                yield question_id, question.tags or []
+            elif self._fields > TAGS_FIELD:
+                start = self._fields * position + TAGS_FIELD
+                tags = bytes(self._heap[self._offsets[start]:self._offsets[start + 1]]).decode()
+                yield question_id, tags.split("|") if tags else []
+            else:
+                yield question_id, []
+        for question in self._appended:
+            yield question.id, question.tags or []
+
+    def _texts(self, position: int) -> Tuple[memoryview, ...]:
+        # Older snapshots read as if every question had empty aliases and tags
+        start = self._fields * position
+        texts = tuple(self._heap[self._offsets[start + field]:self._offsets[start + field + 1]] for field in range(self._fields))
+        return texts + (memoryview(b""),) * (QUESTION_FIELDS - self._fields)
+
+    def _save(self) -> None:
+        # Text of questions that were not changed is copied from the heap without decoding
+        ids, offsets, enabled, heap = array("q"), array("Q", [0]), bytearray(), bytearray()
+
+        def add(question_id: int, is_enabled: bool, texts: Iterable[bytes]) -> None:
+            nonlocal heap
+            ids.append(question_id)
+            enabled.append(is_enabled)
+            for text in texts:
+                heap += text
+                offsets.append(len(heap))
+
+        for position, question_id in enumerate(self._ids):
+            question = self._materialized.get(question_id)
+            if question is None:
+                add(question_id, bool(self._enabled[position]), self._texts(position))
+            else:
+                add(question_id, question.enabled, _encode(question))
+        for question in self._appended:
+            add(question.id, question.enabled, _encode(question))
+
+        _write_snapshot(self.file_path, QUESTIONS_KIND, len(ids), [ids.tobytes(), offsets.tobytes(), bytes(enabled), bytes(heap)], len(heap))
+        self.close()
+        self._materialized.clear()
+        self._read_cache.clear()
+        self._appended.clear()
+        self._open()
+
+    def close(self) -> None:
+        # Views have to be released before the mapping can be closed
+        if self._mapping is None:
+            return
+        for view in (self._ids, self._offsets, self._enabled, self._heap):
+            view.release()
+        self._mapping.close()
+        self._mapping = None
+
+def _encode(question: Question) -> Tuple[bytes, ...]:
+    return (
+        question.title.encode(), question.answer.encode(), question.to_choices_string().encode(), question.to_aliases_string().encode(),
+        question.to_tags_string().encode()
+    )
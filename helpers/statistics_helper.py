@@ -0,0 +1,87 @@
+import heapq
+from dataclasses import dataclass
+from typing import List, Optional
+from models.profile import Profile
+from models.question_bank import QuestionBank
+from helpers.optional_import import optional_import
+
+@dataclass
+class StatisticsRow:
+    question_id: int
+    attempts: int
+    weight: float
+    score: float # Accuracy in percent, 0 for questions that were never answered
+
+def select_statistics(
+    profile: Profile,
+    questions: QuestionBank,
+    limit: Optional[int] = None,
+    descending: bool = False,
+    enabled_only: bool = False,
+    min_attempts: int = 0
+) -> List[StatisticsRow]:
+    # Returns the `limit` lowest (or highest) scoring questions that match the filters, sorted by score.
+    # Only the selected rows are built, the whole bank is handled by a single pass over the statistics columns.
+    # Statistics of deleted questions are filtered out before the selection, like disabled ones with enabled_only
+    store = profile.question_statistics
+    if len(store) == 0:
+        return []
+
+    # NumPy is optional, without it the statistics are computed with a plain Python pass
+    if optional_import("numpy") is not None:
+        rows = _select_rows_numpy(store, questions, limit, descending, enabled_only, min_attempts)
+    else:
+        rows = _select_rows_python(store, questions, limit, descending, enabled_only, min_attempts)
+
+    return [
+        StatisticsRow(
+            store.question_ids[row],
+            store.times_answered[row],
+            store.weight[row],
+            _score(store.times_answered[row], store.times_answered_correctly[row])
+        )
+        for row in rows
+    ]
+
+def _score(times_answered: int, times_answered_correctly: int) -> float:
+    return times_answered_correctly / times_answered * 100 if times_answered else 0.0
+
+def _select_rows_numpy(store, questions, limit, descending, enabled_only, min_attempts) -> List[int]:
+    np = optional_import("numpy")
+    # The array('I') columns are wrapped without copying
+    times_answered = np.frombuffer(store.times_answered, dtype=np.uint32)
+    times_answered_correctly = np.frombuffer(store.times_answered_correctly, dtype=np.uint32)
+
+    scores = np.zeros(len(times_answered), dtype=np.float64)
+    np.divide(times_answered_correctly * 100.0, times_answered, out=scores, where=times_answered > 0)
+
+    # The id and enabled columns of the bank are matched against the question id column of the store
+    bank_ids, bank_enabled = questions.enabled_columns()
+    kept_ids = np.frombuffer(bank_ids, dtype=np.int64)
+    if enabled_only:
+        kept_ids = kept_ids[np.frombuffer(bank_enabled, dtype=bool)]
+    question_ids = np.frombuffer(store.question_ids, dtype=np.int64)
+    mask = (times_answered >= min_attempts) & np.isin(question_ids, kept_ids)
+    candidates = np.flatnonzero(mask)
+    keys = -scores[candidates] if descending else scores[candidates]
+
+    if limit is not None and limit < len(candidates):
+        selected = np.argpartition(keys, limit - 1)[:limit]
+        candidates, keys = candidates[selected], keys[selected]
+
+    return candidates[np.argsort(keys, kind="stable")].tolist()
+
+def _select_rows_python(store, questions, limit, descending, enabled_only, min_attempts) -> List[int]:
+    enabled_states = dict(questions.enabled_states()) # Dict structure: [QuestionID, IsEnabled]
+    candidates = (
+        row for row, question_id in enumerate(store.question_ids)
+        if store.times_answered[row] >= min_attempts and question_id in enabled_states
+        and (not enabled_only or enabled_states[question_id])
+    )
+    key = lambda row: _score(store.times_answered[row], store.times_answered_correctly[row])
+
+    if limit is None:
+        return sorted(candidates, key=key, reverse=descending)
+    if descending:
+        return heapq.nlargest(limit, candidates, key=key)
+    return heapq.nsmallest(limit, candidates, key=key)
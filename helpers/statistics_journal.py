@@ -0,0 +1,98 @@
+import os
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from helpers.file_lock import try_lock_file
+
+# Every record is flushed to the OS right away, fsync happens once per batch
+JOURNAL_SYNC_INTERVAL = 20
+# Once the journal holds this many records it is merged into the stored statistics
+JOURNAL_COMPACTION_THRESHOLD = 5000
+
+# Record structure: (QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight, LastAnswered).
+# Journals written before LastAnswered existed have records without it, read as 0
+JournalRecord = Tuple[int, int, int, float, float]
+
+class JournalLockedError(Exception):
+    # The journal file is locked by another process that still writes to it
+    pass
+
+class StatisticsJournal:
+    # Append-only write-ahead journal of answered questions for a single loaded profile.
+    # Every loaded profile has its own journal file, locked while it is open, so processes sharing
+    # the data folder never write to the same journal and stopped ones can be recovered.
+    # With a baseline, records hold the change of the counts since the last save instead of the counts,
+    # later records of a question include the earlier ones, so only the last record per question counts.
+
+    def __init__(
+        self,
+        file_path: str,
+        compact: Optional[Callable[[], None]] = None,
+        baseline: Optional[Callable[[int], Tuple[int, int]]] = None
+    ) -> None:
+        self.file_path = file_path
+        self.compact = compact
+        self.baseline = baseline
+        self._file = open(file_path, "a")
+        # Appending to a journal of another process would let recovery take it for abandoned
+        if not try_lock_file(self._file):
+            self._file.close()
+            raise JournalLockedError(f"Statistics journal '{file_path}' is used by another process.")
+        self.record_count = sum(1 for _ in read_journal(file_path))
+        self._pending_sync = 0
+
+    # Returns True once the journal should be compacted. The caller runs compact() after releasing the profile lock,
+    # compaction takes the statistics file lock first and then the profile lock, like saves do
+    def append(self, question_id: int, times_answered: int, times_answered_correctly: int, weight: float, last_answered: float = 0.0) -> bool:
+        if self.baseline:
+            base_times_answered, base_times_answered_correctly = self.baseline(question_id)
+            times_answered -= base_times_answered
+            times_answered_correctly -= base_times_answered_correctly
+        self._file.write(f"{question_id},{times_answered},{times_answered_correctly},{round(weight, 2)},{round(last_answered, 3)}\n")
+        self._file.flush()
+        self.record_count += 1
+        self._pending_sync += 1
+        if self._pending_sync >= JOURNAL_SYNC_INTERVAL:
+            self.sync()
+
+        return self.compact is not None and self.record_count >= JOURNAL_COMPACTION_THRESHOLD
+
+    def sync(self) -> None:
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending_sync = 0
+
+    def truncate(self) -> None:
+        # Called once the stored statistics contain every journal record
+        self._file.truncate(0)
+        self.sync()
+        self.record_count = 0
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.sync()
+        # An empty journal has nothing to recover. It is removed while still locked
+        if self.record_count == 0 and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+        self._file.close()
+
+def read_journal(file_path: str) -> Iterator[JournalRecord]:
+    if not os.path.exists(file_path):
+        return
+
+    with open(file_path, "r") as file:
+        for line in file:
+            try:
+                fields = line.strip().split(",")
+                if len(fields) == 4:
+                    fields.append("0")
+                question_id, times_answered, times_answered_correctly, weight, last_answered = fields
+                yield int(question_id), int(times_answered), int(times_answered_correctly), float(weight), float(last_answered)
+            except ValueError:
+                # A crash can leave the last record half written
+                print(f"Skipping invalid journal record: {line.strip()}")
+
+# Returns the last record of every question, earlier records are included in it
+def read_journal_changes(file_path: str) -> Dict[int, JournalRecord]:
+    return {record[0]: record for record in read_journal(file_path)}
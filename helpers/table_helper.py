@@ -0,0 +1,55 @@
+from typing import Any, Callable, List, Optional, Sequence
+from helpers import user_input_helper
+
+PAGE_SIZE = 20
+SPARKLINE_CHARACTERS = " ▁▂▃▄▅▆▇█"
+
+# Renders rows as a grid table. tabulate is imported on the first table, not at startup
+def render(rows: List[list], columns: List[str]) -> str:
+    from tabulate import tabulate
+    return tabulate(rows, headers=columns, tablefmt="grid")
+
+# Renders counts as a one character per value bar chart, scaled to the largest count
+def sparkline(values: Sequence[int]) -> str:
+    highest = max(values, default=0)
+    if highest <= 0:
+        return " " * len(values)
+    top = len(SPARKLINE_CHARACTERS) - 1
+    return "".join(SPARKLINE_CHARACTERS[-(-value * top // highest)] for value in values)
+
+def paginate(
+    columns: List[str],
+    items: Sequence[Any],
+    to_row: Callable[[Any], list],
+    search: Optional[Callable[[str], Sequence[Any]]] = None,
+    page_size: int = PAGE_SIZE
+) -> None:
+    # Renders one page of items at a time, so only the rows of that page are built and measured.
+    # `search` returns the items matching a search text and replaces the shown items.
+    all_items = items
+    page = 0
+    while True:
+        page_count = max(1, (len(items) + page_size - 1) // page_size)
+        page = max(0, min(page, page_count - 1))
+        
+        if items:
+            rows = [to_row(item) for item in items[page * page_size:(page + 1) * page_size]]
+            print(render(rows, columns))
+        else:
+            print("No rows found!")
+        print(f"Page {page + 1} of {page_count} ({len(items)} rows)")
+        
+        command, argument = user_input_helper.get_page_command(search is not None)
+        match command:
+            case "next":
+                page += 1
+            case "previous":
+                page -= 1
+            case "jump":
+                page = argument - 1
+            case "search":
+                items = search(argument) if argument else all_items
+                page = 0
+            case "quit":
+                print()
+                return
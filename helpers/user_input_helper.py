@@ -1,20 +1,21 @@
+from typing import Optional, Tuple, Union
 from enums.mode import ModeEnum
 
 def select_mode() -> ModeEnum:
-    print("Please select a mode by entering a number (1 - 7):")
+    print(f"Please select a mode by entering a number (1 - {len(ModeEnum)}):")
     for enum in ModeEnum:
-        print(f"{enum.value}. {" ".join(enum.name.capitalize().split("_"))}")
+        print(f"{enum.value}. {' '.join(enum.name.capitalize().split('_'))}")
     
     print()
     selected_mode = None
     while selected_mode == None:
         try:
-            mode_num = int(input("Mode (1 - 7): "))
+            mode_num = int(input(f"Mode (1 - {len(ModeEnum)}): "))
             selected_mode = ModeEnum(mode_num)
         except ValueError:
             print("Invalid number! Please select again.")
             continue
-    print(f"Successfully selected Mode {selected_mode.value}: {" ".join(selected_mode.name.capitalize().split("_"))}!")
+    print(f"Successfully selected Mode {selected_mode.value}: {' '.join(selected_mode.name.capitalize().split('_'))}!")
     print()
     return selected_mode
 
@@ -49,6 +50,52 @@ def get_order_type() -> str:
         break
     return order
 
+# Returns None if all rows should be shown
+def get_row_limit() -> Optional[int]:
+    while True:
+        limit = input("How many questions to show? (press Enter for all): ").strip()
+        if not limit:
+            return None
+        if limit.isdigit() and int(limit) > 0:
+            return int(limit)
+        print("Invalid number! Please enter a positive number or press Enter.")
+
+def get_min_attempts() -> int:
+    while True:
+        attempts = input("Minimum times answered (press Enter for 0): ").strip()
+        if not attempts:
+            return 0
+        if attempts.isdigit():
+            return int(attempts)
+        print("Invalid number! Please enter a number or press Enter.")
+
+def get_enabled_only() -> bool:
+    while True:
+        decision = input("Show only enabled questions? [y/n]: ").strip().lower()
+        if decision in ['y', 'n']:
+            return decision == 'y'
+        print("Please enter either 'y' or 'n'.")
+
+# Returns a (command, argument) tuple, f.e. ("jump", 3) or ("search", "capital")
+def get_page_command(allow_search: bool) -> Tuple[str, Union[int, str, None]]:
+    commands = "[n]ext, [p]revious, [j]ump <page>, "
+    if allow_search:
+        commands += "[s]earch <id or title> (empty to reset), "
+    commands += "[q]uit"
+    
+    while True:
+        command, _, argument = input(f"{commands}: ").strip().partition(" ")
+        command = command.lower()
+        argument = argument.strip()
+        
+        if command in ['n', 'p', 'q']:
+            return {'n': "next", 'p': "previous", 'q': "quit"}[command], None
+        if command == 'j' and argument.isdigit():
+            return "jump", int(argument)
+        if command == 's' and allow_search:
+            return "search", argument
+        print("Invalid command! Please try again.")
+
 def get_question_type() -> str:
     while True:
         question_type = input("Please enter the type of question (1 for Quiz, 2 for Free-Form): ").strip()
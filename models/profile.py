@@ -1,23 +1,159 @@
-from dataclasses import dataclass
-from typing import Dict, List
-from models.question import Question
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from helpers.statistics_journal import StatisticsJournal
+from models.question import normalize_tag
+from models.question_bank import QuestionBank
 from models.question_statistics import QuestionStatistics
+from models.statistics_store import QuestionStatisticsView, StatisticsStore
+from models.weight_policy import WeightPolicy, create_weight_policy
+from models.weighted_sampler import WeightedSampler
+
+# Draws in a row that sample_questions() may reject before it gives up
+MAX_REJECTED_DRAWS = 10000
 
 @dataclass
 class Profile:
     id: int
     name: str
-    question_statistics: Dict[int, QuestionStatistics] # Dict structure: [QuestionID, QuestionStatistics]
-    
-    def init_statistics(self, questions: List[Question]) -> None:
+    # A plain Dict structure of [QuestionID, QuestionStatistics] is converted into a columnar store
+    question_statistics: Union[StatisticsStore, Dict[int, QuestionStatistics]]
+    # Turns stored weights into the weights questions are drawn with, set by init_statistics()
+    weight_policy: WeightPolicy = field(default_factory=create_weight_policy, repr=False, compare=False)
+    # Weight bounds of enabled questions for practice mode, disabled questions have a weight of 0
+    sampler: WeightedSampler = field(default_factory=WeightedSampler, repr=False, compare=False)
+    # Time until which the weight bounds in the samplers hold, they are set again on the first draw after it
+    bounds_until: float = field(default=0.0, repr=False, compare=False)
+    # Dict structure: [Tag, WeightedSampler], the same weight bounds over the questions of one tag.
+    # Built when a tag is first drawn from, then kept up to date with the main sampler
+    tag_samplers: Dict[str, WeightedSampler] = field(default_factory=dict, repr=False, compare=False)
+    # Write-ahead journal receiving every answer, attached when the profile is loaded
+    journal: Optional[StatisticsJournal] = field(default=None, repr=False, compare=False)
+    # (Inode, ModifiedTime, Size) of the stored statistics when this profile last read or wrote them.
+    # While the file is unchanged no other process saved in between, so saves do not have to read it again
+    stored_version: Optional[tuple] = field(default=None, repr=False, compare=False)
+    # Held while the statistics are changed or saved, saves can run on the autosave thread
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+    # Called after every answer with (ProfileID, QuestionID, previous values, current values),
+    # values are (TimesAnswered, TimesAnsweredCorrectly, Weight). F.e. autosave and analytics listen
+    listeners: List[Callable[[int, int, tuple, tuple], None]] = field(default_factory=list, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.question_statistics, StatisticsStore):
+            self.question_statistics = StatisticsStore(self.question_statistics)
+
+    def init_statistics(self, questions: QuestionBank, weight_policy: Optional[WeightPolicy] = None) -> None:
         # Ensures that statistics are set for all available questions
-        if not self.question_statistics:
-            self.question_statistics = {}
+        if weight_policy is not None:
+            self.weight_policy = weight_policy
+        self.bounds_until = time.time() + self.weight_policy.bound_lifetime
+        # Added questions can have tags, tag samplers are built again on their next draw
+        self.tag_samplers.clear()
         if not questions:
             return
-        for q in questions:
-            if q.id not in self.question_statistics.keys():
-                self.question_statistics[q.id] = QuestionStatistics()
-    
-    def get_statistics_for_question(self, question_id: int) -> QuestionStatistics:
+        enabled_states = list(questions.enabled_states())
+        with self.lock:
+            self.question_statistics.ensure(question_id for question_id, _ in enabled_states)
+        for question_id, enabled in enabled_states:
+            self.set_question_enabled(question_id, enabled)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.question_statistics.dirty_rows)
+
+    def get_statistics_for_question(self, question_id: int) -> Optional[QuestionStatisticsView]:
         return self.question_statistics.get(question_id)
+
+    def update_statistics(self, question_id: int, answered_correctly: bool, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        statistics = self.question_statistics[question_id]
+        if self.listeners:
+            previous = (statistics.times_answered, statistics.times_answered_correctly, statistics.weight)
+        needs_compaction = False
+        with self.lock:
+            # The answer changes the effective weight, so the time since the last answer is kept in the stored weight
+            weight = self.weight_policy.effective_weight(statistics.weight, statistics.last_answered, now)
+            statistics.update_statistics(answered_correctly, now, weight)
+            journal = self.journal
+            if journal:
+                needs_compaction = journal.append(
+                    question_id, statistics.times_answered, statistics.times_answered_correctly, statistics.weight, statistics.last_answered
+                )
+        # Compaction takes the statistics file lock before the profile lock, so it must not run while the profile lock is held
+        if needs_compaction:
+            journal.compact()
+        # Only enabled questions carry a weight in the sampler
+        if self.sampler.get_weight(question_id) > 0:
+            self._set_sampler_weight(question_id, self.weight_policy.weight_bound(statistics.weight, statistics.last_answered, self.bounds_until))
+        if self.listeners:
+            current = (statistics.times_answered, statistics.times_answered_correctly, statistics.weight)
+            for listener in self.listeners:
+                listener(self.id, question_id, previous, current)
+
+    def set_question_enabled(self, question_id: int, enabled: bool) -> None:
+        statistics = self.question_statistics.get(question_id)
+        if not enabled:
+            self._set_sampler_weight(question_id, 0.0)
+        elif statistics is None:
+            self._set_sampler_weight(question_id, QuestionStatistics.MAX_WEIGHT)
+        else:
+            self._set_sampler_weight(question_id, self.weight_policy.weight_bound(statistics.weight, statistics.last_answered, self.bounds_until))
+
+    def set_questions_enabled(self, question_ids: Iterable[int], enabled: bool) -> None:
+        for question_id in question_ids:
+            self.set_question_enabled(question_id, enabled)
+
+    # Sets the bounds of all enabled questions again, valid from `now` for the lifetime of the policy's bounds
+    def refresh_weight_bounds(self, now: float) -> None:
+        with self.lock:
+            self.bounds_until = now + self.weight_policy.bound_lifetime
+            for question_id in self.sampler.keys():
+                if self.sampler.get_weight(question_id) > 0:
+                    self.set_question_enabled(question_id, True)
+
+    def _set_sampler_weight(self, question_id: int, weight: float) -> None:
+        self.sampler.set_weight(question_id, weight)
+        for sampler in self.tag_samplers.values():
+            if question_id in sampler:
+                sampler.set_weight(question_id, weight)
+
+    # Sampler over the questions with the tag, built in time of the tag's size from the main sampler
+    def tag_sampler(self, questions: QuestionBank, tag: str) -> WeightedSampler:
+        tag = normalize_tag(tag)
+        sampler = self.tag_samplers.get(tag)
+        if sampler is None:
+            sampler = WeightedSampler()
+            for question_id in questions.tagged_ids(tag):
+                sampler.set_weight(question_id, self.sampler.get_weight(question_id))
+            self.tag_samplers[tag] = sampler
+        return sampler
+
+    def sample_questions(self, k: int = 1, now: Optional[float] = None, sampler: Optional[WeightedSampler] = None) -> List[int]:
+        # Draws k enabled question ids with replacement, in proportion to their effective weights at `now`.
+        # The sampler holds a bound of every effective weight until bounds_until, a drawn id is kept with the probability
+        # effective weight / bound. The draws are exact and the bounds only follow the time once per bound lifetime.
+        # Draws from the whole bank by default, or from a tag sampler
+        now = time.time() if now is None else now
+        if now > self.bounds_until:
+            self.refresh_weight_bounds(now)
+        sampler = sampler or self.sampler
+        question_ids = []
+        rejected = 0
+        while len(question_ids) < k:
+            question_id = sampler.sample()[0]
+            bound = sampler.get_weight(question_id)
+            statistics = self.question_statistics.get(question_id)
+            if statistics is None:
+                weight = QuestionStatistics.MAX_WEIGHT
+            else:
+                weight = self.weight_policy.effective_weight(statistics.weight, statistics.last_answered, now)
+            if random.random() * bound < weight:
+                question_ids.append(question_id)
+                rejected = 0
+            else:
+                rejected += 1
+                if rejected >= MAX_REJECTED_DRAWS:
+                    raise IndexError("Cannot sample, the effective weights of the enabled questions are 0")
+        return question_ids
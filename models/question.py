@@ -1,5 +1,18 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, List
+
+# Columns of the questions CSV file
+QUESTION_HEADERS = ["id", "title", "answer", "enabled", "choices", "aliases", "tags"]
+# Columns of files written before aliases and before tags existed
+LEGACY_QUESTION_HEADERS = [QUESTION_HEADERS[:-2], QUESTION_HEADERS[:-1]]
+
+# Tags are compared ignoring case and repeated whitespace, f.e. "Chapter  3" is the tag "chapter 3"
+def normalize_tag(tag: str) -> str:
+    return " ".join(tag.split()).lower()
+
+# Drops empty and repeated tags, keeps the order of the others
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(tag for tag in map(normalize_tag, tags) if tag))
 
 @dataclass
 class Question:
@@ -9,6 +22,10 @@ class Question:
     enabled: bool = True
     # Stores possible choices for multiple choice questions
     choices: List[str] = None
+    # Other accepted answers of free-form questions
+    aliases: List[str] = None
+    # Normalized tags grouping the question, f.e. "networking" or "chapter 3"
+    tags: List[str] = None
     
     def to_dict(self) -> dict:
         return {
@@ -16,12 +33,34 @@ class Question:
             "title": self.title,
             "answer": self.answer,
             "enabled": self.enabled,
-            "choices": self.to_choices_string()
+            "choices": self.to_choices_string(),
+            "aliases": self.to_aliases_string(),
+            "tags": self.to_tags_string()
         }
     
+    @staticmethod
+    def from_dict(line: dict) -> "Question":
+        # Inverse of to_dict, used when reading CSV rows
+        return Question(
+            id = int(line["id"]),
+            title = line["title"],
+            answer = line["answer"],
+            enabled = line["enabled"] == 'True',
+            choices = line["choices"].split("|") if line["choices"] else [],
+            # Files written before aliases existed have no aliases column
+            aliases = line["aliases"].split("|") if line.get("aliases") else [],
+            # Or no tags column
+            tags = line["tags"].split("|") if line.get("tags") else []
+        )
+    
     def is_quiz(self) -> bool:
         return self.choices is not None and len(self.choices) > 0
     
     def to_choices_string(self):
         return "|".join(self.choices) if self.choices else ""
-        
\ No newline at end of file
+    
+    def to_aliases_string(self) -> str:
+        return "|".join(self.aliases) if self.aliases else ""
+    
+    def to_tags_string(self) -> str:
+        return "|".join(self.tags) if self.tags else ""
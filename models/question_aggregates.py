@@ -0,0 +1,141 @@
+import heapq
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Weights lie between QuestionStatistics.MIN_WEIGHT and MAX_WEIGHT, every bin covers 0.1
+WEIGHT_BINS = 10
+
+# Values structure: (TimesAnswered, TimesAnsweredCorrectly, Weight)
+StatisticsValues = Tuple[int, int, float]
+# Stored row structure: (QuestionID, Learners, Attempts, Correct, WeightSum, WeightHistogram)
+StoredRow = Tuple[int, int, int, int, float, List[int]]
+
+@dataclass
+class AggregateRow:
+    question_id: int
+    learners: int
+    attempts: int
+    accuracy: float # Percent of all attempts
+    mean_weight: float
+    weight_histogram: List[int] # Learners per weight bin, lowest weights first
+
+class QuestionAggregates:
+    # Per-question totals over every profile, in the same columnar layout as StatisticsStore.
+    # Only profiles that answered a question count as its learners. The totals are built in one
+    # pass over all statistics and then kept up to date with the changes of single answers.
+    # Repositories store them and apply the changes of every save, see Repository.load_question_aggregates()
+
+    def __init__(self) -> None:
+        self._rows: Dict[int, int] = {} # Dict structure: [QuestionID, Row]
+        self.question_ids = array("q")
+        # Signed, so removing values that were never added, f.e. answers recovered from a journal after the totals
+        # were loaded, leaves the totals off instead of failing the answer that changed them
+        self.learners = array("q")
+        self.attempts = array("q")
+        self.correct = array("q")
+        self.weight_sum = array("d")
+        self.weight_histogram = array("q") # WEIGHT_BINS counters per row
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    # Records structure: (ProfileID, QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight)
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[int, int, int, int, float]]) -> "QuestionAggregates":
+        aggregates = cls()
+        for _, question_id, times_answered, times_answered_correctly, weight in records:
+            aggregates.add(question_id, times_answered, times_answered_correctly, weight)
+        return aggregates
+
+    # Restores rows written by stored_rows(), f.e. of the aggregate table a repository keeps up to date
+    @classmethod
+    def from_stored_rows(cls, rows: Iterable[StoredRow]) -> "QuestionAggregates":
+        aggregates = cls()
+        for question_id, learners, attempts, correct, weight_sum, weight_histogram in rows:
+            if len(weight_histogram) != WEIGHT_BINS:
+                raise ValueError(f"Expected {WEIGHT_BINS} weight bins, got {len(weight_histogram)}")
+            row = aggregates._row(question_id)
+            aggregates.learners[row] = learners
+            aggregates.attempts[row] = attempts
+            aggregates.correct[row] = correct
+            aggregates.weight_sum[row] = weight_sum
+            aggregates.weight_histogram[row * WEIGHT_BINS:(row + 1) * WEIGHT_BINS] = array("q", weight_histogram)
+        return aggregates
+
+    def stored_rows(self) -> Iterator[StoredRow]:
+        for row, question_id in enumerate(self.question_ids):
+            yield (
+                question_id,
+                self.learners[row],
+                self.attempts[row],
+                self.correct[row],
+                self.weight_sum[row],
+                self.weight_histogram[row * WEIGHT_BINS:(row + 1) * WEIGHT_BINS].tolist()
+            )
+
+    def add(self, question_id: int, times_answered: int, times_answered_correctly: int, weight: float) -> None:
+        self._apply(question_id, times_answered, times_answered_correctly, weight, 1)
+
+    def remove(self, question_id: int, times_answered: int, times_answered_correctly: int, weight: float) -> None:
+        self._apply(question_id, times_answered, times_answered_correctly, weight, -1)
+
+    # Profile listener, replaces the previous values of a learner with the current ones
+    def on_statistics_changed(self, profile_id: int, question_id: int, previous: StatisticsValues, current: StatisticsValues) -> None:
+        self.remove(question_id, *previous)
+        self.add(question_id, *current)
+
+    def get(self, question_id: int) -> Optional[AggregateRow]:
+        row = self._rows.get(question_id)
+        return self._to_aggregate_row(row) if row is not None else None
+
+    def select(self, limit: int = None, hardest: bool = True, min_learners: int = 1) -> List[AggregateRow]:
+        # Returns the `limit` questions with the lowest (or highest) accuracy, without rescanning any statistics
+        candidates = (row for row in range(len(self.question_ids)) if self.learners[row] >= max(min_learners, 1))
+        key = lambda row: self.correct[row] / self.attempts[row] if self.attempts[row] > 0 else 0.0
+        if limit is None:
+            rows = sorted(candidates, key=key, reverse=not hardest)
+        elif hardest:
+            rows = heapq.nsmallest(limit, candidates, key=key)
+        else:
+            rows = heapq.nlargest(limit, candidates, key=key)
+        return [self._to_aggregate_row(row) for row in rows]
+
+    def _apply(self, question_id: int, times_answered: int, times_answered_correctly: int, weight: float, sign: int) -> None:
+        if times_answered == 0:
+            return
+        row = self._row(question_id)
+        self.learners[row] += sign
+        self.attempts[row] += sign * times_answered
+        self.correct[row] += sign * times_answered_correctly
+        self.weight_sum[row] += sign * weight
+        self.weight_histogram[row * WEIGHT_BINS + weight_bin(weight)] += sign
+
+    # Returns the row of the question, adds an empty one if it has none yet
+    def _row(self, question_id: int) -> int:
+        row = self._rows.get(question_id)
+        if row is None:
+            row = self._rows[question_id] = len(self.question_ids)
+            self.question_ids.append(question_id)
+            self.learners.append(0)
+            self.attempts.append(0)
+            self.correct.append(0)
+            self.weight_sum.append(0.0)
+            self.weight_histogram.extend(array("q", [0]) * WEIGHT_BINS)
+        return row
+
+    def _to_aggregate_row(self, row: int) -> AggregateRow:
+        learners, attempts = self.learners[row], self.attempts[row]
+        return AggregateRow(
+            self.question_ids[row],
+            learners,
+            attempts,
+            self.correct[row] / attempts * 100 if attempts else 0.0,
+            self.weight_sum[row] / learners if learners else 0.0,
+            self.weight_histogram[row * WEIGHT_BINS:(row + 1) * WEIGHT_BINS].tolist()
+        )
+
+def weight_bin(weight: float) -> int:
+    # Bin i holds weights in (i / 10, (i + 1) / 10], the small offset absorbs float noise like 0.6000000001
+    return min(WEIGHT_BINS - 1, max(0, math.ceil(weight * WEIGHT_BINS - 1e-6) - 1))
@@ -0,0 +1,213 @@
+import threading
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from models.question import Question, normalize_tag, normalize_tags
+from models.question_index import DuplicateIndex, QuestionIndex
+
+if TYPE_CHECKING:
+    from helpers.answer_matcher import AnswerMatcher
+
+class QuestionBank:
+    # Holds every question in memory, in the order they are stored.
+    # The id index, highest id and enabled count are kept up to date on every change,
+    # so lookups, toggles and inserts never scan the bank.
+    # Questions are only changed through the bank, which records the ids that have to be saved.
+
+    def __init__(self, questions: Optional[Iterable[Question]] = None) -> None:
+        self.questions: List[Question] = []
+        self._by_id: Dict[int, Question] = {}
+        self.max_id = -1
+        self.enabled_count = 0
+        self._init_tracking()
+        self._enabled_columns = (array("q"), bytearray())
+        for question in questions or []:
+            self.append(question)
+
+    def _init_tracking(self) -> None:
+        # Held while the bank is changed or saved, saves can run on the autosave thread
+        self.lock = threading.RLock()
+        self.added_ids: Set[int] = set()
+        self.changed_ids: Set[int] = set() # Saved questions that were changed since
+        # Called after every change, f.e. to schedule an autosave
+        self.on_change: Optional[Callable[[], None]] = None
+        # Search and duplicate indexes are built on first use, then kept up to date by append()
+        self._index: Optional[QuestionIndex] = None
+        self._duplicates: Optional[DuplicateIndex] = None
+        # Dict structure: [QuestionID, AnswerMatcher], built when a question is first graded
+        self._matchers: Dict[int, "AnswerMatcher"] = {}
+        # Dict structure: [Tag, [QuestionIDs]], ids of every tag in storage order, and [Tag, EnabledCount].
+        # Built on first use like the search index, then kept up to date by append() and set_enabled()
+        self._tags: Optional[Dict[str, List[int]]] = None
+        self._tag_enabled_counts: Dict[str, int] = {}
+        # (QuestionIDs, EnabledFlags) in storage order. Kept up to date by append(), built again on first use after a toggle
+        self._enabled_columns: Optional[Tuple[array, bytearray]] = None
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    @property
+    def index(self) -> QuestionIndex:
+        with self.lock:
+            if self._index is None:
+                self._index = QuestionIndex.build(self.scan())
+            return self._index
+
+    # Returns the id of an exact or near duplicate of the question, if the bank has one
+    def find_duplicate(self, title: str, answer: str) -> Optional[int]:
+        with self.lock:
+            if self._duplicates is None:
+                self._duplicates = DuplicateIndex.build(self.scan(), self.get)
+        return self._duplicates.find_duplicate(title, answer)
+
+    # Answers and aliases of a question never change once it is in the bank, so its matcher is kept
+    def answer_matcher(self, question_id: int) -> "AnswerMatcher":
+        matcher = self._matchers.get(question_id)
+        if matcher is None:
+            # The matcher, with unicodedata, is only imported once the first answer is graded
+            from helpers.answer_matcher import AnswerMatcher
+            matcher = self._matchers[question_id] = AnswerMatcher.for_question(self.get(question_id))
+        return matcher
+
+    # Iterates every question without keeping it in memory, used to build the indexes
+    def scan(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    # Yields (QuestionID, Tags) pairs, snapshot banks decode only the tags
+    def question_tags(self) -> Iterator[Tuple[int, List[str]]]:
+        for question in self.scan():
+            yield question.id, question.tags or []
+
+    @property
+    def tag_index(self) -> Dict[str, List[int]]:
+        with self.lock:
+            if self._tags is None:
+                self._tags = {}
+                for question_id, tags in self.question_tags():
+                    self._add_tags(question_id, tags, self.is_enabled(question_id))
+            return self._tags
+
+    # Sorted names of every tag in the bank
+    def tags(self) -> List[str]:
+        return sorted(self.tag_index)
+
+    # Ids of the questions with the tag in storage order, without scanning the bank
+    def tagged_ids(self, tag: str, enabled_only: bool = False) -> List[int]:
+        question_ids = self.tag_index.get(normalize_tag(tag), [])
+        if enabled_only:
+            return [question_id for question_id in question_ids if self.is_enabled(question_id)]
+        return list(question_ids)
+
+    def tag_enabled_count(self, tag: str) -> int:
+        tag = normalize_tag(tag)
+        with self.lock:
+            return self._tag_enabled_counts.get(tag, 0) if tag in self.tag_index else 0
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.added_ids or self.changed_ids)
+
+    # Loaders and repositories call this once the bank matches the stored questions
+    def mark_saved(self) -> None:
+        self.added_ids.clear()
+        self.changed_ids.clear()
+
+    def get(self, question_id: int) -> Optional[Question]:
+        return self._by_id.get(question_id)
+
+    def ids(self) -> List[int]:
+        return [q.id for q in self.questions]
+
+    # Id of the question at the given position in storage order, used to draw random questions
+    def id_at(self, position: int) -> int:
+        return self.questions[position].id
+
+    def is_enabled(self, question_id: int) -> bool:
+        question = self.get(question_id)
+        return question is not None and question.enabled
+
+    # Yields (QuestionID, Enabled) pairs without materializing questions in lazy banks
+    def enabled_states(self) -> Iterator[Tuple[int, bool]]:
+        for q in self.questions:
+            yield q.id, q.enabled
+
+    # Ids and enabled flags of every question as typed columns, f.e. to filter statistics with NumPy.
+    # Returns copies, so views of them never keep later appends from resizing the columns
+    def enabled_columns(self) -> Tuple[array, bytearray]:
+        with self.lock:
+            if self._enabled_columns is None:
+                self._enabled_columns = self._build_enabled_columns()
+            ids, enabled = self._enabled_columns
+            return ids[:], enabled[:]
+
+    def _build_enabled_columns(self) -> Tuple[array, bytearray]:
+        return array("q", [q.id for q in self.questions]), bytearray([q.enabled for q in self.questions])
+
+    def append(self, question: Question) -> None:
+        with self.lock:
+            self.questions.append(question)
+            self._by_id[question.id] = question
+            self._track_append(question)
+        self._changed()
+
+    # Lazy banks release their file handle, in-memory banks have nothing to release
+    def close(self) -> None:
+        pass
+
+    # Returns False if there is no question with the given id
+    def set_enabled(self, question_id: int, enabled: bool) -> bool:
+        with self.lock:
+            question = self.get(question_id)
+            if question is None:
+                return False
+            if not self._set_enabled(question, enabled):
+                return True
+        self._changed()
+        return True
+
+    # Enables or disables every question with the tag as one change.
+    # Returns the ids of the questions that changed
+    def set_tag_enabled(self, tag: str, enabled: bool) -> List[int]:
+        with self.lock:
+            changed = [question_id for question_id in self.tagged_ids(tag) if self._set_enabled(self.get(question_id), enabled)]
+        if changed:
+            self._changed()
+        return changed
+
+    def _set_enabled(self, question: Question, enabled: bool) -> bool:
+        if question.enabled == enabled:
+            return False
+        question.enabled = enabled
+        self.enabled_count += 1 if enabled else -1
+        self._enabled_columns = None
+        if self._tags is not None:
+            for tag in normalize_tags(question.tags or []):
+                self._tag_enabled_counts[tag] += 1 if enabled else -1
+        if question.id not in self.added_ids:
+            self.changed_ids.add(question.id)
+        return True
+
+    def _track_append(self, question: Question) -> None:
+        self.max_id = max(self.max_id, question.id)
+        self.enabled_count += 1 if question.enabled else 0
+        self.added_ids.add(question.id)
+        if self._enabled_columns is not None:
+            self._enabled_columns[0].append(question.id)
+            self._enabled_columns[1].append(question.enabled)
+        if self._index is not None:
+            self._index.add(question)
+        if self._duplicates is not None:
+            self._duplicates.add(question)
+        if self._tags is not None:
+            self._add_tags(question.id, question.tags or [], question.enabled)
+
+    def _add_tags(self, question_id: int, tags: List[str], enabled: bool) -> None:
+        for tag in normalize_tags(tags):
+            self._tags.setdefault(tag, []).append(question_id)
+            self._tag_enabled_counts[tag] = self._tag_enabled_counts.get(tag, 0) + (1 if enabled else 0)
+
+    def _changed(self) -> None:
+        if self.on_change:
+            self.on_change()
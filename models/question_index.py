@@ -0,0 +1,192 @@
+import re
+from array import array
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from models.question import Question
+from helpers.optional_import import optional_import
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Shorter last query tokens are matched as whole words, longer ones also as word prefixes
+MIN_PREFIX_LENGTH = 3
+
+# MinHash signatures have SIGNATURE_BINS values, split into bands of BAND_ROWS values.
+# Questions sharing any band are compared, so similar titles meet without pairwise comparison
+SIGNATURE_BINS = 16
+BAND_ROWS = 2
+# Jaccard similarity of the title shingles above which questions with the same answer are duplicates
+DUPLICATE_THRESHOLD = 0.6
+HASH_MASK = (1 << 64) - 1
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def normalize(text: str) -> str:
+    # Ignores case, punctuation and repeated whitespace
+    return " ".join(tokenize(text))
+
+class QuestionIndex:
+    # Inverted index from the words of question titles and answers to sorted question ids
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, array] = {} # Dict structure: [Token, sorted QuestionIDs]
+        self._vocabulary: Optional[List[str]] = None # Sorted tokens, built on the first prefix search
+
+    @classmethod
+    def build(cls, questions: Iterable[Question]) -> "QuestionIndex":
+        index = cls()
+        for question in questions:
+            for token in set(tokenize(question.title)) | set(tokenize(question.answer)):
+                postings = index._postings.get(token)
+                if postings is None:
+                    postings = index._postings[token] = array("q")
+                postings.append(question.id)
+        # Banks are usually stored in id order, then the postings are sorted already
+        for token, postings in index._postings.items():
+            if any(postings[i] > postings[i + 1] for i in range(len(postings) - 1)):
+                index._postings[token] = array("q", sorted(postings))
+        return index
+
+    def add(self, question: Question) -> None:
+        for token in set(tokenize(question.title)) | set(tokenize(question.answer)):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("q")
+                if self._vocabulary is not None:
+                    insort(self._vocabulary, token)
+            if not postings or postings[-1] < question.id:
+                postings.append(question.id)
+            else:
+                position = bisect_left(postings, question.id)
+                if position == len(postings) or postings[position] != question.id:
+                    postings.insert(position, question.id)
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[int]:
+        # Returns the ids of questions containing every word of the text, the last word may be a prefix
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        exact_tokens, last_token = tokens[:-1], tokens[-1]
+        postings = [self._postings.get(token) for token in exact_tokens]
+        if not all(postings):
+            return []
+
+        if len(last_token) >= MIN_PREFIX_LENGTH:
+            matches = self._prefix_matches(last_token)
+            if not matches:
+                return []
+            # A single matching word keeps its sorted postings, several are merged
+            postings.append(matches[0] if len(matches) == 1 else array("q", sorted(set().union(*matches))))
+        else:
+            last_postings = self._postings.get(last_token)
+            if last_postings is None:
+                return []
+            postings.append(last_postings)
+
+        postings.sort(key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            result = _intersect(result, other)
+            if not len(result):
+                return []
+        return result[:limit].tolist()
+
+    def _prefix_matches(self, prefix: str) -> List[array]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        matches = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            matches.append(self._postings[self._vocabulary[position]])
+            position += 1
+        return matches
+
+def _intersect(first, second):
+    # Keeps the ids of the shorter sorted postings that are also in the longer ones.
+    # NumPy is optional, without it postings are intersected with a binary search per id
+    np = optional_import("numpy")
+    if np is not None:
+        first, second = np.frombuffer(first, dtype=np.int64), np.frombuffer(second, dtype=np.int64)
+        positions = np.searchsorted(second, first)
+        found = positions < len(second)
+        found[found] = second[positions[found]] == first[found]
+        return first[found]
+    return array("q", (question_id for question_id in first if _contains(second, question_id)))
+
+def _contains(postings: array, question_id: int) -> bool:
+    position = bisect_left(postings, question_id)
+    return position < len(postings) and postings[position] == question_id
+
+def shingles(title: str) -> Set[str]:
+    # Words and word pairs of the normalized title
+    tokens = tokenize(title)
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    union = len(first | second)
+    return len(first & second) / union if union else 1.0
+
+def signature(title_shingles: Set[str]) -> Tuple[int, ...]:
+    # One permutation MinHash: every shingle is hashed once and kept as the minimum of its bin.
+    # Empty bins borrow the value of the next filled bin, so short titles still get comparable bands
+    bins = [None] * SIGNATURE_BINS
+    for shingle in title_shingles:
+        value = hash(shingle) & HASH_MASK
+        position = value % SIGNATURE_BINS
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    if all(value is None for value in bins):
+        return tuple(bins)
+
+    filled = []
+    for position in range(SIGNATURE_BINS):
+        offset = 0
+        while bins[(position + offset) % SIGNATURE_BINS] is None:
+            offset += 1
+        filled.append((bins[(position + offset) % SIGNATURE_BINS], offset))
+    return tuple(hash(value) for value in filled)
+
+class DuplicateIndex:
+    # Finds exact and near duplicate questions. Exact duplicates share the normalized title and answer,
+    # near duplicates share a MinHash band, have the same answer and similar title shingles.
+    # Python string hashes are salted per process, so the index only lives in memory.
+
+    def __init__(self, get_question: Callable[[int], Optional[Question]]) -> None:
+        self.get_question = get_question
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    @classmethod
+    def build(cls, questions: Iterable[Question], get_question: Callable[[int], Optional[Question]]) -> "DuplicateIndex":
+        index = cls(get_question)
+        for question in questions:
+            index.add(question)
+        return index
+
+    def add(self, question: Question) -> None:
+        self._exact.setdefault((normalize(question.title), normalize(question.answer)), question.id)
+        for band in self._band_keys(signature(shingles(question.title))):
+            self._bands.setdefault(band, []).append(question.id)
+
+    def find_duplicate(self, title: str, answer: str) -> Optional[int]:
+        # Returns the id of an exact or near duplicate question, if there is one
+        answer = normalize(answer)
+        question_id = self._exact.get((normalize(title), answer))
+        if question_id is not None:
+            return question_id
+
+        title_shingles = shingles(title)
+        checked = set()
+        for band in self._band_keys(signature(title_shingles)):
+            for question_id in self._bands.get(band, []):
+                if question_id in checked:
+                    continue
+                checked.add(question_id)
+                question = self.get_question(question_id)
+                if (question is not None and normalize(question.answer) == answer
+                        and jaccard(title_shingles, shingles(question.title)) >= DUPLICATE_THRESHOLD):
+                    return question_id
+        return None
+
+    def _band_keys(self, values: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, values[band * BAND_ROWS:(band + 1) * BAND_ROWS]) for band in range(SIGNATURE_BINS // BAND_ROWS)]
@@ -1,21 +1,31 @@
+import time
 from dataclasses import dataclass
+from typing import ClassVar, Optional
 
-@dataclass
+@dataclass(slots=True)
 class QuestionStatistics:
     times_answered: int = 0
     times_answered_correctly: int = 0
     weight: float = 1.0
+    last_answered: float = 0.0 # Seconds since the epoch, 0 if never answered
 
-    WEIGHT_INCREMENT: float = 0.2
-    MAX_WEIGHT: float = 1.0
-    MIN_WEIGHT: float = 0.1
+    WEIGHT_INCREMENT: ClassVar[float] = 0.2
+    MAX_WEIGHT: ClassVar[float] = 1.0
+    MIN_WEIGHT: ClassVar[float] = 0.1
 
-    def update_statistics(self, answered_correctly: bool) -> None:
-        self.weight += self.WEIGHT_INCREMENT if answered_correctly else -self.WEIGHT_INCREMENT
-        if self.weight > self.MAX_WEIGHT:
-            self.weight = self.MAX_WEIGHT
-        elif self.weight < self.MIN_WEIGHT:
-            self.weight = self.MIN_WEIGHT
+    @classmethod
+    def next_weight(cls, weight: float, answered_correctly: bool) -> float:
+        weight += cls.WEIGHT_INCREMENT if answered_correctly else -cls.WEIGHT_INCREMENT
+        if weight > cls.MAX_WEIGHT:
+            return cls.MAX_WEIGHT
+        elif weight < cls.MIN_WEIGHT:
+            return cls.MIN_WEIGHT
+        return weight
+
+    # `weight` is the effective weight at the time of the answer, see models/weight_policy.py. The stored weight by default
+    def update_statistics(self, answered_correctly: bool, answered_at: Optional[float] = None, weight: Optional[float] = None) -> None:
+        self.weight = self.next_weight(self.weight if weight is None else weight, answered_correctly)
+        self.last_answered = time.time() if answered_at is None else answered_at
         
         self.times_answered += 1
         if answered_correctly:
@@ -28,5 +38,6 @@ class QuestionStatistics:
             "question_id": question_id,
             "times_answered": self.times_answered,
             "times_answered_correctly": self.times_answered_correctly,
-            "weight": round(self.weight, 2)
-        }
\ No newline at end of file
+            "weight": round(self.weight, 2),
+            "last_answered": round(self.last_answered, 3)
+        }
@@ -0,0 +1,116 @@
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import ClassVar, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+SECONDS_PER_DAY = 86400
+# Share of draws that introduce a question which was never reviewed, while reviews are due
+NEW_QUESTION_RATE = 0.2
+
+@dataclass(slots=True)
+class ReviewState:
+    # SM-2 scheduling state of a single question
+    repetitions: int = 0
+    interval: float = 0.0 # Days until the next review
+    ease: float = 2.5
+    due: float = 0.0 # Unix timestamp
+
+    MIN_EASE: ClassVar[float] = 1.3
+    # Answers are only right or wrong, they are graded on the SM-2 scale of 0 - 5
+    CORRECT_QUALITY: ClassVar[int] = 4
+    INCORRECT_QUALITY: ClassVar[int] = 1
+
+    def review(self, quality: int, now: float) -> None:
+        if quality < 3:
+            # Lapses start the repetitions over and keep the ease
+            self.repetitions = 0
+            self.interval = 1.0
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1.0
+            elif self.repetitions == 2:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.ease, 2)
+            self.ease = max(self.MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.due = now + self.interval * SECONDS_PER_DAY
+
+    def to_dict(self, profile_id: int, question_id: int) -> dict:
+        return {
+            "profile_id": profile_id,
+            "question_id": question_id,
+            "repetitions": self.repetitions,
+            "interval": self.interval,
+            "ease": round(self.ease, 2),
+            "due": round(self.due, 3)
+        }
+
+class ReviewSchedule:
+    # Spaced-repetition queue of a profile. Reviewed questions sit in a min-heap keyed by due time,
+    # never reviewed questions wait in a FIFO queue and are mixed in at `new_question_rate`.
+    # Heap entries are not removed when a question is reviewed again, outdated entries
+    # are skipped when they reach the top, so every draw and review is O(log n).
+
+    def __init__(self, states: Optional[Dict[int, ReviewState]] = None, new_question_rate: float = NEW_QUESTION_RATE) -> None:
+        self.states: Dict[int, ReviewState] = states or {} # Dict structure: [QuestionID, ReviewState]
+        self.new_question_rate = new_question_rate
+        self.dirty_ids: Set[int] = set()
+        self._heap: List[Tuple[float, int]] = []
+        self._new: Deque[int] = deque()
+        self._new_credit = 0.0
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._new)
+
+    def start(self, question_ids: Iterable[int]) -> None:
+        # Queues the given (enabled) questions with a single heapify
+        self._heap = []
+        self._new = deque()
+        for question_id in question_ids:
+            state = self.states.get(question_id)
+            if state is None:
+                self._new.append(question_id)
+            else:
+                self._heap.append((state.due, question_id))
+        heapq.heapify(self._heap)
+
+    def due_count(self, now: float) -> int:
+        return sum(1 for due, _ in self._heap if due <= now)
+
+    def next_question(self, now: float) -> Optional[int]:
+        # Returns the question to ask without removing it, it is requeued when it is reviewed
+        self._drop_outdated()
+        is_review_due = bool(self._heap) and self._heap[0][0] <= now
+
+        self._new_credit = min(1.0, self._new_credit + self.new_question_rate)
+        if self._new and (self._new_credit >= 1.0 or not is_review_due):
+            if is_review_due:
+                self._new_credit -= 1.0
+            return self._new[0]
+        if self._heap:
+            # Nothing is due: the earliest review is asked ahead of time
+            return self._heap[0][1]
+        return None
+
+    def review(self, question_id: int, answered_correctly: bool, now: float) -> ReviewState:
+        state = self.states.get(question_id)
+        if state is None:
+            state = self.states[question_id] = ReviewState()
+            if self._new and self._new[0] == question_id:
+                self._new.popleft()
+            elif question_id in self._new:
+                self._new.remove(question_id)
+
+        state.review(ReviewState.CORRECT_QUALITY if answered_correctly else ReviewState.INCORRECT_QUALITY, now)
+        heapq.heappush(self._heap, (state.due, question_id))
+        self.dirty_ids.add(question_id)
+        return state
+
+    def _drop_outdated(self) -> None:
+        while self._heap:
+            due, question_id = self._heap[0]
+            state = self.states.get(question_id)
+            if state is not None and state.due == due:
+                return
+            heapq.heappop(self._heap)
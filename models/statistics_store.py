@@ -0,0 +1,207 @@
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+from models.question_statistics import QuestionStatistics
+
+class StatisticsStore:
+    # Columnar storage of a profile's question statistics. Every column is a typed
+    # array and a question id maps to a row, so a statistic costs a few bytes
+    # instead of a dataclass instance. Supports the dict operations used on
+    # Profile.question_statistics and hands out lightweight views per question.
+
+    def __init__(self, statistics: Optional[Dict[int, QuestionStatistics]] = None) -> None:
+        self._rows: Dict[int, int] = {} # Dict structure: [QuestionID, Row]
+        self.question_ids = array("q")
+        self.times_answered = array("I")
+        self.times_answered_correctly = array("I")
+        self.weight = array("d")
+        self.last_answered = array("d") # Seconds since the epoch, 0 if never answered
+        # Rows changed since the last save, with their (TimesAnswered, TimesAnsweredCorrectly, Weight) before the first change.
+        # Saves merge the difference into the stored counts and replace the previous values in the stored aggregates.
+        # Defaults added by ensure() are not stored until answered
+        self.dirty_rows: Dict[int, Tuple[int, int, float]] = {}
+        for question_id, question_statistics in (statistics or {}).items():
+            self[question_id] = question_statistics
+
+    @classmethod
+    def from_columns(cls, question_ids, times_answered, times_answered_correctly, weight, last_answered=None) -> "StatisticsStore":
+        # Wraps existing columns without copying, f.e. typed memoryviews of a memory mapped snapshot.
+        # Rows can be changed in place, the columns are copied into arrays once a row is added.
+        # Without a last answered column no question counts as answered before
+        store = cls()
+        store.question_ids = question_ids
+        store.times_answered = times_answered
+        store.times_answered_correctly = times_answered_correctly
+        store.weight = weight
+        store.last_answered = last_answered if last_answered is not None else array("d", bytes(8 * len(question_ids)))
+        store._rows = dict(zip(question_ids, range(len(question_ids))))
+        return store
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def __contains__(self, question_id: int) -> bool:
+        return question_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.question_ids)
+
+    def __getitem__(self, question_id: int) -> "QuestionStatisticsView":
+        return QuestionStatisticsView(self, self._rows[question_id])
+
+    def __setitem__(self, question_id: int, statistics: Union[QuestionStatistics, "QuestionStatisticsView"]) -> None:
+        self.set_values(question_id, statistics.times_answered, statistics.times_answered_correctly, statistics.weight, statistics.last_answered)
+
+    def get(self, question_id: int) -> Optional["QuestionStatisticsView"]:
+        row = self._rows.get(question_id)
+        return QuestionStatisticsView(self, row) if row is not None else None
+
+    def keys(self) -> Iterator[int]:
+        return iter(self.question_ids)
+
+    def items(self) -> Iterator[Tuple[int, "QuestionStatisticsView"]]:
+        for row, question_id in enumerate(self.question_ids):
+            yield question_id, QuestionStatisticsView(self, row)
+
+    def row_of(self, question_id: int) -> Optional[int]:
+        return self._rows.get(question_id)
+
+    # Returns the (TimesAnswered, TimesAnsweredCorrectly) of the question as of the last save
+    def baseline(self, question_id: int) -> Tuple[int, int]:
+        row = self._rows[question_id]
+        base = self.dirty_rows.get(row)
+        return base[:2] if base else (self.times_answered[row], self.times_answered_correctly[row])
+
+    # Must be called before the row is changed
+    def mark_dirty(self, row: int) -> None:
+        if row not in self.dirty_rows:
+            self.dirty_rows[row] = (self.times_answered[row], self.times_answered_correctly[row], self.weight[row])
+
+    # Without a last answered time the stored one is kept, new rows count as never answered
+    def set_values(
+        self,
+        question_id: int,
+        times_answered: int,
+        times_answered_correctly: int,
+        weight: float,
+        last_answered: Optional[float] = None
+    ) -> None:
+        row = self._rows.get(question_id)
+        if row is None:
+            self._make_resizable()
+            self.dirty_rows[len(self.question_ids)] = (0, 0, QuestionStatistics.MAX_WEIGHT)
+            self._rows[question_id] = len(self.question_ids)
+            self.question_ids.append(question_id)
+            self.times_answered.append(times_answered)
+            self.times_answered_correctly.append(times_answered_correctly)
+            self.weight.append(weight)
+            self.last_answered.append(last_answered or 0.0)
+            return
+
+        self.mark_dirty(row)
+        self.times_answered[row] = times_answered
+        self.times_answered_correctly[row] = times_answered_correctly
+        self.weight[row] = weight
+        if last_answered is not None:
+            self.last_answered[row] = last_answered
+
+    def ensure(self, question_ids: Iterable[int]) -> None:
+        # Adds default statistics for missing questions with one resize per column
+        missing = [question_id for question_id in question_ids if question_id not in self._rows]
+        if not missing:
+            return
+
+        self._make_resizable()
+        first_row = len(self.question_ids)
+        self._rows.update(zip(missing, range(first_row, first_row + len(missing))))
+        self.question_ids.extend(missing)
+        self.times_answered.extend(array("I", [0]) * len(missing))
+        self.times_answered_correctly.extend(array("I", [0]) * len(missing))
+        self.weight.extend(array("d", [QuestionStatistics.MAX_WEIGHT]) * len(missing))
+        self.last_answered.extend(array("d", [0.0]) * len(missing))
+
+    def copy(self) -> "StatisticsStore":
+        # Column copies are plain memory copies, cheap enough to snapshot a profile before a background save
+        store = StatisticsStore()
+        store._rows = self._rows.copy()
+        store.question_ids = _to_array("q", self.question_ids)
+        store.times_answered = _to_array("I", self.times_answered)
+        store.times_answered_correctly = _to_array("I", self.times_answered_correctly)
+        store.weight = _to_array("d", self.weight)
+        store.last_answered = _to_array("d", self.last_answered)
+        store.dirty_rows = self.dirty_rows.copy()
+        return store
+
+    def _make_resizable(self) -> None:
+        if isinstance(self.question_ids, array):
+            return
+        self.question_ids = _to_array("q", self.question_ids)
+        self.times_answered = _to_array("I", self.times_answered)
+        self.times_answered_correctly = _to_array("I", self.times_answered_correctly)
+        self.weight = _to_array("d", self.weight)
+        self.last_answered = _to_array("d", self.last_answered)
+
+    # `weight` is the effective weight at the time of the answer, the stored weight by default
+    def update_statistics(self, row: int, answered_correctly: bool, answered_at: Optional[float] = None, weight: Optional[float] = None) -> None:
+        self.mark_dirty(row)
+        self.weight[row] = QuestionStatistics.next_weight(self.weight[row] if weight is None else weight, answered_correctly)
+        self.last_answered[row] = time.time() if answered_at is None else answered_at
+        self.times_answered[row] += 1
+        if answered_correctly:
+            self.times_answered_correctly[row] += 1
+
+def _to_array(typecode: str, column) -> array:
+    # Copies the raw column bytes, much faster than converting every value
+    result = array(typecode)
+    result.frombytes(memoryview(column).cast("B"))
+    return result
+
+class QuestionStatisticsView:
+    # Reads and writes one row of a StatisticsStore, with the QuestionStatistics API
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: StatisticsStore, row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def times_answered(self) -> int:
+        return self._store.times_answered[self._row]
+
+    @times_answered.setter
+    def times_answered(self, value: int) -> None:
+        self._store.mark_dirty(self._row)
+        self._store.times_answered[self._row] = value
+
+    @property
+    def times_answered_correctly(self) -> int:
+        return self._store.times_answered_correctly[self._row]
+
+    @times_answered_correctly.setter
+    def times_answered_correctly(self, value: int) -> None:
+        self._store.mark_dirty(self._row)
+        self._store.times_answered_correctly[self._row] = value
+
+    @property
+    def weight(self) -> float:
+        return self._store.weight[self._row]
+
+    @weight.setter
+    def weight(self, value: float) -> None:
+        self._store.mark_dirty(self._row)
+        self._store.weight[self._row] = value
+
+    @property
+    def last_answered(self) -> float:
+        return self._store.last_answered[self._row]
+
+    @last_answered.setter
+    def last_answered(self, value: float) -> None:
+        self._store.mark_dirty(self._row)
+        self._store.last_answered[self._row] = value
+
+    def update_statistics(self, answered_correctly: bool, answered_at: Optional[float] = None, weight: Optional[float] = None) -> None:
+        self._store.update_statistics(self._row, answered_correctly, answered_at, weight)
+
+    def to_dict(self, profile_id: int, question_id: int) -> dict:
+        return QuestionStatistics.to_dict(self, profile_id, question_id)
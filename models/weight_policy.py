@@ -0,0 +1,49 @@
+import math
+from models.question_statistics import QuestionStatistics
+from models.review_schedule import SECONDS_PER_DAY
+
+# A weight policy turns the stored weight of a question and the time it was last answered into the weight
+# it is drawn with in Practice Mode. Effective weights are only computed for drawn questions and answers,
+# the stored weights never have to be rewritten as time passes.
+# Effective weights have to stay positive for enabled questions, or they would never be drawn.
+
+# Days after which half of the weight change of past answers is forgotten
+DECAY_HALF_LIFE_DAYS = 30.0
+# Part of the half life that weight bounds stay valid, f.e. 22.5 hours of 30 days. The distance of a weight
+# to MAX_WEIGHT only shrinks by about 2% in that time, so draws of questions at MIN_WEIGHT are kept 84% of the time
+BOUND_LIFETIME_HALF_LIVES = 1 / 32
+
+class WeightPolicy:
+    # Weights only change when questions are answered
+    # Seconds that weight bounds stay valid, the profile sets the bounds of its sampler again after that
+    bound_lifetime = math.inf
+
+    def effective_weight(self, weight: float, last_answered: float, now: float) -> float:
+        return weight
+
+    # Largest effective weight a question with this stored weight reaches at any time until `until`.
+    # The profile's sampler holds it, draws are then thinned to the effective weight
+    def weight_bound(self, weight: float, last_answered: float, until: float) -> float:
+        return weight
+
+class DecayingWeightPolicy(WeightPolicy):
+    # The distance of the weight to QuestionStatistics.MAX_WEIGHT, the weight of a question that was never answered,
+    # halves every half life after the last answer, so answers given long ago count less and less.
+    # Questions that were never answered do not decay
+
+    def __init__(self, half_life_days: float = DECAY_HALF_LIFE_DAYS) -> None:
+        self.half_life = half_life_days * SECONDS_PER_DAY
+        self.bound_lifetime = self.half_life * BOUND_LIFETIME_HALF_LIVES
+
+    def effective_weight(self, weight: float, last_answered: float, now: float) -> float:
+        if last_answered <= 0 or now <= last_answered:
+            return weight
+        return QuestionStatistics.MAX_WEIGHT - (QuestionStatistics.MAX_WEIGHT - weight) * 0.5 ** ((now - last_answered) / self.half_life)
+
+    def weight_bound(self, weight: float, last_answered: float, until: float) -> float:
+        # Weights below MAX_WEIGHT rise up to their value at `until`, weights above it only fall
+        return max(weight, self.effective_weight(weight, last_answered, until))
+
+# Policy of the --weight-half-life option, 0 days turns decay off
+def create_weight_policy(half_life_days: float = DECAY_HALF_LIFE_DAYS) -> WeightPolicy:
+    return DecayingWeightPolicy(half_life_days) if half_life_days > 0 else WeightPolicy()
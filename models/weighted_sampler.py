@@ -0,0 +1,105 @@
+import random
+from typing import Dict, List
+
+
+class WeightedSampler:
+    # Fenwick (binary indexed) tree of weights keyed by question id.
+    # Setting a weight and drawing a key are both O(log n), so practice mode
+    # no longer rebuilds the weight list for the whole bank on every draw.
+    # A weight of 0 keeps the key in the tree but means it is never drawn.
+
+    def __init__(self) -> None:
+        self._tree: List[float] = [0.0] # 1-based Fenwick array
+        self._weights: List[float] = []
+        self._keys: List[int] = []
+        self._positions: Dict[int, int] = {} # Dict structure: [Key, Index in self._keys]
+        self.positive_count = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._positions
+
+    def keys(self) -> List[int]:
+        return list(self._keys)
+
+    def get_weight(self, key: int) -> float:
+        position = self._positions.get(key)
+        return self._weights[position] if position is not None else 0.0
+
+    def set_weight(self, key: int, weight: float) -> None:
+        weight = max(weight, 0.0)
+        position = self._positions.get(key)
+        if position is None:
+            self._append(key, weight)
+            return
+
+        previous = self._weights[position]
+        if previous == weight:
+            return
+        self._weights[position] = weight
+        self._count_change(previous, weight)
+
+        delta = weight - previous
+        i = position + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self) -> float:
+        total = 0.0
+        i = len(self._keys)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def sample(self, k: int = 1) -> List[int]:
+        # Draws k keys with replacement, like random.choices
+        total = self.total()
+        if self.positive_count == 0 or total <= 0:
+            raise IndexError("Cannot sample from a sampler without positive weights")
+
+        return [self._find(random.random() * total) for _ in range(k)]
+
+    def _append(self, key: int, weight: float) -> None:
+        self._positions[key] = len(self._keys)
+        self._keys.append(key)
+        self._weights.append(weight)
+        self._count_change(0.0, weight)
+
+        # The new node covers (i - lowbit(i), i], so it sums its own weight with
+        # the already existing nodes of that range
+        i = len(self._keys)
+        node = weight
+        j = i - 1
+        stop = i - (i & -i)
+        while j > stop:
+            node += self._tree[j]
+            j -= j & -j
+        self._tree.append(node)
+
+    def _find(self, target: float) -> int:
+        # Binary lifting: finds the first index whose prefix sum exceeds target
+        size = len(self._keys)
+        index = 0
+        step = 1 << size.bit_length()
+        while step:
+            next_index = index + step
+            if next_index <= size and self._tree[next_index] <= target:
+                index = next_index
+                target -= self._tree[index]
+            step >>= 1
+
+        # Floating point drift can land on a zero weight key or past the end
+        index = min(index, size - 1)
+        while self._weights[index] <= 0:
+            index = (index + 1) % size
+        return self._keys[index]
+
+    def _count_change(self, previous: float, weight: float) -> None:
+        if previous <= 0 < weight:
+            self.positive_count += 1
+        elif weight <= 0 < previous:
+            self.positive_count -= 1
@@ -1,29 +1,121 @@
 import sys
 import os
 import csv
-from tabulate import tabulate
+import argparse
+import time
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from enums.mode import ModeEnum
 from helpers import user_input_helper
 from models.question_statistics import QuestionStatistics
 from models.profile import Profile
-from models.question import Question
-import helpers.csv_helper as csv_helper
+from models.question import Question, normalize_tags
+from models.question_bank import QuestionBank
 import helpers.question_helper as question_helper
+import helpers.statistics_helper as statistics_helper
+import helpers.table_helper as table_helper
+import helpers.import_helper as import_helper
+from models.review_schedule import NEW_QUESTION_RATE
+from models.weight_policy import DECAY_HALF_LIFE_DAYS, WeightPolicy, create_weight_policy
+from helpers.autosave import AUTOSAVE_DEBOUNCE, AUTOSAVE_INTERVAL, AutosaveWorker
+from helpers.prefetch import Prefetch
+from repositories.repository import Repository
+from repositories.csv_repository import CsvRepository
+from session import cli_adapter, engine, protocol, scripted_adapter
 import random
 
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Quizly - Interactive Learning Tool")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv", help="Storage backend for questions, profiles and statistics")
+    parser.add_argument("--database", help="Path of the SQLite database used by the sqlite backend, data/quizly.db by default")
+    parser.add_argument("--lazy-questions", action="store_true", help="Read questions from the CSV file on demand, for very large question banks")
+    parser.add_argument("--snapshots", action="store_true", help="Store questions and statistics in memory mapped binary snapshots instead of CSV files")
+    parser.add_argument("--record", help="Append the answers given in Practice and Test Mode to this JSONL file, for the replay command")
+    parser.add_argument("--new-question-rate", type=float, default=NEW_QUESTION_RATE, help="Share of questions in Spaced Repetition Mode that were never reviewed before")
+    parser.add_argument("--autosave-interval", type=float, default=AUTOSAVE_INTERVAL, help="Save changes at least this often, in seconds. 0 saves only on quit")
+    parser.add_argument("--tag", help="Only ask questions with this tag in Practice and Test Mode")
+    parser.add_argument("--weight-half-life", type=float, default=DECAY_HALF_LIFE_DAYS, help="Days after which Practice Mode forgets half of the weight change of past answers, 0 turns forgetting off")
+    parser.add_argument("--autosave-debounce", type=float, default=AUTOSAVE_DEBOUNCE, help="Save early once no changes were made for this many seconds")
+    
+    subparsers = parser.add_subparsers(dest="command")
+    import_parser = subparsers.add_parser("import", help="Import questions from a CSV or JSONL file")
+    import_parser.add_argument("file", help="CSV file with title, answer, enabled and choices columns, or JSONL file with the same keys")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="File format, detected from the file extension by default")
+    import_parser.add_argument("--chunk-size", type=int, default=import_helper.IMPORT_CHUNK_SIZE, help="Number of rows validated and written at once")
+    import_parser.add_argument("--allow-duplicates", action="store_true", help="Import rows that duplicate existing or earlier rows")
+    import_parser.add_argument("--report", help="Path of the rejected rows report, defaults to <file>.rejected.csv")
+    
+    serve_parser = subparsers.add_parser("serve", help="Serve practice and test sessions to many players over TCP")
+    serve_parser.add_argument("--host", default=protocol.DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=protocol.DEFAULT_PORT)
+    serve_parser.add_argument("--flush-interval", type=float, default=protocol.FLUSH_INTERVAL, help="Seconds between background saves of the statistics")
+    
+    analytics_parser = subparsers.add_parser("analytics", help="Show the hardest or easiest questions over every profile")
+    analytics_parser.add_argument("--limit", type=int, default=20, help="Number of questions to show")
+    analytics_parser.add_argument("--order", choices=["hardest", "easiest"], default="hardest")
+    analytics_parser.add_argument("--min-learners", type=int, default=1, help="Only show questions answered by at least this many profiles")
+    
+    replay_parser = subparsers.add_parser("replay", help="Replay a recorded answer stream and measure answers per second")
+    replay_parser.add_argument("file", help="JSONL recording written with --record")
+    replay_parser.add_argument("--profile", default="default", help="Name of the profile that answers the questions")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="Number of times the recording is replayed")
+    replay_parser.add_argument("--persist", action="store_true", help="Keep the replayed answers in the profile statistics")
+    
+    grade_parser = subparsers.add_parser("grade", help="Grade offline answer sheets and add them to the profile statistics")
+    grade_parser.add_argument("file", help='JSONL file, one {"profile": ..., "question_id": ..., "answer": ...} object per line')
+    grade_parser.add_argument("--workers", type=int, help="Number of grading processes, one per CPU by default")
+    grade_parser.add_argument("--chunk-size", type=int, help="Number of lines graded at once by a process")
+    
+    papers_parser = subparsers.add_parser("papers", help="Generate different seeded test papers for a whole class")
+    papers_parser.add_argument("--count", type=int, required=True, help="Number of papers")
+    papers_parser.add_argument("--questions", type=int, required=True, help="Number of questions on every paper")
+    papers_parser.add_argument("--seed", type=int, help="Seed of the papers, random by default")
+    papers_parser.add_argument("--stratify", action="store_true", help="Take the same number of easy, medium, hard and unanswered questions for every paper")
+    papers_parser.add_argument("--workers", type=int, help="Number of drawing processes, one per CPU by default")
+    papers_parser.add_argument("--output", default="papers.jsonl", help="Path of the JSONL file the papers are written to")
+    return parser.parse_args()
+
+def create_repository(args: argparse.Namespace) -> Repository:
+    if args.backend == "sqlite":
+        # sqlite3 is only imported for the sqlite backend
+        from repositories.sqlite_repository import DATABASE_FILE_PATH, SqliteRepository
+        return SqliteRepository(args.database or DATABASE_FILE_PATH)
+    return CsvRepository(args.lazy_questions, args.snapshots)
+
 def main():
+    args = parse_arguments()
+    if args.command == "import":
+        return import_questions(args)
+    if args.command == "replay":
+        return replay_answers(args)
+    if args.command == "analytics":
+        return show_analytics(args)
+    if args.command == "serve":
+        return serve(args)
+    if args.command == "grade":
+        return grade_answer_sheets(args)
+    if args.command == "papers":
+        return generate_papers(args)
+    
     print("Welcome to Quizly!")
-    questions = csv_helper.load_questions()
+    repository = create_repository(args)
+    # The menu is shown right away, the questions and the default profile are loaded while it is read.
     # Use default profile until player selects or creates another profile
-    profile = csv_helper.load_profile_with_statistics("default")
-    profile.init_statistics(questions)
+    weight_policy = create_weight_policy(args.weight_half_life)
+    prefetch = Prefetch(lambda: load_session_data(repository, "default", weight_policy))
+    questions, profile, autosave = None, None, None
 
     while True:
-        print(f"Current Profile: '{profile.name}', id: {profile.id}")
+        print(f"Current Profile: '{profile.name}', id: {profile.id}" if profile else "Current Profile: 'default'")
         try:
             mode = user_input_helper.select_mode()
+            if profile is None:
+                questions, profile = prefetch.result()
+                if args.autosave_interval > 0:
+                    autosave = AutosaveWorker(repository.save_changes, args.autosave_interval, args.autosave_debounce)
+                    autosave.watch(questions, profile)
+                    autosave.start()
+            
             match mode:
                 case ModeEnum.ADD_QUESTIONS:
                     add_questions(questions)
@@ -31,67 +123,204 @@ def main():
                 case ModeEnum.VIEW_STATISTICS:
                     view_statistics(questions, profile)
                 case ModeEnum.ENABLE_OR_DISABLE_QUESTIONS:
-                    enable_or_disable_questions(questions)
+                    enable_or_disable_questions(questions, profile)
                 case ModeEnum.PRACTICE_MODE:
-                    practice_mode(profile, questions)
+                    practice_mode(profile, questions, args.record, args.tag)
                 case ModeEnum.TEST_MODE:
-                    test_mode(profile, questions)
+                    test_mode(profile, questions, args.record, args.tag)
+                case ModeEnum.SPACED_REPETITION_MODE:
+                    spaced_repetition_mode(repository, profile, questions, args.new_question_rate, args.record)
+                case ModeEnum.SEARCH_QUESTIONS:
+                    search_questions(questions)
                 case ModeEnum.SELECT_PROFILE:
-                    profile = select_profile(profile)
-                    profile.init_statistics(questions)
+                    profile = select_profile(repository, profile)
+                    profile.init_statistics(questions, weight_policy)
+                    if autosave:
+                        autosave.watch(questions, profile)
                 case ModeEnum.QUIT:
                     print("Saving...")
-                    csv_helper.save_questions(questions)
-                    csv_helper.save_question_statistics(profile)
+                    save_and_close(repository, questions, profile, autosave)
                     sys.exit("\nThanks for playing!")
         except KeyboardInterrupt:
             print("\nSaving...")
-            csv_helper.save_questions(questions)
-            csv_helper.save_question_statistics(profile)
+            if profile is None:
+                questions, profile = prefetch.result()
+            save_and_close(repository, questions, profile, autosave)
             sys.exit("\nThanks for playing!")
+
+def load_session_data(repository: Repository, profile_name: str, weight_policy: Optional[WeightPolicy] = None) -> Tuple[QuestionBank, Profile]:
+    questions = repository.load_questions()
+    profile = repository.load_profile_with_statistics(profile_name)
+    profile.init_statistics(questions, weight_policy)
+    return questions, profile
+
+def save_and_close(repository: Repository, questions: QuestionBank, profile: Profile, autosave: Optional[AutosaveWorker] = None) -> None:
+    if autosave:
+        autosave.stop()
+    # Nothing is written if there were no changes since the last save
+    if questions.is_dirty:
+        repository.save_questions(questions)
+        print("Successfully saved questions!")
+    if profile.is_dirty:
+        repository.save_question_statistics(profile)
+        print("Successfully saved question statistics!")
+    repository.close_statistics_journal(profile)
+    questions.close()
+    repository.close()
+
+def import_questions(args: argparse.Namespace) -> None:
+    repository = create_repository(args)
+    file_format = args.format or import_helper.detect_format(args.file)
+    try:
+        report = import_helper.import_questions(repository, args.file, file_format, args.chunk_size, args.allow_duplicates)
+    finally:
+        repository.close()
+    
+    print(f"Imported {report.imported_count} question(s), rejected {len(report.rejected)} row(s).")
+    if report.rejected:
+        report_file_path = args.report or args.file + ".rejected.csv"
+        import_helper.write_rejected_report(report, report_file_path)
+        print(f"Rejected rows were written to {report_file_path}")
+    
+def serve(args: argparse.Namespace) -> None:
+    # asyncio is only imported when the server is started
+    import asyncio
+    from session import server
+    quiz_server = server.QuizServer(lambda: create_repository(args), args.flush_interval, create_weight_policy(args.weight_half_life))
+    try:
+        asyncio.run(quiz_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        # The server saves the statistics while shutting down
+        print("Server stopped.")
+    
+def show_analytics(args: argparse.Namespace) -> None:
+    repository = create_repository(args)
+    questions = repository.load_questions()
+    try:
+        # Kept up to date by every save, the statistics of every profile are not scanned
+        aggregates = repository.load_question_aggregates()
+        rows = aggregates.select(args.limit, args.order == "hardest", args.min_learners)
+        
+        data = []
+        for row in rows:
+            q = questions.get(row.question_id)
+            data.append([
+                row.question_id,
+                q.title if q else "(deleted)",
+                row.learners,
+                row.attempts,
+                round(row.accuracy),
+                round(row.mean_weight, 2),
+                table_helper.sparkline(row.weight_histogram)
+            ])
+    finally:
+        questions.close()
+        repository.close()
+    
+    if not data:
+        return print("No question was answered by enough profiles yet!")
+    columns = ["Question ID", "Title", "Learners", "Attempts", "Accuracy (%)", "Mean Weight", "Weights 0.1 - 1.0"]
+    print(table_helper.render(data, columns))
     
-def add_questions(questions: List[Question]) -> None:
+def replay_answers(args: argparse.Namespace) -> None:
+    repository = create_repository(args)
+    questions, profile = load_session_data(repository, args.profile, create_weight_policy(args.weight_half_life))
+    if not args.persist:
+        # Without the journal the replayed answers only change the statistics in memory
+        repository.close_statistics_journal(profile)
+    
+    try:
+        report = scripted_adapter.replay(profile, questions, scripted_adapter.read_recording(args.file), args.repeat)
+        if args.persist:
+            repository.save_changes(questions, profile)
+            repository.close_statistics_journal(profile)
+    finally:
+        questions.close()
+        repository.close()
+    
+    print(f"Replayed {report.answered} answer(s), {report.correct} correct, {report.skipped} skipped.")
+    print(f"{report.seconds:.3f} s, {report.answers_per_second:.0f} answers per second")
+    
+def grade_answer_sheets(args: argparse.Namespace) -> None:
+    # Worker processes are only imported when grading
+    from session import batch_grading
+    repository = create_repository(args)
+    questions = repository.load_questions()
+    try:
+        report = batch_grading.grade_answer_sheets(
+            repository, questions, args.file, args.workers, args.chunk_size, create_weight_policy(args.weight_half_life)
+        )
+    finally:
+        questions.close()
+        repository.close()
+    
+    print(f"Graded {report.graded} answer(s) of {report.profiles} profile(s), {report.correct} correct.")
+    if report.invalid or report.unknown:
+        print(f"Skipped {report.invalid} invalid line(s) and {report.unknown} answer(s) to unknown questions.")
+    if report.created_profiles:
+        print(f"Created {report.created_profiles} new profile(s).")
+    print(f"{report.seconds:.3f} s, {report.answers_per_second:.0f} answers per second with {report.workers} worker(s) "
+          f"(grading {report.grading_seconds:.3f} s, saving {report.saving_seconds:.3f} s)")
+    
+def generate_papers(args: argparse.Namespace) -> None:
+    # Worker processes are only imported when generating papers
+    from session import paper_generator
+    repository = create_repository(args)
+    questions = repository.load_questions()
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    try:
+        # Difficulties come from the answers of every profile
+        aggregates = repository.load_question_aggregates() if args.stratify else None
+        start = time.perf_counter()
+        papers = paper_generator.generate_papers(questions, args.count, args.questions, seed, aggregates, args.workers)
+        paper_generator.write_papers(questions, papers, args.output)
+        seconds = time.perf_counter() - start
+    except engine.SessionError as e:
+        return print(e)
+    finally:
+        questions.close()
+        repository.close()
+    
+    print(f"Wrote {len(papers)} paper(s) of {args.questions} question(s) with seed {seed} to {args.output} in {seconds:.3f} s.")
+    
+def add_questions(questions: QuestionBank) -> None:
     print("Please provide following details to add new questions.\n")
     
-    # In case there were no questions in the file, start ids from 0
+    # In case there were no questions in the file, ids start from 0
     previous_count = len(questions)
-    if previous_count == 0:
-        highest_id = 0
-    else:
-        highest_id = 0
-        for question in questions:
-            highest_id = max(highest_id, question.id)
         
     while True:
         try:
-            print(f"Question {highest_id + 1}.")
+            next_id = questions.max_id + 1
+            print(f"Question {next_id}.")
             
             question_type = user_input_helper.get_question_type()
             
+            title = input("Title: ").capitalize().strip()
+            answer = input("Answer: ").strip()
+            choices = []
+            aliases = []
             if question_type == '1':
-                title = input("Title: ").capitalize().strip()
-                answer = input("Answer: ").strip()
-                choices = []
-                for i in range(2):
+                for i in range(question_helper.QUIZ_CHOICE_COUNT):
                     choices.append(input(f"Choice {i + 1}: ").strip())
-                
-                if not title or not answer or not all(choices):
-                    print("Title, Answer or Choices can not be empty! Please try again. \n")
-                    continue
-                else:
-                    questions.append(Question(highest_id, title, answer, choices=choices))
+            else:
+                aliases = [alias.strip() for alias in input("Other accepted answers, separated by '|' (optional): ").split("|") if alias.strip()]
+            tags = normalize_tags(input("Tags, separated by '|' (optional): ").split("|"))
             
-            elif question_type == '2':
-                title = input("Title: ").capitalize().strip()
-                answer = input("Answer: ").strip()
-
-                if not title or not answer:
-                    print("Title or Answer can not be empty! Please try again. \n")
+            error = question_helper.validate_question(title, answer, choices)
+            if error:
+                print(f"{error} Please try again. \n")
+                continue
+            
+            duplicate_id = questions.find_duplicate(title, answer)
+            if duplicate_id is not None:
+                duplicate = questions.get(duplicate_id)
+                print(f"Question {duplicate_id} looks the same: '{duplicate.title}', answer: '{duplicate.answer}'.")
+                if input("Add it anyway? [y/n]: ").strip().lower() != 'y':
+                    print()
                     continue
-                else:
-                    questions.append(Question(highest_id, title, answer))
-                
-            highest_id += 1
+            
+            questions.append(Question(next_id, title, answer, choices=choices or None, aliases=aliases, tags=tags))
                 
             while True:
                 decision = input("Would you like to enter another question? [y/n]: ").strip().lower()
@@ -109,7 +338,7 @@ def add_questions(questions: List[Question]) -> None:
             print(f"Exiting. Successfully added {len(questions) - previous_count} new questions!")
             return questions
                 
-def view_statistics(questions: List[Question], profile: Profile) -> None:
+def view_statistics(questions: QuestionBank, profile: Profile) -> None:
     print("\nWelcome to Statistics View!")
     
     if len(questions) == 0:
@@ -117,197 +346,177 @@ def view_statistics(questions: List[Question], profile: Profile) -> None:
         return
     
     order = user_input_helper.get_order_type()
+    limit = user_input_helper.get_row_limit()
+    min_attempts = user_input_helper.get_min_attempts()
+    enabled_only = user_input_helper.get_enabled_only()
     
     print(f"Displaying statistics for '{profile.name}' profile...")
     
-    data = []
-    for q in questions:
-        stat = profile.get_statistics_for_question(q.id)
-        if stat.times_answered != 0:
-            score = round(stat.times_answered_correctly / stat.times_answered * 100)
-        else:
-            score = 0
-        data.append([
+    rows = statistics_helper.select_statistics(
+        profile,
+        questions,
+        limit=limit,
+        descending=order == "descending",
+        enabled_only=enabled_only,
+        min_attempts=min_attempts
+    )
+    if not rows:
+        print("No questions match the selected filters!\n")
+        return
+    
+    # Rows are only turned into table rows when their page is shown
+    def to_table_row(row: statistics_helper.StatisticsRow) -> list:
+        q = questions.get(row.question_id)
+        return [
             q.id,
             q.title,
             q.answer,
             q.enabled,
-            score
-        ])
+            row.attempts,
+            round(row.weight, 2),
+            round(row.score)
+        ]
 
-    reverse_order = order == "descending"
-    # Using lambda, sort by score
-    data.sort(key=lambda x: x[4], reverse=reverse_order)
+    # Searches the index, then keeps the selected rows in their order
+    def search_rows(text: str) -> list:
+        matches = set(question_helper.search_questions(questions, text))
+        return [row for row in rows if row.question_id in matches]
 
-    columns = ["Question ID", "Title", "Answer", "Enabled", "Score (%)"]
-    print(tabulate(data, headers=columns, tablefmt="grid"))
-    print()
+    columns = ["Question ID", "Title", "Answer", "Enabled", "Attempts", "Weight", "Score (%)"]
+    table_helper.paginate(
+        columns,
+        rows,
+        to_table_row,
+        search=search_rows
+    )
 
-def enable_or_disable_questions(questions: List[Question]) -> None:
+def search_questions(questions: QuestionBank) -> None:
+    print("\nWelcome to Search Mode!")
+    if len(questions) == 0:
+        return print("Unable to search if no questions are found!\n")
+    
+    def to_table_row(question_id: int) -> list:
+        q = questions.get(question_id)
+        return [q.id, q.title, q.answer, q.enabled]
+    
+    columns = ["Question ID", "Title", "Answer", "Enabled"]
+    print("Type words of a question title or answer, or a question ID. Press Enter to go back.")
+    while True:
+        text = input("Search: ").strip()
+        if not text:
+            print()
+            return
+        
+        start = time.perf_counter()
+        question_ids = question_helper.search_questions(questions, text)
+        print(f"Found {len(question_ids)} question(s) in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        if question_ids:
+            table_helper.paginate(columns, question_ids, to_table_row)
+    
+def enable_or_disable_questions(questions: QuestionBank, profile: Profile) -> None:
     if len(questions) == 0:
         print("Unable to enable/disable questions if no questions are found!\n")
         return questions
     
-    data = [[q.id, q.title, q.answer, q.enabled] for q in questions]
+    def to_table_row(question_id: int) -> list:
+        q = questions.get(question_id)
+        return [q.id, q.title, q.answer, q.enabled]
+    
     columns = ["Question ID", "Title", "Answer", "Enabled"]
-    print(tabulate(data, headers=columns, tablefmt="grid"))
+    print("Search for the question you wish to change, then quit the table to select it.")
+    table_helper.paginate(columns, questions.ids(), to_table_row, search=lambda text: question_helper.search_questions(questions, text))
     
-    print("\nPlease select ID of a question you wish to disable/enable.")
+    print("Please select ID of a question, or a tag of questions, you wish to disable/enable.")
     while True:
-        try:
-            question_id = int(input("ID: "))
-        except ValueError:
-            print("Invalid ID! Try again.")
+        text = input("ID or tag: ").strip()
+        question = questions.get(int(text)) if text.isdigit() else None
+        if question is None:
+            if questions.tagged_ids(text):
+                return enable_or_disable_tag(questions, profile, text)
+            print("Invalid ID or tag! Try again.")
             continue
+        question_id = question.id
         
-        index = -1
-        for i, q in enumerate(questions):
-            if q.id == question_id:
-                q.enabled = not q.enabled
-                index = i
-                break
-        
-        if index == -1:
-            print("Invalid ID! Try again.")
-            continue
+        questions.set_enabled(question_id, not question.enabled)
+        profile.set_question_enabled(question_id, question.enabled)
         
         print(f"\nSuccessfully changed question {question_id} enabled status!\n")
-        print(tabulate([data[index]], headers=columns, tablefmt="grid"))
+        print(table_helper.render([to_table_row(question_id)], columns))
         print()
         return
     
-def practice_mode(profile: Profile, questions: List[Question]) -> None:
-    print("\nWelcome to Practice Mode!")
-    if len(questions) < 5:
-        print("Please create at least 5 questions before starting Practice Mode.\n")
-        return
+# Every question with the tag is changed at once, instead of one toggle per question
+def enable_or_disable_tag(questions: QuestionBank, profile: Profile, tag: str) -> None:
+    tagged_count = len(questions.tagged_ids(tag))
+    while True:
+        decision = input(f"Enable or disable all {tagged_count} question(s) tagged '{tag}'? [e/d]: ").strip().lower()
+        if decision in ['e', 'd']:
+            break
+        print("Please enter either 'e' or 'd'.")
     
-    enabled_count = 0
-    for q in questions:
-        enabled_count += 1 if q.enabled else 0
+    enabled = decision == 'e'
+    changed_ids = questions.set_tag_enabled(tag, enabled)
+    profile.set_questions_enabled(changed_ids, enabled)
+    print(f"\nSuccessfully {'enabled' if enabled else 'disabled'} {len(changed_ids)} question(s) tagged '{tag}'!\n")
     
-    if enabled_count < 5:
-        print("Please enable at least 5 questions before starting Practice Mode.\n")
-        return
+def practice_mode(profile: Profile, questions: QuestionBank, record_file_path: Optional[str] = None, tag: Optional[str] = None) -> None:
+    print("\nWelcome to Practice Mode!")
+    try:
+        session = engine.create_practice_session(profile, questions, tag=tag)
+    except engine.SessionError as e:
+        return print(f"{e}\n")
     
+    cli_adapter.run_session(session)
+    if record_file_path:
+        scripted_adapter.write_recording(record_file_path, session)
     
-    while True:
-        print("If you wish to quit, type 'quit'.\n")
-        
-        question = question_helper.get_random_questions(profile, questions)[0]
-        correct_answer = question.answer
-        print(f"Question: {question.title}")
-        
-        if question.is_quiz():
-            # creating a copy here to not alter question.choices itself
-            choices = question.choices.copy()
-            choices.append(correct_answer)
-        
-            random.shuffle(choices)
-
-            print("Choices: ")
-            print("A: ", choices[0])
-            print("B: ", choices[1])
-            print("C: ", choices[2])
-
-            answer_input = user_input_helper.get_user_test_answer()
-            if answer_input == "quit":
-                print("Exiting...")
-                return print("You can view your statistics in Statistics View!\n")
-
-            # Get the answer from the choices list
-            user_answer = choices['abc'.index(answer_input)]
-        else:        
-            user_answer = input("Answer: ").strip()
-            
-            if user_answer == "quit":
-                print("Exiting...")
-                return print("You can view your statistics in Statistics View!\n")
-
-        if user_answer.lower() == correct_answer.lower():    
-            print("\nCorrect!\n")
-            profile.get_statistics_for_question(question.id).update_statistics(True)
-        else:
-            print(f"\nIncorrect! Correct answer: {correct_answer}\n")
-            profile.get_statistics_for_question(question.id).update_statistics(False)
-    
-def test_mode(profile: Profile, questions: List[Question]) -> None:
+def test_mode(profile: Profile, questions: QuestionBank, record_file_path: Optional[str] = None, tag: Optional[str] = None) -> None:
     print("\nWelcome to Test Mode!")
     
-    if len(questions) < 5:
-        return print("Please create at least 5 questions before starting Practice Mode.\n")
-    
-    enabled_count = 0
-    for q in questions:
-        enabled_count += 1 if q.enabled else 0
+    if len(questions) < engine.MIN_SESSION_QUESTIONS:
+        return print(f"Please create at least {engine.MIN_SESSION_QUESTIONS} questions before starting Test Mode.\n")
     
     try:
         question_count = int(input("Please enter the amount of questions in the test: "))
     except ValueError:
-        print("Invalid number! Try again.")
+        return print("Invalid number! Try again.\n")
     
-    if enabled_count < question_count:
-        return print(f"Please enable at least {enabled_count - question_count} questions before starting Test Mode.\n")
-        
-    total_questions = len(questions)
-    if question_count > total_questions:
-        print(f"\nQuestion bank contains {total_questions} questions.")
-        return print(f"Please add at least {question_count - total_questions} more question(s) to create a test of such size.\n")
-    
-    random.shuffle(questions)
-    test_questions = questions[:question_count]
-    correct_answers = 0
-    for question in test_questions:
-        print("If you wish to quit, type 'quit'.\n")
-
-        correct_answer = question.answer
-        print(f"Question: {question.title}")
-        
-        if question.is_quiz():
-            # creating a copy here to not alter question.choices itself
-            choices = question.choices.copy()
-            choices.append(correct_answer)
-            random.shuffle(choices)
-            
-            print("Choices: ")
-            print("A: ", choices[0])
-            print("B: ", choices[1])
-            print("C: ", choices[2])
-        
-            answer_input = user_input_helper.get_user_test_answer()
-            if answer_input == "quit":
-                print("Exiting...")
-                return print("You can view your statistics in Statistics View!\n")
-
-            # Get the answer from the choices list
-            user_answer = choices['abc'.index(answer_input)]
-        else:
-            user_answer = input("Answer: ").strip()
-            
-            if user_answer == "quit":
-                print("Exiting...")
-                return print("You can view your statistics in Statistics View!\n")
-        
-        if user_answer.lower() == correct_answer.lower():    
-            print("\nCorrect!\n")
-            correct_answers += 1
-            profile.get_statistics_for_question(question.id).update_statistics(True)
-        else:
-            print(f"\nIncorrect! Correct answer: {correct_answer}\n")
-            profile.get_statistics_for_question(question.id).update_statistics(False)
-        
-    print(f"Test completed! You answered {correct_answers} out of {question_count} questions correctly!\n")
+    try:
+        session = engine.create_test_session(profile, questions, question_count, tag=tag)
+    except engine.SessionError as e:
+        return print(f"{e}\n")
+    
+    cli_adapter.run_session(session)
+    if record_file_path:
+        scripted_adapter.write_recording(record_file_path, session)
+    
+def spaced_repetition_mode(repository: Repository, profile: Profile, questions: QuestionBank, new_question_rate: float, record_file_path: Optional[str] = None) -> None:
+    print("\nWelcome to Spaced Repetition Mode!")
+    schedule = repository.load_review_schedule(profile)
+    schedule.new_question_rate = new_question_rate
+    try:
+        session = engine.create_review_session(profile, questions, schedule)
+    except engine.SessionError as e:
+        return print(f"{e}\n")
+    
+    print(f"{schedule.due_count(time.time())} question(s) are due for review.\n")
+    try:
+        cli_adapter.run_session(session)
+    finally:
+        repository.save_review_schedule(profile, schedule)
+    if record_file_path:
+        scripted_adapter.write_recording(record_file_path, session)
     
-def select_profile(profile: Profile) -> Profile:
+def select_profile(repository: Repository, profile: Profile) -> Profile:
     choice = user_input_helper.select_profile()
 
-    if profile and profile.question_statistics:
+    if profile and profile.is_dirty:
         print("Saving current profile question statistics...\n")
-        csv_helper.save_question_statistics(profile)
+        repository.save_question_statistics(profile)
 
     if choice == "select":
         print("Loading available profiles...\n")
-        profiles = csv_helper.load_profile_names()
+        profiles = repository.load_profile_names()
         
         if len(profiles) <= 1:
             print("Please add more profiles before selecting!\n")
@@ -316,7 +525,7 @@ def select_profile(profile: Profile) -> Profile:
         data = [[profile.id, profile.name] for profile in profiles]
         columns = ["Profile ID", "Name"]
         
-        print(tabulate(data, columns, tablefmt="grid"))
+        print(table_helper.render(data, columns))
         
         print("\nPlease type the ID of the profile you would like to select.")
         while True:
@@ -330,7 +539,7 @@ def select_profile(profile: Profile) -> Profile:
             for p in profiles:
                 if p.id == profile_id:
                     # Load profile with statistics
-                    new_profile = csv_helper.load_profile_statistics(Profile(p.id, p.name, None))
+                    new_profile = repository.load_profile_statistics(Profile(p.id, p.name, None))
                     break
                 
             if not new_profile:
@@ -338,17 +547,19 @@ def select_profile(profile: Profile) -> Profile:
                 continue
             
             print(f"You successfully selected profile: {profile.name.title()}!\n")
+            repository.close_statistics_journal(profile)
             return new_profile
     else:
-        profile_id = csv_helper.find_profile_max_id()
+        profile_id = repository.find_profile_max_id()
         while True:
             name = input("Enter new profile name: ").strip().lower()
             new_profile = Profile(profile_id + 1, name, None)
-            if not csv_helper.create_new_profile(new_profile):
+            if not repository.create_new_profile(new_profile):
                 print("Please enter a name which has not been used before.\n")
             else: 
                 print(f"Successfully created a new profile {name.title()}!\n")
-                return new_profile
+                repository.close_statistics_journal(profile)
+                return repository.load_profile_statistics(new_profile)
     
 
 if __name__ == "__main__":
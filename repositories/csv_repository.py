@@ -0,0 +1,59 @@
+from typing import Iterator, List, Tuple
+import helpers.csv_helper as csv_helper
+from models.profile import Profile
+from models.question_aggregates import QuestionAggregates
+from models.question import Question
+from models.question_bank import QuestionBank
+from models.review_schedule import ReviewSchedule
+from repositories.repository import Repository
+
+class CsvRepository(Repository):
+    # Stores everything in the CSV files of the data folder.
+    # With snapshots, questions and statistics are stored in binary snapshots next to them instead
+
+    def __init__(self, lazy_questions: bool = False, snapshots: bool = False) -> None:
+        self.lazy_questions = lazy_questions
+        self.snapshots = snapshots
+        csv_helper.migrate_question_statistics()
+
+    def load_questions(self) -> QuestionBank:
+        return csv_helper.load_question_bank(self.lazy_questions, self.snapshots)
+
+    def save_questions(self, questions: QuestionBank) -> None:
+        csv_helper.save_questions(questions)
+
+    def append_questions(self, questions: List[Question]) -> None:
+        csv_helper.append_questions(questions, self.snapshots)
+
+    def create_new_profile(self, profile: Profile) -> bool:
+        return csv_helper.create_new_profile(profile)
+
+    def find_profile_max_id(self) -> int:
+        return csv_helper.find_profile_max_id()
+
+    def load_profile_with_statistics(self, profile_name: str) -> Profile:
+        return csv_helper.load_profile_with_statistics(profile_name, self.snapshots)
+
+    def load_profile_names(self) -> List[Profile]:
+        return csv_helper.load_profile_names()
+
+    def load_profile_statistics(self, profile: Profile) -> Profile:
+        return csv_helper.load_profile_statistics(profile, self.snapshots)
+
+    def save_question_statistics(self, profile: Profile) -> None:
+        csv_helper.save_question_statistics(profile, self.snapshots)
+
+    def close_statistics_journal(self, profile: Profile) -> None:
+        csv_helper.close_statistics_journal(profile)
+
+    def iter_question_statistics(self) -> Iterator[Tuple[int, int, int, int, float]]:
+        return csv_helper.iter_question_statistics(self.snapshots)
+
+    def load_question_aggregates(self) -> QuestionAggregates:
+        return csv_helper.load_question_aggregates(self.snapshots)
+
+    def load_review_schedule(self, profile: Profile) -> ReviewSchedule:
+        return csv_helper.load_review_schedule(profile)
+
+    def save_review_schedule(self, profile: Profile, schedule: ReviewSchedule) -> None:
+        csv_helper.save_review_schedule(profile, schedule)
@@ -0,0 +1,48 @@
+import argparse
+import helpers.csv_helper as csv_helper
+from helpers.snapshot import write_questions_snapshot, write_statistics_snapshot
+from models.question_bank import QuestionBank
+
+# Converts the CSV files of the data folder into binary snapshots, or the snapshots back into CSV files.
+# Usage: python -m repositories.csv_to_snapshot [--to-csv]
+
+def convert_to_snapshots() -> None:
+    questions = csv_helper.load_questions()
+    write_questions_snapshot(csv_helper.QUESTIONS_SNAPSHOT_FILE_PATH, questions)
+
+    profiles = csv_helper.load_profile_names()
+    for profile in profiles:
+        # Loading also replays a leftover journal
+        profile = csv_helper.load_profile_statistics(profile)
+        csv_helper.close_statistics_journal(profile)
+        write_statistics_snapshot(csv_helper.get_profile_snapshot_file_path(profile.id), profile.question_statistics)
+
+    print(f"Converted {len(questions)} question(s) and {len(profiles)} profile(s) into snapshots!")
+
+def convert_to_csv() -> None:
+    snapshot_questions = csv_helper.load_question_bank(snapshot=True)
+    questions = QuestionBank(snapshot_questions.scan())
+    snapshot_questions.close()
+    csv_helper.save_questions(questions)
+
+    profiles = csv_helper.load_profile_names()
+    for profile in profiles:
+        # Loading also replays a leftover journal, nothing is dirty afterwards, so the rows are written as they are
+        profile = csv_helper.load_profile_statistics(profile, snapshot=True)
+        csv_helper.close_statistics_journal(profile)
+        csv_helper.write_profile_statistics(profile)
+
+    print(f"Converted {len(questions)} question(s) and {len(profiles)} profile(s) into CSV files!")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Quizly CSV data files into binary snapshots and back.")
+    parser.add_argument("--to-csv", action="store_true", help="Convert the snapshots back into CSV files")
+    args = parser.parse_args()
+
+    if args.to_csv:
+        convert_to_csv()
+    else:
+        convert_to_snapshots()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+from repositories.csv_repository import CsvRepository
+from repositories.sqlite_repository import DATABASE_FILE_PATH, SqliteRepository, statistics_row
+
+# Imports the CSV files of the data folder into a SQLite database.
+# Usage: python -m repositories.csv_to_sqlite [--database data/quizly.db]
+
+def import_csv_data(source: CsvRepository, target: SqliteRepository) -> None:
+    questions = source.load_questions()
+    # The loaded bank counts as saved, so every question is written explicitly
+    target.append_questions(questions)
+
+    profiles = source.load_profile_names()
+    for profile in profiles:
+        target.create_new_profile(profile)
+        # Loading through the CSV repository also replays a leftover journal
+        profile = source.load_profile_statistics(profile)
+        source.close_statistics_journal(profile)
+        target.upsert_question_statistics(
+            statistics_row(profile.id, question_id, statistics)
+            for question_id, statistics in profile.question_statistics.items()
+        )
+
+    print(f"Imported {len(questions)} question(s) and {len(profiles)} profile(s)!")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the Quizly CSV data files into a SQLite database.")
+    parser.add_argument("--database", default=DATABASE_FILE_PATH, help="Path of the SQLite database")
+    args = parser.parse_args()
+
+    target = SqliteRepository(args.database)
+    try:
+        import_csv_data(CsvRepository(), target)
+    finally:
+        target.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Tuple
+from models.profile import Profile
+from models.question_aggregates import QuestionAggregates
+from models.question import Question
+from models.question_bank import QuestionBank
+from models.review_schedule import ReviewSchedule
+
+class Repository(ABC):
+    # Persistence of questions, profiles and question statistics.
+    # Method names follow helpers/csv_helper.py, which backs the CSV implementation.
+
+    @abstractmethod
+    def load_questions(self) -> QuestionBank:
+        pass
+
+    @abstractmethod
+    def save_questions(self, questions: QuestionBank) -> None:
+        pass
+
+    # Adds new questions in one batch, without rewriting the stored questions
+    @abstractmethod
+    def append_questions(self, questions: List[Question]) -> None:
+        pass
+
+    # Returns False if a profile with the same name already exists
+    @abstractmethod
+    def create_new_profile(self, profile: Profile) -> bool:
+        pass
+
+    @abstractmethod
+    def find_profile_max_id(self) -> int:
+        pass
+
+    # Falls back to the default profile if no profile has the given name
+    @abstractmethod
+    def load_profile_with_statistics(self, profile_name: str) -> Profile:
+        pass
+
+    @abstractmethod
+    def load_profile_names(self) -> List[Profile]:
+        pass
+
+    # Loads the statistics of the profile and attaches a journal receiving its answers
+    @abstractmethod
+    def load_profile_statistics(self, profile: Profile) -> Profile:
+        pass
+
+    @abstractmethod
+    def save_question_statistics(self, profile: Profile) -> None:
+        pass
+
+    @abstractmethod
+    def close_statistics_journal(self, profile: Profile) -> None:
+        pass
+
+    # Streams (ProfileID, QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight) of every profile
+    @abstractmethod
+    def iter_question_statistics(self) -> Iterator[Tuple[int, int, int, int, float]]:
+        pass
+
+    # Per-question totals over the saved statistics of every profile. Saves keep them up to date,
+    # so loading them does not scan the statistics of every profile
+    @abstractmethod
+    def load_question_aggregates(self) -> QuestionAggregates:
+        pass
+
+    # Spaced-repetition states of the profile, kept apart from the question statistics
+    @abstractmethod
+    def load_review_schedule(self, profile: Profile) -> ReviewSchedule:
+        pass
+
+    # Writes nothing if no question was reviewed since the last save
+    @abstractmethod
+    def save_review_schedule(self, profile: Profile, schedule: ReviewSchedule) -> None:
+        pass
+
+    # Saves only what changed since the last save, a session without edits writes nothing.
+    # Returns True if anything was written
+    def save_changes(self, questions: QuestionBank, profile: Profile) -> bool:
+        saved = False
+        if questions.is_dirty:
+            self.save_questions(questions)
+            saved = True
+        if profile.is_dirty:
+            self.save_question_statistics(profile)
+            saved = True
+        return saved
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,388 @@
+import os
+import sqlite3
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from helpers.statistics_journal import JOURNAL_SYNC_INTERVAL
+from models.profile import Profile
+from models.question_aggregates import WEIGHT_BINS, QuestionAggregates
+from models.question import Question
+from models.question_bank import QuestionBank
+from models.review_schedule import ReviewSchedule, ReviewState
+from models.statistics_store import QuestionStatisticsView, StatisticsStore
+from repositories.repository import Repository
+
+DATABASE_FILE_PATH = "data/quizly.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    enabled INTEGER NOT NULL,
+    choices TEXT NOT NULL,
+    aliases TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS question_statistics (
+    profile_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    times_answered INTEGER NOT NULL,
+    times_answered_correctly INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    last_answered REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (profile_id, question_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS review_schedule (
+    profile_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    repetitions INTEGER NOT NULL,
+    interval REAL NOT NULL,
+    ease REAL NOT NULL,
+    due REAL NOT NULL,
+    PRIMARY KEY (profile_id, question_id)
+) WITHOUT ROWID;
+"""
+
+UPSERT_QUESTION = """
+INSERT INTO questions (id, title, answer, enabled, choices, aliases, tags) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title, answer = excluded.answer, enabled = excluded.enabled, choices = excluded.choices, aliases = excluded.aliases,
+    tags = excluded.tags
+"""
+
+UPSERT_STATISTICS = """
+INSERT INTO question_statistics (profile_id, question_id, times_answered, times_answered_correctly, weight, last_answered)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (profile_id, question_id) DO UPDATE SET
+    times_answered = excluded.times_answered,
+    times_answered_correctly = excluded.times_answered_correctly,
+    weight = excluded.weight,
+    last_answered = excluded.last_answered
+"""
+
+UPSERT_REVIEW = """
+INSERT INTO review_schedule (profile_id, question_id, repetitions, interval, ease, due) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (profile_id, question_id) DO UPDATE SET
+    repetitions = excluded.repetitions, interval = excluded.interval, ease = excluded.ease, due = excluded.due
+"""
+
+# Adds the change of the counts to the stored row, so answers saved by other processes are kept
+MERGE_STATISTICS = """
+INSERT INTO question_statistics (profile_id, question_id, times_answered, times_answered_correctly, weight, last_answered)
+VALUES (?1, ?2, MAX(?3, 0), MAX(?4, 0), ?5, ?6)
+ON CONFLICT (profile_id, question_id) DO UPDATE SET
+    times_answered = MAX(question_statistics.times_answered + ?3, 0),
+    times_answered_correctly = MAX(question_statistics.times_answered_correctly + ?4, 0),
+    weight = excluded.weight,
+    last_answered = MAX(question_statistics.last_answered, excluded.last_answered)
+"""
+
+# Same bins as models.question_aggregates.weight_bin(), CAST rounds towards zero and the comparison rounds up
+WEIGHT_BIN = "MIN({bins} - 1, MAX(0, CAST({weight} * {bins} - 1e-6 AS INTEGER) + ({weight} * {bins} - 1e-6 > CAST({weight} * {bins} - 1e-6 AS INTEGER)) - 1))"
+
+# Adds or removes the values of one statistics row, `row` is NEW or OLD
+ADD_AGGREGATES = """
+    INSERT INTO question_aggregates (question_id, learners, attempts, correct, weight_sum)
+    SELECT {row}.question_id, 1, {row}.times_answered, {row}.times_answered_correctly, {row}.weight WHERE {row}.times_answered > 0
+    ON CONFLICT (question_id) DO UPDATE SET
+        learners = learners + 1, attempts = attempts + excluded.attempts, correct = correct + excluded.correct,
+        weight_sum = weight_sum + excluded.weight_sum;
+    INSERT INTO question_weight_bins (question_id, bin, learners)
+    SELECT {row}.question_id, {bin}, 1 WHERE {row}.times_answered > 0
+    ON CONFLICT (question_id, bin) DO UPDATE SET learners = learners + 1;
+"""
+REMOVE_AGGREGATES = """
+    UPDATE question_aggregates SET
+        learners = learners - 1, attempts = attempts - {row}.times_answered, correct = correct - {row}.times_answered_correctly,
+        weight_sum = weight_sum - {row}.weight
+    WHERE question_id = {row}.question_id AND {row}.times_answered > 0;
+    UPDATE question_weight_bins SET learners = learners - 1
+    WHERE question_id = {row}.question_id AND bin = {bin} AND {row}.times_answered > 0;
+"""
+
+def _aggregates_statement(template: str, row: str) -> str:
+    return template.strip().format(row=row, bin=WEIGHT_BIN.format(weight=f"{row}.weight", bins=WEIGHT_BINS))
+
+# Per-question totals over the statistics of every profile, kept up to date by triggers in the same transaction as every
+# change of the statistics. Databases created before the tables existed get them filled once, conflicting rows were
+# already filled by another process
+AGGREGATES_SCHEMA = f"""
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS question_aggregates (
+    question_id INTEGER PRIMARY KEY,
+    learners INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    weight_sum REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_weight_bins (
+    question_id INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    learners INTEGER NOT NULL,
+    PRIMARY KEY (question_id, bin)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS question_aggregates_insert AFTER INSERT ON question_statistics BEGIN
+    {_aggregates_statement(ADD_AGGREGATES, "NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS question_aggregates_update AFTER UPDATE ON question_statistics BEGIN
+    {_aggregates_statement(REMOVE_AGGREGATES, "OLD")}
+    {_aggregates_statement(ADD_AGGREGATES, "NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS question_aggregates_delete AFTER DELETE ON question_statistics BEGIN
+    {_aggregates_statement(REMOVE_AGGREGATES, "OLD")}
+END;
+INSERT INTO question_aggregates (question_id, learners, attempts, correct, weight_sum)
+SELECT question_id, COUNT(*), SUM(times_answered), SUM(times_answered_correctly), SUM(weight)
+FROM question_statistics WHERE times_answered > 0 GROUP BY question_id
+ON CONFLICT (question_id) DO NOTHING;
+INSERT INTO question_weight_bins (question_id, bin, learners)
+SELECT question_id, {WEIGHT_BIN.format(weight="weight", bins=WEIGHT_BINS)} AS weight_bin, COUNT(*)
+FROM question_statistics WHERE times_answered > 0 GROUP BY question_id, weight_bin
+ON CONFLICT (question_id, bin) DO NOTHING;
+COMMIT;
+"""
+
+# Inserts the profile in one statement, with the next free id if its id is taken
+INSERT_PROFILE = """
+INSERT INTO profiles (id, name)
+SELECT CASE WHEN EXISTS (SELECT 1 FROM profiles WHERE id = ?1) THEN (SELECT MAX(id) + 1 FROM profiles) ELSE ?1 END, ?2
+"""
+
+# Row structure: (ProfileID, QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight, LastAnswered)
+StatisticsRow = Tuple[int, int, int, int, float, float]
+
+class SqliteStatisticsJournal:
+    # Same interface as helpers.statistics_journal.StatisticsJournal, but answers
+    # are merged straight into the statistics table in batched transactions.
+    # Counts are merged as the change since they were last written, against the baseline of the store
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        profile_id: int,
+        lock: threading.RLock,
+        baseline: Optional[Callable[[int], Tuple[int, int]]] = None
+    ) -> None:
+        self.connection = connection
+        self.lock = lock
+        self.profile_id = profile_id
+        self.baseline = baseline or (lambda question_id: (0, 0))
+        self.record_count = 0
+        self._pending = {} # Dict structure: [QuestionID, (TimesAnswered, TimesAnsweredCorrectly, Weight, LastAnswered)]
+        self._written = {} # Dict structure: [QuestionID, (TimesAnswered, TimesAnsweredCorrectly)], since the last save
+        self._pending_count = 0
+
+    # Answers are merged while syncing, the journal never has to be compacted
+    def append(self, question_id: int, times_answered: int, times_answered_correctly: int, weight: float, last_answered: float = 0.0) -> bool:
+        self._pending[question_id] = (times_answered, times_answered_correctly, round(weight, 2), last_answered)
+        self.record_count += 1
+        self._pending_count += 1
+        if self._pending_count >= JOURNAL_SYNC_INTERVAL:
+            self.sync()
+        return False
+
+    def sync(self) -> None:
+        if not self._pending:
+            return
+        self.merge(self._pending.items())
+        self._pending.clear()
+        self._pending_count = 0
+
+    # Rows structure: [(QuestionID, (TimesAnswered, TimesAnsweredCorrectly, Weight, LastAnswered))]
+    def merge(self, rows: Iterable[Tuple[int, Tuple[int, int, float, float]]]) -> None:
+        changes = []
+        for question_id, (times_answered, times_answered_correctly, weight, last_answered) in rows:
+            base_times_answered, base_times_answered_correctly = self._written.get(question_id) or self.baseline(question_id)
+            changes.append((
+                self.profile_id,
+                question_id,
+                times_answered - base_times_answered,
+                times_answered_correctly - base_times_answered_correctly,
+                weight,
+                last_answered
+            ))
+            self._written[question_id] = (times_answered, times_answered_correctly)
+        with self.lock, self.connection:
+            self.connection.executemany(MERGE_STATISTICS, changes)
+
+    def truncate(self) -> None:
+        self._pending.clear()
+        self._written.clear()
+        self._pending_count = 0
+        self.record_count = 0
+
+    def close(self) -> None:
+        self.sync()
+
+class SqliteRepository(Repository):
+    # Stores everything in a single SQLite database in WAL mode. Lookups by
+    # profile name, profile id and question id use the table indexes.
+
+    def __init__(self, database_path: str = DATABASE_FILE_PATH) -> None:
+        folder_path = os.path.dirname(database_path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        # The connection is shared with the autosave thread, transactions are serialized by the lock
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Databases created before a column existed get it added
+        for table, column, definition in [
+            ("questions", "aliases", "TEXT NOT NULL DEFAULT ''"),
+            ("questions", "tags", "TEXT NOT NULL DEFAULT ''"),
+            ("question_statistics", "last_answered", "REAL NOT NULL DEFAULT 0")
+        ]:
+            columns = [row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                with self.lock, self.connection:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        if not self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'question_aggregates'").fetchone():
+            with self.lock:
+                self.connection.executescript(AGGREGATES_SCHEMA)
+
+    def load_questions(self) -> QuestionBank:
+        rows = self.connection.execute("SELECT id, title, answer, enabled, choices, aliases, tags FROM questions ORDER BY id")
+        questions = QuestionBank(
+            Question(
+                id, title, answer, bool(enabled),
+                choices.split("|") if choices else [],
+                aliases.split("|") if aliases else [],
+                tags.split("|") if tags else []
+            )
+            for id, title, answer, enabled, choices, aliases, tags in rows
+        )
+        questions.mark_saved()
+        return questions
+
+    def save_questions(self, questions: Iterable[Question]) -> None:
+        # Plain iterables are written as a whole. Of a QuestionBank only the questions added or changed
+        # since the last save are written, then it is marked as saved
+        if not isinstance(questions, QuestionBank):
+            return self.append_questions(questions)
+
+        with questions.lock:
+            self.append_questions(questions.get(question_id) for question_id in sorted(questions.added_ids | questions.changed_ids))
+            questions.mark_saved()
+
+    def append_questions(self, questions: Iterable[Question]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(UPSERT_QUESTION, (
+                (q.id, q.title, q.answer, int(q.enabled), q.to_choices_string(), q.to_aliases_string(), q.to_tags_string()) for q in questions
+            ))
+
+    def create_new_profile(self, profile: Profile) -> bool:
+        # If another process took the profile's id in the meantime, the profile gets the next free id
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(INSERT_PROFILE, (profile.id, profile.name))
+                profile.id = self.connection.execute("SELECT id FROM profiles WHERE name = ?", (profile.name,)).fetchone()[0]
+        except sqlite3.IntegrityError:
+            print(f"Profile with name {profile.name} already exists!")
+            return False
+
+        return True
+
+    def find_profile_max_id(self) -> int:
+        return self.connection.execute("SELECT COALESCE(MAX(id), -1) FROM profiles").fetchone()[0]
+
+    def load_profile_with_statistics(self, profile_name: str) -> Profile:
+        row = self.connection.execute("SELECT id, name FROM profiles WHERE name = ?", (profile_name,)).fetchone()
+        if row is None:
+            with self.lock, self.connection:
+                self.connection.execute("INSERT OR IGNORE INTO profiles (id, name) VALUES (0, 'default')")
+            row = (0, "default")
+
+        return self.load_profile_statistics(Profile(row[0], row[1], {}))
+
+    def load_profile_names(self) -> List[Profile]:
+        rows = self.connection.execute("SELECT id, name FROM profiles ORDER BY id")
+        return [Profile(id, name, {}) for id, name in rows]
+
+    def load_profile_statistics(self, profile: Profile) -> Profile:
+        rows = self.connection.execute(
+            "SELECT question_id, times_answered, times_answered_correctly, weight, last_answered "
+            "FROM question_statistics WHERE profile_id = ?",
+            (profile.id,)
+        )
+        question_statistics = StatisticsStore()
+        for row in rows:
+            question_statistics.set_values(*row)
+        question_statistics.dirty_rows.clear()
+
+        loaded_profile = Profile(profile.id, profile.name, question_statistics)
+        loaded_profile.journal = SqliteStatisticsJournal(self.connection, profile.id, self.lock, question_statistics.baseline)
+        return loaded_profile
+
+    def save_question_statistics(self, profile: Profile) -> None:
+        # Only the rows changed since the last save are written, their changes are merged into the stored rows
+        store = profile.question_statistics
+        with profile.lock:
+            journal = profile.journal or SqliteStatisticsJournal(self.connection, profile.id, self.lock, store.baseline)
+            journal.merge(
+                (store.question_ids[row], (
+                    store.times_answered[row], store.times_answered_correctly[row], round(store.weight[row], 2), store.last_answered[row]
+                ))
+                for row in sorted(store.dirty_rows)
+            )
+            store.dirty_rows.clear()
+            journal.truncate()
+
+    def upsert_question_statistics(self, rows: Iterable[StatisticsRow]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(UPSERT_STATISTICS, rows)
+
+    def close_statistics_journal(self, profile: Profile) -> None:
+        with profile.lock:
+            if profile.journal:
+                profile.journal.close()
+                profile.journal = None
+
+    # Streams (ProfileID, QuestionID, TimesAnswered, TimesAnsweredCorrectly, Weight) of every profile
+    def iter_question_statistics(self) -> Iterator[Tuple[int, int, int, int, float]]:
+        return self.connection.execute(
+            "SELECT profile_id, question_id, times_answered, times_answered_correctly, weight FROM question_statistics"
+        )
+
+    def load_question_aggregates(self) -> QuestionAggregates:
+        histograms = {} # Dict structure: [QuestionID, List of learners per weight bin]
+        for question_id, weight_bin, learners in self.connection.execute("SELECT question_id, bin, learners FROM question_weight_bins"):
+            histograms.setdefault(question_id, [0] * WEIGHT_BINS)[weight_bin] = learners
+        rows = self.connection.execute("SELECT question_id, learners, attempts, correct, weight_sum FROM question_aggregates")
+        return QuestionAggregates.from_stored_rows(
+            (question_id, *totals, histograms.get(question_id, [0] * WEIGHT_BINS)) for question_id, *totals in rows
+        )
+
+    def load_review_schedule(self, profile: Profile) -> ReviewSchedule:
+        rows = self.connection.execute(
+            "SELECT question_id, repetitions, interval, ease, due FROM review_schedule WHERE profile_id = ?",
+            (profile.id,)
+        )
+        return ReviewSchedule({question_id: ReviewState(*state) for question_id, *state in rows})
+
+    def save_review_schedule(self, profile: Profile, schedule: ReviewSchedule) -> None:
+        rows = []
+        for question_id in schedule.dirty_ids:
+            state = schedule.states[question_id]
+            rows.append((profile.id, question_id, state.repetitions, state.interval, state.ease, state.due))
+        with self.lock, self.connection:
+            self.connection.executemany(UPSERT_REVIEW, rows)
+        schedule.dirty_ids.clear()
+
+    def close(self) -> None:
+        self.connection.close()
+
+def statistics_row(profile_id: int, question_id: int, statistics: QuestionStatisticsView) -> StatisticsRow:
+    return (
+        profile_id,
+        question_id,
+        statistics.times_answered,
+        statistics.times_answered_correctly,
+        round(statistics.weight, 2),
+        statistics.last_answered
+    )
@@ -0,0 +1,223 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, List, Optional
+from helpers.answer_matcher import AnswerMatcher, MatcherKeys, match_keys
+from models.profile import Profile
+from models.question_bank import QuestionBank
+from models.question_statistics import QuestionStatistics
+from models.weight_policy import WeightPolicy, create_weight_policy
+from repositories.repository import Repository
+
+# Grades offline answer sheets in worker processes and folds them into the profile statistics.
+# Sheets are JSONL files, one {"profile": "name", "question_id": 1, "answer": "..."} object per answer.
+# Workers grade chunks of lines against a read-only answer key and reduce them to per-question changes,
+# the changes of every chunk are combined in file order and each profile is saved once.
+
+GRADING_CHUNK_SIZE = 20000
+# Chunks waiting for a worker per worker, bounds the memory of lines read ahead
+CHUNKS_PER_WORKER = 2
+
+# Delta structure: [Answered, Correct, Shift, Low, High], the change of a question's statistics over a run of answers.
+# A single answer changes the weight by weight -> min(max(weight + shift, low), high), and two such functions
+# compose into one of the same form, so runs graded in different chunks combine into exactly the weight
+# of answering them one by one. Lists are used instead of objects, results are pickled between processes
+AnswerDelta = list
+
+def new_delta() -> AnswerDelta:
+    return [0, 0, 0.0, float("-inf"), float("inf")]
+
+def add_answer(delta: AnswerDelta, correct: bool) -> None:
+    delta[0] += 1
+    if correct:
+        delta[1] += 1
+        _then(delta, QuestionStatistics.WEIGHT_INCREMENT, QuestionStatistics.MIN_WEIGHT, QuestionStatistics.MAX_WEIGHT)
+    else:
+        _then(delta, -QuestionStatistics.WEIGHT_INCREMENT, QuestionStatistics.MIN_WEIGHT, QuestionStatistics.MAX_WEIGHT)
+
+# The answers of the other delta were given after the answers of this one
+def merge_deltas(delta: AnswerDelta, other: AnswerDelta) -> None:
+    delta[0] += other[0]
+    delta[1] += other[1]
+    _then(delta, other[2], other[3], other[4])
+
+def apply_delta(delta: AnswerDelta, weight: float) -> float:
+    return min(max(weight + delta[2], delta[3]), delta[4])
+
+def _then(delta: AnswerDelta, shift: float, low: float, high: float) -> None:
+    delta[2] += shift
+    delta[3] = min(max(delta[3] + shift, low), high)
+    delta[4] = min(max(delta[4] + shift, low), high)
+
+@dataclass
+class ChunkResult:
+    # Dict structure: [ProfileName, [QuestionID, AnswerDelta]]
+    deltas: Dict[str, Dict[int, AnswerDelta]] = field(default_factory=dict)
+    graded: int = 0
+    correct: int = 0
+    invalid: int = 0 # Lines that are not answer records
+    unknown: int = 0 # Answers to questions that are not in the bank
+
+    # The other result holds later lines of the file
+    def merge(self, other: "ChunkResult") -> None:
+        for profile_name, changes in other.deltas.items():
+            deltas = self.deltas.setdefault(profile_name, {})
+            for question_id, delta in changes.items():
+                if question_id in deltas:
+                    merge_deltas(deltas[question_id], delta)
+                else:
+                    deltas[question_id] = delta
+        self.graded += other.graded
+        self.correct += other.correct
+        self.invalid += other.invalid
+        self.unknown += other.unknown
+
+@dataclass
+class GradingReport:
+    graded: int = 0
+    correct: int = 0
+    invalid: int = 0
+    unknown: int = 0
+    profiles: int = 0
+    created_profiles: int = 0
+    workers: int = 0
+    grading_seconds: float = 0.0 # Reading, grading and combining the chunks
+    saving_seconds: float = 0.0 # Loading, changing and saving the profiles
+
+    @property
+    def seconds(self) -> float:
+        return self.grading_seconds + self.saving_seconds
+
+    @property
+    def answers_per_second(self) -> float:
+        return self.graded / self.seconds if self.seconds > 0 else 0.0
+
+# Dict structure: [QuestionID, MatcherKeys], set once in every worker process
+_answer_key: Dict[int, MatcherKeys] = {}
+
+def _init_worker(answer_key: Dict[int, MatcherKeys]) -> None:
+    global _answer_key
+    _answer_key = answer_key
+
+# Keys are built once for the whole bank and sent to the workers as plain tuples
+def build_answer_key(questions: QuestionBank) -> Dict[int, MatcherKeys]:
+    return {question.id: AnswerMatcher.for_question(question).keys for question in questions.scan()}
+
+# Decodes the whole chunk at once as a JSON array, line by line only if it has an invalid line.
+# Invalid lines are returned as None
+def _decode_lines(lines: List[str]) -> List[object]:
+    lines = [line for line in lines if line.strip()]
+    try:
+        return json.loads("[" + ",".join(lines) + "]")
+    except ValueError:
+        pass
+
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            records.append(None)
+    return records
+
+def grade_chunk(lines: List[str]) -> ChunkResult:
+    answer_key = _answer_key
+    result = ChunkResult()
+    for record in _decode_lines(lines):
+        try:
+            profile_name = str(record["profile"]).strip().lower()
+            question_id = int(record["question_id"])
+            answer = str(record["answer"])
+        except (ValueError, KeyError, TypeError):
+            result.invalid += 1
+            continue
+
+        keys = answer_key.get(question_id)
+        if keys is None:
+            result.unknown += 1
+            continue
+
+        correct = match_keys(keys, answer)
+        deltas = result.deltas.get(profile_name)
+        if deltas is None:
+            deltas = result.deltas[profile_name] = {}
+        delta = deltas.get(question_id)
+        if delta is None:
+            delta = deltas[question_id] = new_delta()
+        add_answer(delta, correct)
+        result.graded += 1
+        result.correct += 1 if correct else 0
+    return result
+
+def grade_answer_sheets(
+    repository: Repository,
+    questions: QuestionBank,
+    file_path: str,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    weight_policy: Optional[WeightPolicy] = None
+) -> GradingReport:
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or GRADING_CHUNK_SIZE
+    start = time.perf_counter()
+    total = ChunkResult()
+    with open(file_path, "r") as file, ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(build_answer_key(questions),)) as executor:
+        # Results are combined in the order of the chunks, the weights depend on the order of the answers
+        pending = deque()
+        for lines in iter(lambda: list(islice(file, chunk_size)), []):
+            pending.append(executor.submit(grade_chunk, lines))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                total.merge(pending.popleft().result())
+        while pending:
+            total.merge(pending.popleft().result())
+
+    report = GradingReport(total.graded, total.correct, total.invalid, total.unknown, len(total.deltas), workers=workers)
+    report.grading_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report.created_profiles = apply_deltas(repository, total.deltas, weight_policy)
+    report.saving_seconds = time.perf_counter() - start
+    return report
+
+# Adds the changes to the statistics of every profile with one save per profile.
+# Profiles that do not exist yet are created, returns their count.
+# The answers count as given now, their changes start from the effective weight at this time
+def apply_deltas(repository: Repository, deltas: Dict[str, Dict[int, AnswerDelta]], weight_policy: Optional[WeightPolicy] = None) -> int:
+    weight_policy = weight_policy or create_weight_policy()
+    now = time.time()
+    profiles = {profile.name: profile for profile in repository.load_profile_names()}
+    next_id = max((profile.id for profile in profiles.values()), default=-1) + 1
+    created_count = 0
+    for profile_name, changes in deltas.items():
+        profile = profiles.get(profile_name)
+        if profile is None:
+            profile = Profile(next_id, profile_name, {})
+            if repository.create_new_profile(profile):
+                created_count += 1
+            else:
+                # Created by another process in the meantime
+                profile = next(existing for existing in repository.load_profile_names() if existing.name == profile_name)
+            next_id = max(next_id, profile.id + 1)
+
+        loaded = repository.load_profile_statistics(profile)
+        # The answers are saved at once below instead of journaled one by one
+        repository.close_statistics_journal(loaded)
+        store = loaded.question_statistics
+        for question_id, delta in changes.items():
+            statistics = store.get(question_id)
+            if statistics is None:
+                statistics = QuestionStatistics(weight=QuestionStatistics.MAX_WEIGHT)
+            weight = weight_policy.effective_weight(statistics.weight, statistics.last_answered, now)
+            store.set_values(
+                question_id,
+                statistics.times_answered + delta[0],
+                statistics.times_answered_correctly + delta[1],
+                apply_delta(delta, weight),
+                now
+            )
+        repository.save_question_statistics(loaded)
+    return created_count
@@ -0,0 +1,36 @@
+from helpers import user_input_helper
+from session.engine import FinishedEvent, QuestionEvent, QuizSession
+
+# Terminal adapter over the session engine, all input() and print() calls of a session live here
+
+def print_question(event: QuestionEvent) -> None:
+    print("If you wish to quit, type 'quit'.\n")
+    print(f"Question: {event.title}")
+    if event.choices:
+        print("Choices: ")
+        for label, choice in zip("ABC", event.choices):
+            print(f"{label}: ", choice)
+
+def read_answer(event: QuestionEvent) -> str:
+    if event.choices:
+        return user_input_helper.get_user_test_answer()
+    return input("Answer: ").strip()
+
+def run_session(session: QuizSession) -> FinishedEvent:
+    event = session.start()
+    while isinstance(event, QuestionEvent):
+        print_question(event)
+        answer = read_answer(event)
+        if answer == "quit":
+            print("Exiting...")
+            print("You can view your statistics in Statistics View!\n")
+            return session.quit()
+
+        feedback, event = session.answer(answer)
+        if feedback.correct:
+            print("\nCorrect!\n")
+        else:
+            print(f"\nIncorrect! Correct answer: {feedback.correct_answer}\n")
+
+    print(f"Test completed! You answered {event.correct} out of {event.total} questions correctly!\n")
+    return event
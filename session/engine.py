@@ -0,0 +1,162 @@
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, List, Optional, Tuple, Union
+from models.profile import Profile
+from models.question_bank import QuestionBank
+from models.review_schedule import ReviewSchedule
+import helpers.question_helper as question_helper
+
+MIN_SESSION_QUESTIONS = 5
+# Quiz answers can be given by the label of the shuffled choice
+CHOICE_LABELS = "abc"
+
+# Raised when a session can not be started, the message is meant for the player
+class SessionError(Exception):
+    pass
+
+class SessionState(Enum):
+    ASKING = 1
+    FINISHED = 2
+
+@dataclass
+class QuestionEvent:
+    question_id: int
+    title: str
+    # Shuffled choices of quiz questions, None for free-form questions
+    choices: Optional[List[str]]
+    number: int
+    total: Optional[int] # None in practice sessions, they only end when the player quits
+
+@dataclass
+class FeedbackEvent:
+    question_id: int
+    correct: bool
+    correct_answer: str
+
+@dataclass
+class FinishedEvent:
+    answered: int
+    correct: int
+    total: Optional[int]
+    completed: bool # False if the player quit before the last question
+
+Event = Union[QuestionEvent, FeedbackEvent, FinishedEvent]
+
+class QuizSession:
+    # I/O-agnostic game loop shared by every adapter: start() emits the first question,
+    # answer() grades it, updates the profile statistics and emits the feedback with the next event.
+    # Without question_ids the session draws weighted random questions until quit() is called, only questions
+    # with the tag if one is given, or the questions due in the spaced-repetition schedule if one is given.
+
+    def __init__(
+        self,
+        profile: Profile,
+        questions: QuestionBank,
+        question_ids: Optional[List[int]] = None,
+        rng: random.Random = None,
+        schedule: Optional[ReviewSchedule] = None,
+        clock: Callable[[], float] = time.time,
+        tag: Optional[str] = None
+    ) -> None:
+        self.profile = profile
+        self.questions = questions
+        self.question_ids = question_ids
+        self.rng = rng or random.Random()
+        self.schedule = schedule
+        self.clock = clock
+        self.tag = tag
+        self.state = SessionState.ASKING
+        self.current: Optional[QuestionEvent] = None
+        self.answered = 0
+        self.correct = 0
+        # List structure: [(QuestionID, Answer, Correct)], answers of quizzes are stored as choice text
+        self.history: List[Tuple[int, str, bool]] = []
+
+    @property
+    def total(self) -> Optional[int]:
+        return len(self.question_ids) if self.question_ids is not None else None
+
+    def start(self) -> Union[QuestionEvent, FinishedEvent]:
+        return self._next_event()
+
+    def answer(self, answer: str) -> Tuple[FeedbackEvent, Union[QuestionEvent, FinishedEvent]]:
+        if self.state != SessionState.ASKING or self.current is None:
+            raise RuntimeError("Session is not waiting for an answer")
+
+        event = self.current
+        question = self.questions.get(event.question_id)
+        answer = answer.strip()
+        if event.choices and len(answer) == 1 and answer.lower() in CHOICE_LABELS:
+            answer = event.choices[CHOICE_LABELS.index(answer.lower())]
+
+        correct = self.questions.answer_matcher(question.id).matches(answer)
+        now = self.clock()
+        self.profile.update_statistics(question.id, correct, now)
+        if self.schedule:
+            self.schedule.review(question.id, correct, now)
+        self.answered += 1
+        self.correct += 1 if correct else 0
+        self.history.append((question.id, answer, correct))
+        return FeedbackEvent(question.id, correct, question.answer), self._next_event()
+
+    def quit(self) -> FinishedEvent:
+        self.state = SessionState.FINISHED
+        self.current = None
+        return FinishedEvent(self.answered, self.correct, self.total, False)
+
+    def _next_event(self) -> Union[QuestionEvent, FinishedEvent]:
+        if self.schedule:
+            question = self.questions.get(self.schedule.next_question(self.clock()))
+        elif self.question_ids is None:
+            question = question_helper.get_random_questions(self.profile, self.questions, now=self.clock(), tag=self.tag)[0]
+        elif self.answered < len(self.question_ids):
+            question = self.questions.get(self.question_ids[self.answered])
+        else:
+            self.state = SessionState.FINISHED
+            self.current = None
+            return FinishedEvent(self.answered, self.correct, self.total, True)
+
+        choices = None
+        if question.is_quiz():
+            # creating a copy here to not alter question.choices itself
+            choices = question.choices + [question.answer]
+            self.rng.shuffle(choices)
+        self.current = QuestionEvent(question.id, question.title, choices, self.answered + 1, self.total)
+        return self.current
+
+def create_practice_session(profile: Profile, questions: QuestionBank, rng: random.Random = None, tag: Optional[str] = None) -> QuizSession:
+    if len(questions) < MIN_SESSION_QUESTIONS:
+        raise SessionError(f"Please create at least {MIN_SESSION_QUESTIONS} questions before starting Practice Mode.")
+    if questions.enabled_count < MIN_SESSION_QUESTIONS:
+        raise SessionError(f"Please enable at least {MIN_SESSION_QUESTIONS} questions before starting Practice Mode.")
+    if tag and questions.tag_enabled_count(tag) < MIN_SESSION_QUESTIONS:
+        raise SessionError(f"Please enable at least {MIN_SESSION_QUESTIONS} questions tagged '{tag}' before starting Practice Mode.")
+    return QuizSession(profile, questions, rng=rng, tag=tag)
+
+def create_review_session(profile: Profile, questions: QuestionBank, schedule: ReviewSchedule, rng: random.Random = None) -> QuizSession:
+    if questions.enabled_count < MIN_SESSION_QUESTIONS:
+        raise SessionError(f"Please enable at least {MIN_SESSION_QUESTIONS} questions before starting Spaced Repetition Mode.")
+    schedule.start(question_id for question_id, enabled in questions.enabled_states() if enabled)
+    return QuizSession(profile, questions, rng=rng, schedule=schedule)
+
+def create_test_session(
+    profile: Profile, questions: QuestionBank, question_count: int, rng: random.Random = None, tag: Optional[str] = None
+) -> QuizSession:
+    if len(questions) < MIN_SESSION_QUESTIONS:
+        raise SessionError(f"Please create at least {MIN_SESSION_QUESTIONS} questions before starting Test Mode.")
+    if question_count < 1:
+        raise SessionError("A test needs at least one question.")
+
+    if tag:
+        enabled_count = questions.tag_enabled_count(tag)
+        if enabled_count < question_count:
+            raise SessionError(f"Please enable at least {question_count - enabled_count} more question(s) tagged '{tag}' before starting Test Mode.")
+    enabled_count = questions.enabled_count
+    if enabled_count < question_count:
+        raise SessionError(f"Please enable at least {question_count - enabled_count} more question(s) before starting Test Mode.")
+
+    rng = rng or random.Random()
+    # Only enabled questions are drawn, the bank keeps its order
+    return QuizSession(profile, questions, question_helper.sample_enabled_ids(questions, question_count, rng, tag), rng)
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+from session.protocol import DEFAULT_HOST, DEFAULT_PORT
+
+# Opens many concurrent practice sessions against a running quiz server and reports request latencies.
+# Usage: python -m session.load_generator --clients 1000 --answers 50
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+@dataclass
+class LoadReport:
+    seconds: float
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def requests_per_second(self) -> float:
+        return len(self.latencies) / self.seconds if self.seconds > 0 else 0.0
+
+    def percentiles(self) -> Dict[float, float]:
+        # Nearest-rank percentiles in seconds
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return {}
+        return {p: ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] for p in PERCENTILES}
+
+async def run_client(host: str, port: int, profile_name: str, answers: int, report: LoadReport) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def request(payload: dict) -> dict:
+        start = time.perf_counter()
+        writer.write(json.dumps(payload).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        report.latencies.append(time.perf_counter() - start)
+        if "error" in response:
+            report.errors += 1
+        return response
+
+    try:
+        event = await request({"op": "start", "profile": profile_name, "mode": "practice"})
+        for _ in range(answers):
+            if event.get("event") != "question":
+                break
+            # The client does not know the answers, quizzes get the first choice and other questions a guess
+            response = await request({"op": "answer", "answer": "a" if event["choices"] else "guess"})
+            event = response.get("next", {})
+        await request({"op": "quit"})
+    finally:
+        writer.close()
+
+async def generate_load(host: str, port: int, clients: int, answers: int, profile_name: str) -> LoadReport:
+    report = LoadReport(0.0)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_client(host, port, profile_name, answers, report) for _ in range(clients)),
+        return_exceptions=True
+    )
+    report.seconds = time.perf_counter() - start
+    report.errors += sum(isinstance(result, Exception) for result in results)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate load against a running Quizly server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=100, help="Number of concurrent sessions")
+    parser.add_argument("--answers", type=int, default=20, help="Answers given in every session")
+    parser.add_argument("--profile", default="default", help="Profile used by every session")
+    args = parser.parse_args()
+
+    report = asyncio.run(generate_load(args.host, args.port, args.clients, args.answers, args.profile))
+    print(f"{len(report.latencies)} requests in {report.seconds:.2f} s, {report.requests_per_second:.0f} requests per second, {report.errors} error(s)")
+    for percentile, seconds in report.percentiles().items():
+        print(f"p{percentile:<5} {seconds * 1000:>10.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from models.question_aggregates import QuestionAggregates
+from models.question_bank import QuestionBank
+from session.engine import SessionError
+
+# Generates test papers for a whole class: every paper holds distinct enabled questions drawn with its own seed,
+# so a paper can be drawn again from the seed and its number. Papers are drawn in worker processes and written
+# to a JSONL file, the answers can be graded later with batch grading.
+# Stratified papers take the same number of questions from every difficulty as every other paper,
+# in proportion to the enabled questions of that difficulty.
+
+# Papers drawn by a worker at once
+PAPERS_PER_TASK = 500
+# Redraws of a paper that has the same questions as an earlier one, before giving up
+MAX_REDRAWS = 100
+
+# Difficulties by the accuracy of every profile's answers, in percent
+HARD_ACCURACY = 50.0
+MEDIUM_ACCURACY = 80.0
+DIFFICULTIES = ["easy", "medium", "hard", "unanswered"]
+
+@dataclass
+class TestPaper:
+    number: int
+    seed: str
+    question_ids: List[int]
+
+def difficulty(aggregates: QuestionAggregates, question_id: int) -> str:
+    row = aggregates.get(question_id)
+    if row is None or row.attempts == 0:
+        return "unanswered"
+    if row.accuracy < HARD_ACCURACY:
+        return "hard"
+    return "medium" if row.accuracy < MEDIUM_ACCURACY else "easy"
+
+# Dict structure: [Difficulty, [QuestionID]], one pass over the enabled questions.
+# Without aggregates every enabled question is in one stratum
+def build_strata(questions: QuestionBank, aggregates: Optional[QuestionAggregates] = None) -> Dict[str, List[int]]:
+    strata = {}
+    for question_id, enabled in questions.enabled_states():
+        if enabled:
+            key = difficulty(aggregates, question_id) if aggregates is not None else "all"
+            strata.setdefault(key, []).append(question_id)
+    return strata
+
+# Splits the question count over the strata in proportion to their size, by largest remainder
+def stratum_quotas(strata: Dict[str, List[int]], question_count: int) -> Dict[str, int]:
+    total = sum(len(ids) for ids in strata.values())
+    if question_count > total:
+        raise SessionError(f"Please enable at least {question_count - total} more question(s) to create papers of such size.")
+    shares = {key: question_count * len(ids) / total for key, ids in strata.items()}
+    quotas = {key: int(share) for key, share in shares.items()}
+    by_remainder = sorted(shares, key=lambda key: shares[key] - quotas[key], reverse=True)
+    for key in by_remainder[:question_count - sum(quotas.values())]:
+        quotas[key] += 1
+    return quotas
+
+def paper_seed(seed: int, number: int, redraw: int = 0) -> str:
+    return f"{seed}-{number}-{redraw}"
+
+def draw_paper(strata: Dict[str, List[int]], quotas: Dict[str, int], seed: str) -> List[int]:
+    # O(k) per paper, random.sample only touches the drawn positions of large strata
+    rng = random.Random(seed)
+    question_ids = []
+    for key, quota in quotas.items():
+        question_ids.extend(rng.sample(strata[key], quota))
+    rng.shuffle(question_ids)
+    return question_ids
+
+# Set once in every worker process
+_strata: Dict[str, List[int]] = {}
+_quotas: Dict[str, int] = {}
+
+def _init_worker(strata: Dict[str, List[int]], quotas: Dict[str, int]) -> None:
+    global _strata, _quotas
+    _strata, _quotas = strata, quotas
+
+def _draw_papers(seed: int, start: int, stop: int) -> List[List[int]]:
+    return [draw_paper(_strata, _quotas, paper_seed(seed, number)) for number in range(start, stop)]
+
+def generate_papers(
+    questions: QuestionBank,
+    paper_count: int,
+    question_count: int,
+    seed: int,
+    aggregates: Optional[QuestionAggregates] = None,
+    workers: Optional[int] = None
+) -> List[TestPaper]:
+    # Papers are numbered from 1. The result only depends on the seed, not on the number of workers
+    if question_count < 1 or paper_count < 1:
+        raise SessionError("Papers need at least one question, and at least one paper has to be created.")
+    strata = build_strata(questions, aggregates)
+    quotas = stratum_quotas(strata, question_count)
+    combinations = math.prod(math.comb(len(strata[key]), quota) for key, quota in quotas.items())
+    if combinations < paper_count:
+        raise SessionError(f"Only {combinations} different paper(s) of {question_count} question(s) can be drawn from the enabled questions.")
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(strata, quotas)) as executor:
+        futures = [
+            executor.submit(_draw_papers, seed, start, min(start + PAPERS_PER_TASK, paper_count + 1))
+            for start in range(1, paper_count + 1, PAPERS_PER_TASK)
+        ]
+        drawn = [question_ids for future in futures for question_ids in future.result()]
+
+    # Duplicates are redrawn in paper order, so the same seed always gives the same papers
+    papers, seen = [], set()
+    for number, question_ids in enumerate(drawn, 1):
+        redraw = 0
+        while frozenset(question_ids) in seen:
+            redraw += 1
+            if redraw > MAX_REDRAWS:
+                raise SessionError(f"Could not draw {paper_count} different papers, please enable more questions.")
+            question_ids = draw_paper(strata, quotas, paper_seed(seed, number, redraw))
+        seen.add(frozenset(question_ids))
+        papers.append(TestPaper(number, paper_seed(seed, number, redraw), question_ids))
+    return papers
+
+# Paper structure: {"paper": 1, "seed": "...", "questions": [{"question_id": 1, "title": "...", "choices": [...] or null}]}
+# Quiz choices are shuffled with the paper's seed
+def write_papers(questions: QuestionBank, papers: List[TestPaper], file_path: str) -> None:
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w") as file:
+        for paper in papers:
+            rng = random.Random(paper.seed)
+            entries = []
+            for question_id in paper.question_ids:
+                question = questions.get(question_id)
+                choices = None
+                if question.is_quiz():
+                    choices = question.choices + [question.answer]
+                    rng.shuffle(choices)
+                entries.append({"question_id": question_id, "title": question.title, "choices": choices})
+            file.write(json.dumps({"paper": paper.number, "seed": paper.seed, "questions": entries}) + "\n")
+    os.replace(temp_file_path, file_path)
@@ -0,0 +1,7 @@
+# Defaults shared by the quiz server, its clients and the command line.
+# Kept apart from the server, so reading them does not import asyncio.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Seconds between background saves of the profiles that received answers
+FLUSH_INTERVAL = 5.0
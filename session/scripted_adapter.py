@@ -0,0 +1,58 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+from models.profile import Profile
+from models.question_bank import QuestionBank
+from session.engine import QuestionEvent, QuizSession
+
+# Replays recorded answer streams through the session engine without any terminal I/O.
+# Recordings are JSONL files, one {"question_id": 1, "answer": "..."} object per answered question.
+
+@dataclass
+class ReplayReport:
+    answered: int
+    correct: int
+    skipped: int # Recorded answers to questions that are no longer in the bank, counted on every repeat like the answered ones
+    seconds: float
+
+    @property
+    def answers_per_second(self) -> float:
+        return self.answered / self.seconds if self.seconds > 0 else 0.0
+
+def read_recording(file_path: str) -> List[Tuple[int, str]]:
+    answers = []
+    with open(file_path, "r") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                answers.append((int(record["question_id"]), str(record["answer"])))
+            except (ValueError, KeyError, TypeError):
+                print(f"Skipping invalid recording line: {line.strip()}")
+    return answers
+
+# Appends the answers of a finished session, so several sessions can be recorded into one file
+def write_recording(file_path: str, session: QuizSession) -> None:
+    with open(file_path, "a") as file:
+        for question_id, answer, _ in session.history:
+            file.write(json.dumps({"question_id": question_id, "answer": answer}) + "\n")
+
+def replay(profile: Profile, questions: QuestionBank, answers: Iterable[Tuple[int, str]], repeat: int = 1) -> ReplayReport:
+    # The recorded questions are asked in their recorded order, graded and written to the profile statistics
+    answers = list(answers)
+    playable = [(question_id, answer) for question_id, answer in answers if questions.get(question_id) is not None]
+    skipped = (len(answers) - len(playable)) * repeat
+    playable *= repeat
+
+    session = QuizSession(profile, questions, [question_id for question_id, _ in playable])
+    start = time.perf_counter()
+    event = session.start()
+    for _, answer in playable:
+        if not isinstance(event, QuestionEvent):
+            break
+        _, event = session.answer(answer)
+    seconds = time.perf_counter() - start
+
+    return ReplayReport(session.answered, session.correct, skipped, seconds)
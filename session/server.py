@@ -0,0 +1,232 @@
+import asyncio
+import contextlib
+import json
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, Tuple
+from models.profile import Profile
+from models.question_aggregates import QuestionAggregates
+from models.question_bank import QuestionBank
+from models.weight_policy import WeightPolicy
+from repositories.repository import Repository
+from session import engine
+from session.engine import FeedbackEvent, FinishedEvent, QuestionEvent, QuizSession, SessionError
+from session.protocol import DEFAULT_HOST, DEFAULT_PORT, FLUSH_INTERVAL
+
+# Serves quiz sessions over a TCP line protocol, one JSON object per line in both directions.
+# Requests:  {"op": "start", "profile": "default", "mode": "practice"}
+#            {"op": "start", "profile": "default", "mode": "test", "count": 10}
+#            {"op": "start", "profile": "default", "mode": "practice", "tag": "networking"}, tags work in both modes
+#            {"op": "answer", "answer": "a"}
+#            {"op": "quit"}
+#            {"op": "analytics", "limit": 20, "order": "hardest"}
+# Every request gets exactly one response line, failed requests get {"error": "..."}.
+
+SERVER_BACKLOG = 1024
+
+EVENT_NAMES = {QuestionEvent: "question", FeedbackEvent: "feedback", FinishedEvent: "finished"}
+
+def event_to_dict(event: engine.Event) -> dict:
+    return {"event": EVENT_NAMES[type(event)], **asdict(event)}
+
+class QuizServer:
+    # All sessions share one question bank and one in-memory Profile per profile name.
+    # Answers only change memory, dirty profiles are snapshotted and saved in batches by a background task.
+    # Storage is only touched from a single worker thread, SQLite connections are bound to the thread that created them.
+
+    def __init__(
+        self,
+        create_repository: Callable[[], Repository],
+        flush_interval: float = FLUSH_INTERVAL,
+        weight_policy: Optional[WeightPolicy] = None
+    ) -> None:
+        self._create_repository = create_repository
+        self.flush_interval = flush_interval
+        self.weight_policy = weight_policy
+        self.repository: Optional[Repository] = None
+        self.questions: Optional[QuestionBank] = None
+        self.profiles: Dict[str, Profile] = {}
+        self.aggregates: Optional[QuestionAggregates] = None
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._server: Optional[asyncio.Server] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        self.repository = await self._run_io(self._create_repository)
+        self.questions = await self._run_io(self.repository.load_questions)
+        # Loaded once from storage, then every answer of a loaded profile updates it
+        self.aggregates = await self._run_io(self.repository.load_question_aggregates)
+        self._server = await asyncio.start_server(self.handle_client, host, port, backlog=SERVER_BACKLOG)
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        return self._server
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+        await self._run_io(self._close_storage)
+        self._executor.shutdown()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        server = await self.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving {len(self.questions)} questions on {address[0]}:{address[1]}")
+        # SIGTERM stops the server like Ctrl+C, so the statistics are saved on shutdown
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            print("Saving...")
+            await self.close()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session: Optional[QuizSession] = None
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    session, response = await self.handle_request(session, request)
+                except SessionError as e:
+                    response = {"error": str(e)}
+                except (ValueError, TypeError, AttributeError):
+                    response = {"error": "Invalid request!"}
+                except Exception as e:
+                    # Keeps the connection answering, f.e. after a failed draw
+                    print(f"Failed to handle request {line!r}: {e!r}")
+                    response = {"error": "Internal server error!"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, session: Optional[QuizSession], request: dict):
+        # Returns the session of the connection after the request and the response
+        match request.get("op"):
+            case "start":
+                profile = await self.get_profile(str(request.get("profile", "default")))
+                # Sessions can be limited to the questions with a tag
+                tag = str(request["tag"]) if request.get("tag") else None
+                if request.get("mode") == "test":
+                    session = engine.create_test_session(profile, self.questions, int(request.get("count", 0)), random.Random(), tag)
+                else:
+                    session = engine.create_practice_session(profile, self.questions, random.Random(), tag)
+                return session, event_to_dict(session.start())
+            case "answer":
+                if session is None or session.current is None:
+                    raise SessionError("Start a session before answering!")
+                feedback, event = session.answer(str(request.get("answer", "")))
+                return session, {**event_to_dict(feedback), "next": event_to_dict(event)}
+            case "analytics":
+                rows = self.aggregates.select(int(request.get("limit", 20)), request.get("order", "hardest") == "hardest")
+                return session, {"event": "analytics", "rows": [asdict(row) for row in rows]}
+            case "quit":
+                if session is None:
+                    raise SessionError("There is no session to quit!")
+                return None, event_to_dict(session.quit())
+        raise SessionError("Unknown operation!")
+
+    async def get_profile(self, profile_name: str) -> Profile:
+        profile = self.profiles.get(profile_name)
+        if profile is not None:
+            return profile
+
+        # Sessions that ask for the same profile while it loads wait for the same load
+        future = self._loading.get(profile_name)
+        if future is None:
+            future = asyncio.ensure_future(self._load_profile(profile_name))
+            self._loading[profile_name] = future
+            future.add_done_callback(lambda _: self._loading.pop(profile_name, None))
+        return await future
+
+    async def _load_profile(self, profile_name: str) -> Profile:
+        profile = await self._run_io(self._read_profile, profile_name)
+        if profile.name != profile_name:
+            raise SessionError(f"Profile '{profile_name}' does not exist!")
+        profile.init_statistics(self.questions, self.weight_policy)
+        profile.listeners.append(self.aggregates.on_statistics_changed)
+        self.profiles[profile_name] = profile
+        return profile
+
+    def _read_profile(self, profile_name: str) -> Profile:
+        profile = self.repository.load_profile_with_statistics(profile_name)
+        # The server saves in batches, answers are not journaled one by one
+        self.repository.close_statistics_journal(profile)
+        return profile
+
+    async def flush(self) -> None:
+        # Snapshots keep the changed rows, so the originals can keep answering while they are saved
+        snapshots = []
+        for profile in self.profiles.values():
+            if profile.is_dirty:
+                store = profile.question_statistics.copy()
+                snapshot = Profile(profile.id, profile.name, store, stored_version=profile.stored_version)
+                # List structure: [(Row, TimesAnswered, TimesAnsweredCorrectly)] of the changed rows before they are saved
+                unsaved = [(row, store.times_answered[row], store.times_answered_correctly[row]) for row in store.dirty_rows]
+                snapshots.append((profile, snapshot, unsaved))
+                profile.question_statistics.dirty_rows.clear()
+        if not snapshots:
+            return
+        
+        # Rows of profiles that could not be saved are changed again, so the next flush retries them.
+        # Their baselines are older than the ones of answers given since the snapshot
+        failed = await self._run_io(self._save_profiles, [snapshot for _, snapshot, _ in snapshots])
+        for profile, snapshot, unsaved in snapshots:
+            if any(snapshot is failed_snapshot for failed_snapshot in failed):
+                profile.question_statistics.dirty_rows.update(snapshot.question_statistics.dirty_rows)
+            else:
+                self._adopt_saved_statistics(profile, snapshot, unsaved)
+
+    # Saves merge the answers other processes stored for the same questions into the snapshot.
+    # The original profile gets the same counts and the version of the written statistics,
+    # so its next save does not start from stale counts or read the stored statistics again
+    def _adopt_saved_statistics(self, profile: Profile, snapshot: Profile, unsaved: List[Tuple[int, int, int]]) -> None:
+        store = profile.question_statistics
+        saved = snapshot.question_statistics
+        with profile.lock:
+            profile.stored_version = snapshot.stored_version
+            for row, times_answered, times_answered_correctly in unsaved:
+                merged_times_answered = saved.times_answered[row] - times_answered
+                merged_times_answered_correctly = saved.times_answered_correctly[row] - times_answered_correctly
+                store.last_answered[row] = max(store.last_answered[row], saved.last_answered[row])
+                if not merged_times_answered and not merged_times_answered_correctly:
+                    continue
+                store.times_answered[row] += merged_times_answered
+                store.times_answered_correctly[row] += merged_times_answered_correctly
+                # Answers since the snapshot are still the difference to the baseline
+                base = store.dirty_rows.get(row)
+                if base is not None:
+                    store.dirty_rows[row] = (base[0] + merged_times_answered, base[1] + merged_times_answered_correctly, base[2])
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # Returns the profiles that could not be saved, the others are saved anyway
+    def _save_profiles(self, profiles: List[Profile]) -> List[Profile]:
+        failed = []
+        for profile in profiles:
+            try:
+                self.repository.save_question_statistics(profile)
+            except Exception as e:
+                print(f"Failed to save the statistics of profile '{profile.name}': {e!r}")
+                failed.append(profile)
+        return failed
+
+    def _close_storage(self) -> None:
+        self.questions.close()
+        self.repository.close()
+
+    async def _run_io(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
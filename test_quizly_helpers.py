@@ -1,7 +1,39 @@
 import os
 import csv
+import json
+import asyncio
+import random
+import shutil
+import time
+import tempfile
+import threading
+import itertools
 
+import helpers.csv_helper as csv_helper
 from helpers.csv_helper import find_max_id, load_questions, validate_file 
+from models.profile import Profile
+from models.question import Question
+from models.question_statistics import QuestionStatistics
+from models.question_bank import QuestionBank
+from helpers import lazy_question_bank
+from helpers.lazy_question_bank import LazyQuestionBank
+from helpers import snapshot
+from models.statistics_store import StatisticsStore
+from helpers import statistics_helper
+from helpers import question_helper
+from helpers import import_helper
+from helpers import answer_matcher
+from helpers import statistics_journal
+from helpers.autosave import AutosaveWorker
+from helpers.prefetch import Prefetch
+from repositories.csv_repository import CsvRepository
+from repositories.sqlite_repository import SqliteRepository
+from repositories import csv_to_snapshot
+from models.weighted_sampler import WeightedSampler
+from models.review_schedule import ReviewSchedule, ReviewState
+from models.question_aggregates import QuestionAggregates
+from models.weight_policy import WeightPolicy, create_weight_policy
+from session import batch_grading, engine, load_generator, paper_generator, scripted_adapter, server
 
 
 def main():
@@ -9,6 +41,33 @@ def main():
     test_validate_file()
     test_load_questions()
     test_find_max_id()
+    test_weighted_sampler()
+    test_migrate_question_statistics()
+    test_statistics_journal_replay()
+    test_shared_data_folder()
+    test_sqlite_repository()
+    test_lazy_question_bank()
+    test_statistics_store()
+    test_select_statistics()
+    test_search_questions()
+    test_find_duplicate()
+    test_question_bank_counters()
+    test_import_questions()
+    test_quiz_session()
+    test_quiz_server()
+    test_quiz_server_flush()
+    test_autosave()
+    test_review_schedule()
+    test_question_aggregates()
+    test_stored_question_aggregates()
+    test_snapshot()
+    test_prefetch()
+    test_grade_answer_sheets()
+    test_answer_matcher()
+    test_paper_generator()
+    test_weight_policy()
+    test_question_tags()
+    test_snapshot_conversion()
 
 
 def test_validate_file():
@@ -70,7 +129,1101 @@ def test_find_max_id():
     import os
     os.remove(file_path)
 
+def test_weighted_sampler():
+    sampler = WeightedSampler()
+    for question_id in range(1, 11):
+        sampler.set_weight(question_id, 1.0)
+    assert len(sampler) == 10
+    assert sampler.positive_count == 10
+    assert abs(sampler.total() - 10.0) < 1e-9
+
+    # Disabled questions keep their slot but are never drawn
+    for question_id in range(1, 10):
+        sampler.set_weight(question_id, 0.0)
+    assert sampler.positive_count == 1
+    assert set(sampler.sample(50)) == {10}
+
+    sampler.set_weight(3, 0.5)
+    assert abs(sampler.total() - 1.5) < 1e-9
+    assert set(sampler.sample(200)) == {3, 10}
+
+def test_migrate_question_statistics():
+    folder_path = tempfile.mkdtemp()
+    legacy_file_path = os.path.join(folder_path, "questions_statistics.csv")
+    original_paths = (csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH)
+    csv_helper.QUESTIONS_STATISTICS_FILE_PATH = legacy_file_path
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = os.path.join(folder_path, "statistics")
+    
+    try:
+        with open(legacy_file_path, "w") as file:
+            writer = csv.DictWriter(file, csv_helper.STATISTICS_HEADERS)
+            writer.writeheader()
+            writer.writerow({"profile_id": 0, "question_id": 1, "times_answered": 2, "times_answered_correctly": 1, "weight": 0.8})
+            writer.writerow({"profile_id": 1, "question_id": 1, "times_answered": 5, "times_answered_correctly": 5, "weight": 1.0})
+        
+        assert csv_helper.migrate_question_statistics() is True
+        assert not os.path.exists(legacy_file_path)
+        assert csv_helper.migrate_question_statistics() is False
+        
+        profile = csv_helper.load_profile_statistics(Profile(1, "second", {}))
+        assert profile.get_statistics_for_question(1).times_answered == 5
+        
+        # Saving one profile leaves the other profiles' files untouched
+        profile.question_statistics[2] = profile.question_statistics[1]
+        csv_helper.save_question_statistics(profile)
+        assert len(csv_helper.load_profile_statistics(Profile(1, "second", {})).question_statistics) == 2
+        assert csv_helper.load_profile_statistics(Profile(0, "default", {})).get_statistics_for_question(1).times_answered == 2
+        
+        # Statistics already saved per profile are kept over legacy ones
+        with open(legacy_file_path, "w") as file:
+            writer = csv.DictWriter(file, csv_helper.STATISTICS_HEADERS)
+            writer.writeheader()
+            writer.writerow({"profile_id": 1, "question_id": 1, "times_answered": 9, "times_answered_correctly": 9, "weight": 1.0})
+            writer.writerow({"profile_id": 2, "question_id": 1, "times_answered": 3, "times_answered_correctly": 0, "weight": 1.0})
+        assert csv_helper.migrate_question_statistics() is True
+        profile = csv_helper.load_profile_statistics(Profile(1, "second", {}))
+        assert len(profile.question_statistics) == 2 and profile.get_statistics_for_question(1).times_answered == 5
+        assert csv_helper.load_profile_statistics(Profile(2, "third", {})).get_statistics_for_question(1).times_answered == 3
+        assert not [name for name in os.listdir(csv_helper.QUESTIONS_STATISTICS_DIR_PATH) if name.endswith(".tmp")]
+    finally:
+        csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH = original_paths
+        shutil.rmtree(folder_path)
+
+def test_statistics_journal_replay():
+    folder_path = tempfile.mkdtemp()
+    original_path = csv_helper.QUESTIONS_STATISTICS_DIR_PATH
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = folder_path
+    
+    try:
+        profile = csv_helper.load_profile_statistics(Profile(3, "journal", {}))
+        profile.init_statistics(QuestionBank([Question(1, "Title", "Answer"), Question(2, "Other", "Answer")]))
+        profile.update_statistics(1, False)
+        profile.update_statistics(1, True)
+        profile.update_statistics(2, False)
+        # Simulate a crash: the journal is closed without saving a snapshot
+        profile.journal.close()
+        assert not os.path.exists(csv_helper.get_profile_statistics_file_path(3))
+        
+        recovered = csv_helper.load_profile_statistics(Profile(3, "journal", {}))
+        assert recovered.get_statistics_for_question(1).times_answered == 2
+        assert recovered.get_statistics_for_question(1).times_answered_correctly == 1
+        assert recovered.get_statistics_for_question(2).weight == profile.get_statistics_for_question(2).weight
+        # Recovered answers are stored and the journal of the stopped profile is removed
+        assert recovered.journal.record_count == 0
+        assert not os.path.exists(profile.journal.file_path)
+        journal_file_path = recovered.journal.file_path
+        assert os.path.getsize(journal_file_path) == 0
+        # Empty journals are removed when they are closed
+        csv_helper.close_statistics_journal(recovered)
+        assert not os.path.exists(journal_file_path)
+        
+        # Journals of earlier versions hold counts instead of changes
+        with open(csv_helper.get_profile_journal_file_path(3), "w") as file:
+            file.write("1,7,3,0.5\n")
+        legacy = csv_helper.load_profile_statistics(Profile(3, "journal", {}))
+        assert legacy.get_statistics_for_question(1).times_answered == 7
+        
+        # Full journals are compacted after the answer, once the profile lock is released
+        threshold = statistics_journal.JOURNAL_COMPACTION_THRESHOLD
+        statistics_journal.JOURNAL_COMPACTION_THRESHOLD = 2
+        compact = legacy.journal.compact
+        compacted = []
+        
+        def checked_compact() -> None:
+            # Another thread, f.e. autosave, can take the profile lock while the journal is compacted
+            def probe() -> None:
+                acquired = legacy.lock.acquire(blocking=False)
+                if acquired:
+                    legacy.lock.release()
+                compacted.append(acquired)
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            compact()
+        
+        legacy.journal.compact = checked_compact
+        try:
+            legacy.init_statistics(QuestionBank([Question(1, "Title", "Answer")]))
+            legacy.update_statistics(1, True)
+            legacy.update_statistics(1, True)
+        finally:
+            statistics_journal.JOURNAL_COMPACTION_THRESHOLD = threshold
+        assert compacted == [True] and legacy.journal.record_count == 0
+        csv_helper.close_statistics_journal(legacy)
+        assert csv_helper.load_profile_statistics(Profile(3, "journal", {})).get_statistics_for_question(1).times_answered == 9
+        
+        # Journals locked by another process are not written to, loading takes the next journal name
+        journal_owners = csv_helper._journal_owners
+        csv_helper._journal_owners = itertools.count(1000)
+        locked_file_path = csv_helper.get_profile_journal_file_path(6, f"{os.getpid()}-1000")
+        try:
+            with open(locked_file_path, "a") as locked_file:
+                assert csv_helper.try_lock_file(locked_file)
+                try:
+                    statistics_journal.StatisticsJournal(locked_file_path)
+                    assert False, "A locked journal can not be opened"
+                except statistics_journal.JournalLockedError:
+                    pass
+                profile = csv_helper.load_profile_statistics(Profile(6, "locked", {}))
+                assert profile.journal.file_path == csv_helper.get_profile_journal_file_path(6, f"{os.getpid()}-1001")
+                csv_helper.close_statistics_journal(profile)
+            assert os.path.exists(locked_file_path)
+        finally:
+            csv_helper._journal_owners = journal_owners
+    finally:
+        csv_helper.QUESTIONS_STATISTICS_DIR_PATH = original_path
+        shutil.rmtree(folder_path)
+
+def test_shared_data_folder():
+    # Two profiles loaded from the same files behave like two processes sharing the data folder
+    folder_path = tempfile.mkdtemp()
+    original_paths = (csv_helper.QUESTIONS_STATISTICS_DIR_PATH, csv_helper.PROFILES_FILE_PATH)
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = folder_path
+    csv_helper.PROFILES_FILE_PATH = os.path.join(folder_path, "profiles.csv")
+    questions = QuestionBank([Question(1, "Title", "Answer"), Question(2, "Other", "Answer")])
+    
+    try:
+        first = csv_helper.load_profile_statistics(Profile(5, "shared", {}))
+        second = csv_helper.load_profile_statistics(Profile(5, "shared", {}))
+        assert first.journal.file_path != second.journal.file_path
+        for profile in (first, second):
+            profile.init_statistics(questions)
+        first.update_statistics(1, True)
+        first.update_statistics(1, False)
+        second.update_statistics(1, True)
+        second.update_statistics(2, False)
+        
+        # Saves merge the answers instead of overwriting each other
+        csv_helper.save_question_statistics(first)
+        csv_helper.save_question_statistics(second)
+        assert second.get_statistics_for_question(1).times_answered == 3
+        loaded = csv_helper.load_profile_statistics(Profile(5, "shared", {}))
+        assert loaded.get_statistics_for_question(1).times_answered == 3
+        assert loaded.get_statistics_for_question(1).times_answered_correctly == 2
+        assert loaded.get_statistics_for_question(2).times_answered == 1
+        csv_helper.close_statistics_journal(loaded)
+        
+        # A stopped profile is recovered, journals that are still open are left alone
+        second.update_statistics(1, True)
+        second.journal.close()
+        first.update_statistics(2, True)
+        recovered = csv_helper.load_profile_statistics(Profile(5, "shared", {}))
+        assert recovered.get_statistics_for_question(1).times_answered == 4
+        assert recovered.get_statistics_for_question(2).times_answered == 1
+        assert not os.path.exists(second.journal.file_path)
+        assert os.path.exists(first.journal.file_path)
+        # Analytics include the answers that are only in the journal of the running profile
+        rows = {row[1]: row for row in csv_helper.iter_question_statistics() if row[0] == 5}
+        assert rows[1][2] == 4 and rows[2][2] == 2 and rows[2][3] == 1
+        csv_helper.close_statistics_journal(recovered)
+        csv_helper.close_statistics_journal(first)
+        
+        # A taken id is replaced with the next free one, taken names are still rejected
+        assert csv_helper.create_new_profile(Profile(1, "first", {})) is True
+        duplicate_id = Profile(1, "second", {})
+        assert csv_helper.create_new_profile(duplicate_id) is True
+        assert duplicate_id.id == 2
+        assert csv_helper.create_new_profile(Profile(3, "first", {})) is False
+        assert csv_helper.find_profile_max_id() == 2
+    finally:
+        csv_helper.QUESTIONS_STATISTICS_DIR_PATH, csv_helper.PROFILES_FILE_PATH = original_paths
+        shutil.rmtree(folder_path)
+
+def test_sqlite_repository():
+    folder_path = tempfile.mkdtemp()
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    
+    try:
+        repository.save_questions([Question(1, "Title", "a", choices=["b", "c"]), Question(4, "Other", "d", enabled=False)])
+        questions = repository.load_questions()
+        assert [q.id for q in questions] == [1, 4]
+        assert questions.get(1).choices == ["b", "c"]
+        assert questions.get(4).enabled is False
+        assert questions.max_id == 4
+        
+        # Only questions added or changed since the last save are written
+        questions.set_enabled(4, True)
+        questions.append(Question(5, "Added", "e"))
+        changes = repository.connection.total_changes
+        repository.save_questions(questions)
+        assert repository.connection.total_changes - changes == 2 and not questions.is_dirty
+        assert repository.load_questions().is_enabled(4)
+        changes = repository.connection.total_changes
+        repository.save_questions(questions)
+        assert repository.connection.total_changes == changes
+        
+        profile = repository.load_profile_with_statistics("missing")
+        assert profile.id == 0 and profile.name == "default"
+        assert repository.create_new_profile(Profile(1, "second", {})) is True
+        assert repository.create_new_profile(Profile(2, "second", {})) is False
+        assert repository.find_profile_max_id() == 1
+        
+        profile = repository.load_profile_with_statistics("second")
+        profile.init_statistics(questions)
+        profile.update_statistics(1, True)
+        repository.close_statistics_journal(profile)
+        
+        loaded = repository.load_profile_with_statistics("second")
+        assert loaded.get_statistics_for_question(1).times_answered_correctly == 1
+        
+        # Answers of profiles loaded side by side are merged, taken ids are replaced
+        other = repository.load_profile_with_statistics("second")
+        for shared in (loaded, other):
+            shared.init_statistics(questions)
+            shared.update_statistics(1, False)
+        repository.save_question_statistics(loaded)
+        repository.close_statistics_journal(other)
+        assert repository.load_profile_with_statistics("second").get_statistics_for_question(1).times_answered == 3
+        third = Profile(1, "third", {})
+        assert repository.create_new_profile(third) is True and third.id == 2
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+
+def test_lazy_question_bank():
+    folder_path = tempfile.mkdtemp()
+    file_path = os.path.join(folder_path, "questions.csv")
+    headers = ["id", "title", "answer", "enabled", "choices"]
+    with open(file_path, "w") as file:
+        writer = csv.DictWriter(file, headers)
+        writer.writeheader()
+        writer.writerow({"id": 1, "title": "First", "answer": "a", "enabled": "True", "choices": "b|c"})
+        writer.writerow({"id": 2, "title": "Multi\nline, quoted", "answer": "d", "enabled": "False", "choices": ""})
+        writer.writerow({"id": 5, "title": "Third", "answer": "e", "enabled": "True", "choices": ""})
+    
+    try:
+        bank = LazyQuestionBank(file_path)
+        assert os.path.exists(bank.index_file_path)
+        assert len(bank) == 3
+        assert list(bank.enabled_states()) == [(1, True), (2, False), (5, True)]
+        assert bank.get(2).title == "Multi\nline, quoted"
+        assert bank.get(1).choices == ["b", "c"]
+        bank.close()
+        
+        # The cached index is reused while the file is unchanged
+        bank = LazyQuestionBank(file_path)
+        assert bank.ids() == [1, 2, 5]
+        bank.set_enabled(5, False)
+        bank.append(Question(6, "Added", "f"))
+        bank.save()
+        bank.close()
+        
+        questions = LazyQuestionBank(file_path)
+        assert [q.id for q in questions] == [1, 2, 5, 6]
+        assert questions.is_enabled(5) is False
+        assert questions.get(2).title == "Multi\nline, quoted"
+        # Enabled columns are copied from the index, with toggled and appended questions applied
+        questions.set_enabled(1, False)
+        questions.append(Question(7, "Appended", "g"))
+        ids, enabled = questions.enabled_columns()
+        assert list(ids) == [1, 2, 5, 6, 7] and list(enabled) == [0, 0, 0, 1, 1]
+        
+        # Only a bounded number of read questions stay parsed, changed ones are kept until they are saved
+        original_size = lazy_question_bank.READ_CACHE_SIZE
+        lazy_question_bank.READ_CACHE_SIZE = 2
+        questions.close()
+        questions = LazyQuestionBank(file_path)
+        try:
+            questions.set_enabled(1, False)
+            for question_id in (2, 5, 6, 1):
+                questions.get(question_id)
+            assert list(questions._read_cache) == [5, 6] and list(questions._materialized) == [1]
+            assert questions.get(1).enabled is False and questions.is_enabled(1) is False
+        finally:
+            lazy_question_bank.READ_CACHE_SIZE = original_size
+        questions.close()
+    finally:
+        shutil.rmtree(folder_path)
+
+def test_statistics_store():
+    profile = Profile(1, "columnar", {})
+    assert isinstance(profile.question_statistics, StatisticsStore)
+    
+    profile.init_statistics(QuestionBank([Question(question_id, "Title", "Answer") for question_id in (3, 7, 9)]))
+    assert list(profile.question_statistics.keys()) == [3, 7, 9]
+    assert profile.get_statistics_for_question(7).weight == 1.0
+    assert profile.get_statistics_for_question(8) is None
+    
+    profile.update_statistics(7, False, now=100.0)
+    profile.update_statistics(7, True, now=100.0)
+    statistics = profile.get_statistics_for_question(7)
+    assert (statistics.times_answered, statistics.times_answered_correctly) == (2, 1)
+    assert statistics.to_dict(1, 7) == {
+        "profile_id": 1, "question_id": 7, "times_answered": 2, "times_answered_correctly": 1, "weight": 1.0, "last_answered": 100.0
+    }
+    assert profile.sampler.get_weight(7) == profile.weight_policy.weight_bound(statistics.weight, statistics.last_answered, profile.bounds_until)
+
+def test_select_statistics():
+    questions = QuestionBank([Question(question_id, "Title", "Answer", enabled=question_id != 4) for question_id in range(1, 6)])
+    profile = Profile(1, "scores", {
+        1: QuestionStatistics(4, 1, 0.5),
+        2: QuestionStatistics(2, 2, 1.0),
+        3: QuestionStatistics(4, 3, 0.8),
+        4: QuestionStatistics(1, 0, 0.8),
+    })
+    profile.init_statistics(questions)
+    
+    rows = statistics_helper.select_statistics(profile, questions, limit=2)
+    assert [row.question_id for row in rows] == [4, 5]
+    rows = statistics_helper.select_statistics(profile, questions, limit=2, enabled_only=True, min_attempts=1)
+    assert [row.question_id for row in rows] == [1, 3]
+    assert rows[0].score == 25 and rows[0].attempts == 4
+    rows = statistics_helper.select_statistics(profile, questions, descending=True)
+    assert [row.question_id for row in rows] == [2, 3, 1, 4, 5]
+    
+    # Statistics of deleted questions do not take the place of selected rows, with and without NumPy
+    profile.question_statistics[9] = QuestionStatistics(5, 5, 1.0)
+    rows = statistics_helper.select_statistics(profile, questions, limit=2, descending=True)
+    assert [row.question_id for row in rows] == [2, 3]
+    store = profile.question_statistics
+    assert [store.question_ids[row] for row in statistics_helper._select_rows_python(store, questions, 2, True, False, 0)] == [2, 3]
+    assert [store.question_ids[row] for row in statistics_helper._select_rows_python(store, questions, 3, False, True, 1)] == [1, 3, 2]
+    
+    # Toggled and appended questions reach the columns the selection is filtered with
+    questions.set_enabled(1, False)
+    questions.append(Question(6, "Title", "Answer"))
+    rows = statistics_helper.select_statistics(profile, questions, limit=3, enabled_only=True, min_attempts=1)
+    assert [row.question_id for row in rows] == [3, 2]
+
+def test_search_questions():
+    questions = QuestionBank([Question(1, "Capital of France", "Paris"), Question(12, "Capital of Spain", "Madrid")])
+    assert question_helper.search_questions(questions, "12") == [12]
+    assert question_helper.search_questions(questions, "3") == []
+    assert question_helper.search_questions(questions, "capital") == [1, 12]
+    assert question_helper.search_questions(questions, "SPAIN") == [12]
+    # Every word has to match, the last one also as a prefix of at least 3 letters
+    assert question_helper.search_questions(questions, "capital fra") == [1]
+    assert question_helper.search_questions(questions, "capital fr") == []
+    questions.append(Question(13, "Capital of Francia", "Paris"))
+    assert question_helper.search_questions(questions, "capital franc") == [1, 13]
+
+def test_find_duplicate():
+    questions = QuestionBank([
+        Question(1, "What is the capital city of France?", "Paris"),
+        Question(2, "Who wrote the novel War and Peace?", "Leo Tolstoy")
+    ])
+    assert questions.find_duplicate("what is the CAPITAL city of france", "paris") == 1
+    assert questions.find_duplicate("Who wrote the novel War and Peace in 1869?", "Leo Tolstoy") == 2
+    # Similar titles with a different answer are different questions
+    assert questions.find_duplicate("What is the capital city of Spain?", "Madrid") is None
+    assert questions.find_duplicate("Who wrote the novel Anna Karenina?", "Leo Tolstoy") is None
+    
+    questions.append(Question(3, "What is the capital city of Spain?", "Madrid"))
+    assert questions.find_duplicate("What is the capital city of Spain", "madrid") == 3
+
+def test_question_bank_counters():
+    questions = QuestionBank()
+    assert questions.max_id == -1 and questions.enabled_count == 0
+    
+    questions.append(Question(3, "Title", "Answer"))
+    questions.append(Question(1, "Title", "Answer", enabled=False))
+    assert questions.max_id == 3
+    assert questions.enabled_count == 1
+    
+    assert questions.set_enabled(1, True) is True
+    assert questions.set_enabled(1, True) is True
+    assert questions.enabled_count == 2
+    assert questions.set_enabled(3, False) is True
+    assert questions.enabled_count == 1
+    assert questions.set_enabled(7, False) is False
+
+def test_import_questions():
+    folder_path = tempfile.mkdtemp()
+    file_path = os.path.join(folder_path, "bank.jsonl")
+    with open(file_path, "w") as file:
+        file.write('{"title": "first", "answer": "a"}\n')
+        file.write('{"title": "quiz", "answer": "a", "choices": ["b", "c"]}\n')
+        file.write('{"title": "bad quiz", "answer": "a", "choices": ["b"]}\n')
+        file.write('not json\n')
+        file.write('{"title": "", "answer": "a"}\n')
+        file.write('{"title": "First!", "answer": "A"}\n')
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    
+    try:
+        repository.save_questions(QuestionBank([Question(4, "Existing", "a")]))
+        report = import_helper.import_questions(repository, file_path, import_helper.detect_format(file_path), chunk_size=2)
+        assert report.imported_count == 2
+        assert [line_number for line_number, _, _ in report.rejected] == [3, 4, 5, 6]
+        assert report.rejected[-1][1] == "Duplicate of question 5!"
+        
+        questions = repository.load_questions()
+        assert questions.ids() == [4, 5, 6]
+        assert questions.get(5).title == "First"
+        assert questions.get(6).choices == ["b", "c"]
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+
+def test_quiz_session():
+    questions = QuestionBank([Question(i, f"Title {i}", f"Answer {i}") for i in range(4)])
+    questions.append(Question(4, "Quiz", "Right", choices=["Wrong", "Also wrong"]))
+    profile = Profile(1, "profile 1", {})
+    profile.init_statistics(questions)
+    
+    session = engine.create_test_session(profile, questions, 5, random.Random(1))
+    event = session.start()
+    while isinstance(event, engine.QuestionEvent):
+        if event.choices:
+            # Quizzes are answered by the label of the shuffled choice
+            answer = "abc"[event.choices.index("Right")]
+        else:
+            answer = "wrong" if event.question_id == 0 else f"answer {event.question_id}"
+        feedback, event = session.answer(answer)
+        assert feedback.correct == (feedback.question_id != 0)
+    
+    assert event == engine.FinishedEvent(5, 4, 5, True)
+    assert profile.get_statistics_for_question(0).times_answered_correctly == 0
+    assert profile.get_statistics_for_question(4).times_answered_correctly == 1
+    assert (4, "Right", True) in session.history
+    
+    folder_path = tempfile.mkdtemp()
+    file_path = os.path.join(folder_path, "answers.jsonl")
+    try:
+        scripted_adapter.write_recording(file_path, session)
+        report = scripted_adapter.replay(profile, questions, scripted_adapter.read_recording(file_path) + [(9, "missing")], repeat=2)
+        assert (report.answered, report.correct, report.skipped) == (10, 8, 2)
+        assert profile.get_statistics_for_question(4).times_answered == 3
+    finally:
+        shutil.rmtree(folder_path)
+    
+    try:
+        engine.create_test_session(profile, questions, 6)
+        assert False, "A test can not be larger than the enabled questions"
+    except engine.SessionError:
+        pass
+def test_quiz_server():
+    folder_path = tempfile.mkdtemp()
+    database_path = os.path.join(folder_path, "quizly.db")
+    
+    def create_repository():
+        repository = SqliteRepository(database_path)
+        repository.save_questions(QuestionBank([Question(i, f"Title {i}", f"Answer {i}") for i in range(5)]))
+        return repository
+    
+    async def play():
+        quiz_server = server.QuizServer(create_repository, flush_interval=60)
+        address = (await quiz_server.start("127.0.0.1", 0)).sockets[0].getsockname()
+        reader, writer = await asyncio.open_connection(*address)
+        
+        async def request(payload):
+            writer.write(json.dumps(payload).encode() + b"\n")
+            return json.loads(await reader.readline())
+        
+        assert "error" in await request({"op": "answer", "answer": "x"})
+        assert "error" in await request({"op": "start", "profile": "missing"})
+        event = await request({"op": "start", "mode": "test", "count": 3})
+        for _ in range(3):
+            response = await request({"op": "answer", "answer": f"answer {event['question_id']}"})
+            assert response["event"] == "feedback" and response["correct"]
+            event = response["next"]
+        assert event == {"event": "finished", "answered": 3, "correct": 3, "total": 3, "completed": True}
+        analytics = await request({"op": "analytics", "limit": 5})
+        assert [(row["learners"], row["accuracy"]) for row in analytics["rows"]] == [(1, 100.0)] * 3
+        
+        # Unexpected errors are answered and the connection stays open
+        select = quiz_server.aggregates.select
+        quiz_server.aggregates.select = lambda *_: [][0]
+        assert "error" in await request({"op": "analytics"})
+        quiz_server.aggregates.select = select
+        assert "rows" in await request({"op": "analytics"})
+        
+        # Rows of a failed save are saved by the next flush
+        save = quiz_server.repository.save_question_statistics
+        def failing_save(_):
+            raise OSError("No space left on device")
+        quiz_server.repository.save_question_statistics = failing_save
+        await quiz_server.flush()
+        assert quiz_server.profiles["default"].is_dirty
+        quiz_server.repository.save_question_statistics = save
+        
+        report = await load_generator.generate_load(*address, clients=5, answers=4, profile_name="default")
+        assert report.errors == 0 and len(report.latencies) == 5 * 6
+        writer.close()
+        await quiz_server.close()
+    
+    try:
+        asyncio.run(play())
+        repository = SqliteRepository(database_path)
+        profile = repository.load_profile_statistics(Profile(0, "default", {}))
+        assert sum(statistics.times_answered for _, statistics in profile.question_statistics.items()) == 3 + 5 * 4
+        repository.close()
+    finally:
+        shutil.rmtree(folder_path)
+def test_quiz_server_flush():
+    folder_path = tempfile.mkdtemp()
+    original_paths = csv_helper.PROFILES_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH
+    csv_helper.PROFILES_FILE_PATH = os.path.join(folder_path, "profiles.csv")
+    csv_helper.QUESTIONS_STATISTICS_FILE_PATH = os.path.join(folder_path, "questions_statistics.csv")
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = os.path.join(folder_path, "statistics")
+    repository = CsvRepository()
+    quiz_server = server.QuizServer(lambda: repository)
+    try:
+        repository.create_new_profile(Profile(0, "default", {}))
+        csv_helper.write_profile_statistics(Profile(0, "default", {1: QuestionStatistics()}))
+        quiz_server.repository = repository
+        profile = repository.load_profile_with_statistics("default")
+        repository.close_statistics_journal(profile)
+        quiz_server.profiles["default"] = profile
+        
+        # Flushes keep the version of the written statistics, so the next one does not read them again
+        profile.update_statistics(1, True)
+        asyncio.run(quiz_server.flush())
+        assert profile.stored_version == csv_helper._get_statistics_version(0, False)
+        
+        # Answers another process saved in the meantime are merged into the served profile
+        other = repository.load_profile_with_statistics("default")
+        other.update_statistics(1, False)
+        repository.save_question_statistics(other)
+        repository.close_statistics_journal(other)
+        profile.update_statistics(1, True)
+        asyncio.run(quiz_server.flush())
+        statistics = profile.get_statistics_for_question(1)
+        assert (statistics.times_answered, statistics.times_answered_correctly) == (3, 2)
+        profile.update_statistics(1, True)
+        asyncio.run(quiz_server.flush())
+        stored = repository.load_profile_with_statistics("default")
+        repository.close_statistics_journal(stored)
+        statistics = stored.get_statistics_for_question(1)
+        assert (statistics.times_answered, statistics.times_answered_correctly) == (4, 3)
+    finally:
+        quiz_server._executor.shutdown()
+        csv_helper.PROFILES_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH = original_paths
+        shutil.rmtree(folder_path)
+def test_autosave():
+    folder_path = tempfile.mkdtemp()
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    saves = []
+    
+    def save(questions, profile):
+        saves.append(repository.save_changes(questions, profile))
+    
+    worker = AutosaveWorker(save, interval=0.5, debounce=0.05)
+    try:
+        repository.save_questions(QuestionBank([Question(i, f"Title {i}", f"Answer {i}") for i in range(3)]))
+        questions = repository.load_questions()
+        profile = repository.load_profile_with_statistics("default")
+        profile.init_statistics(questions)
+        assert not questions.is_dirty and not profile.is_dirty
+        assert repository.save_changes(questions, profile) is False
+        
+        worker.watch(questions, profile)
+        worker.start()
+        profile.update_statistics(0, True)
+        questions.set_enabled(2, False)
+        for _ in range(100):
+            if saves:
+                break
+            time.sleep(0.01)
+        assert saves == [True]
+        assert not questions.is_dirty and not profile.is_dirty
+        worker.stop()
+        
+        assert repository.load_questions().is_enabled(2) is False
+        reloaded = repository.load_profile_statistics(Profile(0, "default", {}))
+        assert reloaded.get_statistics_for_question(0).times_answered_correctly == 1
+    finally:
+        worker.stop()
+        repository.close()
+        shutil.rmtree(folder_path)
+def test_review_schedule():
+    day = 86400
+    schedule = ReviewSchedule({1: ReviewState(2, 6.0, 2.5, 3 * day), 2: ReviewState(1, 1.0, 2.5, 1 * day)}, new_question_rate=0.5)
+    schedule.start([1, 2, 3, 4])
+    
+    # Due reviews and new questions take turns at a rate of 0.5, reviews come in due order
+    assert schedule.next_question(5 * day) == 2
+    schedule.review(2, True, 5 * day)
+    assert schedule.next_question(5 * day) == 3
+    schedule.review(3, False, 5 * day)
+    assert schedule.next_question(5 * day) == 1
+    state = schedule.review(1, True, 5 * day)
+    assert (state.repetitions, state.interval, state.due) == (3, 15.0, 20 * day)
+    
+    # Without due reviews new questions are asked right away
+    assert schedule.next_question(5 * day) == 4
+    schedule.review(4, True, 5 * day)
+    assert schedule.next_question(5 * day) == 3
+    assert schedule.dirty_ids == {1, 2, 3, 4}
+    
+    folder_path = tempfile.mkdtemp()
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    try:
+        profile = Profile(0, "default", {})
+        repository.save_review_schedule(profile, schedule)
+        assert not schedule.dirty_ids
+        assert repository.load_review_schedule(profile).states == schedule.states
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+def test_question_aggregates():
+    aggregates = QuestionAggregates.from_records([
+        (0, 1, 4, 1, 0.3),
+        (1, 1, 2, 2, 1.0),
+        (0, 2, 5, 5, 1.0),
+        (1, 2, 0, 0, 1.0)
+    ])
+    row = aggregates.get(1)
+    assert (row.learners, row.attempts, round(row.accuracy), round(row.mean_weight, 2)) == (2, 6, 50, 0.65)
+    assert row.weight_histogram == [0, 0, 1, 0, 0, 0, 0, 0, 0, 1]
+    assert aggregates.get(2).learners == 1
+    
+    # Answers of a listening profile replace that learner's previous values
+    profile = Profile(1, "profile 1", {1: QuestionStatistics(2, 2, 1.0), 2: QuestionStatistics()})
+    profile.listeners.append(aggregates.on_statistics_changed)
+    profile.update_statistics(1, False)
+    profile.update_statistics(2, False)
+    row = aggregates.get(1)
+    assert (row.learners, row.attempts, row.weight_histogram[7]) == (2, 7, 1)
+    assert aggregates.get(2).learners == 2
+    assert [row.question_id for row in aggregates.select(2)] == [1, 2]
+    assert [row.question_id for row in aggregates.select(2, hardest=False, min_learners=2)] == [2, 1]
+
+def test_stored_question_aggregates():
+    def totals(aggregates):
+        return sorted((*row[:4], round(row[4], 6), row[5]) for row in aggregates.stored_rows() if row[1])
+    
+    def answer(repository, profile_name, answers):
+        profile = repository.load_profile_with_statistics(profile_name)
+        profile.question_statistics.ensure(range(1, 4))
+        for question_id, answered_correctly in answers:
+            profile.update_statistics(question_id, answered_correctly)
+        return profile
+    
+    folder_path = tempfile.mkdtemp()
+    original_paths = csv_helper.PROFILES_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH
+    csv_helper.PROFILES_FILE_PATH = os.path.join(folder_path, "profiles.csv")
+    csv_helper.QUESTIONS_STATISTICS_FILE_PATH = os.path.join(folder_path, "questions_statistics.csv")
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = os.path.join(folder_path, "statistics")
+    read_statistics_records = csv_helper._read_statistics_records
+    sqlite_repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    try:
+        for repository in (CsvRepository(), sqlite_repository):
+            for profile_id in range(2):
+                repository.create_new_profile(Profile(profile_id, f"profile {profile_id}", {}))
+                profile = answer(repository, f"profile {profile_id}", [(1, False), (2, True), (1, profile_id == 0)])
+                repository.save_question_statistics(profile)
+                repository.close_statistics_journal(profile)
+            assert totals(repository.load_question_aggregates()) == totals(QuestionAggregates.from_records(repository.iter_question_statistics()))
+            
+            # Saves of profiles loaded side by side update the stored aggregates, which are loaded without reading any statistics
+            first = answer(repository, "profile 0", [(1, True), (3, False)])
+            second = answer(repository, "profile 0", [(1, False), (2, False)])
+            for profile in (first, second):
+                repository.save_question_statistics(profile)
+                repository.close_statistics_journal(profile)
+            csv_helper._read_statistics_records = None
+            aggregates = repository.load_question_aggregates()
+            csv_helper._read_statistics_records = read_statistics_records
+            assert totals(aggregates) == totals(QuestionAggregates.from_records(repository.iter_question_statistics()))
+            row = aggregates.get(1)
+            assert (row.learners, row.attempts) == (2, 6)
+        
+        # Statistics written without the aggregates make the next load build them again
+        profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}))
+        profile.question_statistics.set_values(3, 4, 4, 1.0)
+        csv_helper.write_profile_statistics(profile)
+        csv_helper.close_statistics_journal(profile)
+        assert csv_helper.load_question_aggregates().get(3).attempts == 5
+        
+        # Answers recovered from a journal after the totals were loaded are replaced by a listener without failing
+        aggregates = csv_helper.load_question_aggregates()
+        profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}))
+        profile.question_statistics.ensure([4])
+        profile.update_statistics(4, True)
+        csv_helper.close_statistics_journal(profile)
+        profile = csv_helper.load_profile_statistics(Profile(1, "profile 1", {}))
+        profile.listeners.append(aggregates.on_statistics_changed)
+        profile.update_statistics(4, False)
+        csv_helper.close_statistics_journal(profile)
+        assert profile.get_statistics_for_question(4).times_answered == 2
+        assert [row.question_id for row in aggregates.select()]
+    finally:
+        csv_helper._read_statistics_records = read_statistics_records
+        csv_helper.PROFILES_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_FILE_PATH, csv_helper.QUESTIONS_STATISTICS_DIR_PATH = original_paths
+        sqlite_repository.close()
+        shutil.rmtree(folder_path)
+
+def test_snapshot():
+    folder_path = tempfile.mkdtemp()
+    questions_file_path = os.path.join(folder_path, "questions.snapshot")
+    statistics_file_path = os.path.join(folder_path, "profile_1.snapshot")
+    try:
+        snapshot.write_questions_snapshot(questions_file_path, [
+            Question(3, "Capital of France", "Paris"),
+            Question(7, "Quiz", "Right", enabled=False, choices=["Wrong", "Also wrong"])
+        ])
+        questions = snapshot.SnapshotQuestionBank(questions_file_path)
+        assert questions.ids() == [3, 7] and questions.max_id == 7 and questions.enabled_count == 1
+        assert questions.get(7).choices == ["Wrong", "Also wrong"] and not questions.is_enabled(7)
+        
+        questions.set_enabled(3, False)
+        questions.append(Question(8, "Größte Stadt", "Berlin"))
+        questions.save()
+        questions.close()
+        questions = snapshot.SnapshotQuestionBank(questions_file_path)
+        assert [(q.id, q.title, q.enabled) for q in questions] == [(3, "Capital of France", False), (7, "Quiz", False), (8, "Größte Stadt", True)]
+        questions.close()
+        
+        store = StatisticsStore({1: QuestionStatistics(2, 1, 1.5), 4: QuestionStatistics()})
+        snapshot.write_statistics_snapshot(statistics_file_path, store)
+        store = snapshot.load_statistics_snapshot(statistics_file_path)
+        assert (store[1].times_answered, store[1].times_answered_correctly, store[1].weight) == (2, 1, 1.5)
+        # Rows change in place, adding a row copies the columns out of the mapping
+        store[4].update_statistics(True)
+        store.ensure([5])
+        assert (store[4].times_answered, len(store)) == (1, 3)
+        assert snapshot.load_statistics_snapshot(statistics_file_path)[4].times_answered == 0
+        
+        with open(statistics_file_path, "r+b") as file:
+            file.seek(-1, os.SEEK_END)
+            file.write(b"x")
+        try:
+            snapshot.load_statistics_snapshot(statistics_file_path)
+            assert False, "A corrupt snapshot must not load"
+        except snapshot.SnapshotError:
+            pass
+    finally:
+        shutil.rmtree(folder_path)
+
+def test_prefetch():
+    assert Prefetch(lambda: sum(range(10))).result() == 45
+    # Errors of the background load are raised by result()
+    prefetch = Prefetch(lambda: int("not a number"))
+    try:
+        prefetch.result()
+        assert False, "The load error must be raised"
+    except ValueError:
+        pass
+
+def test_grade_answer_sheets():
+    # Deltas of runs split at any point combine into the weight of answering one by one
+    rng = random.Random(3)
+    for _ in range(200):
+        outcomes = [rng.random() < 0.5 for _ in range(rng.randrange(1, 12))]
+        statistics = QuestionStatistics(weight=rng.choice([0.1, 0.5, 1.0]))
+        start_weight = statistics.weight
+        split = rng.randrange(len(outcomes) + 1)
+        first, second = batch_grading.new_delta(), batch_grading.new_delta()
+        for index, correct in enumerate(outcomes):
+            statistics.update_statistics(correct)
+            batch_grading.add_answer(first if index < split else second, correct)
+        batch_grading.merge_deltas(first, second)
+        assert abs(batch_grading.apply_delta(first, start_weight) - statistics.weight) < 1e-9
+        assert first[:2] == [statistics.times_answered, statistics.times_answered_correctly]
+    
+    folder_path = tempfile.mkdtemp()
+    file_path = os.path.join(folder_path, "answers.jsonl")
+    with open(file_path, "w") as file:
+        file.write('{"profile": "Alice", "question_id": 1, "answer": "london"}\n')
+        file.write('{"profile": "alice", "question_id": 1, "answer": "Berlin"}\n')
+        file.write('not json\n')
+        file.write('{"profile": "alice", "question_id": 1, "answer": " paris "}\n')
+        file.write('{"profile": "bob", "question_id": 2, "answer": "blue"}\n')
+        file.write('{"profile": "bob", "question_id": 99, "answer": "blue"}\n')
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    
+    try:
+        questions = QuestionBank([Question(1, "Capital of France?", "Paris"), Question(2, "Color of the sky?", "Blue")])
+        repository.save_questions(questions)
+        assert repository.create_new_profile(Profile(0, "alice", {})) is True
+        
+        # Small chunks spread the answers of one question over several workers
+        report = batch_grading.grade_answer_sheets(repository, questions, file_path, workers=2, chunk_size=2)
+        assert (report.graded, report.correct, report.invalid, report.unknown) == (4, 2, 1, 1)
+        assert report.profiles == 2 and report.created_profiles == 1
+        
+        alice = repository.load_profile_with_statistics("alice").get_statistics_for_question(1)
+        assert (alice.times_answered, alice.times_answered_correctly) == (3, 1)
+        assert abs(alice.weight - 0.8) < 1e-9
+        bob = repository.load_profile_with_statistics("bob")
+        assert bob.id == 1
+        assert bob.get_statistics_for_question(2).times_answered_correctly == 1
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+
+def test_answer_matcher():
+    assert answer_matcher.normalize_answer("  São   PAULO! ") == "sao paulo"
+    assert answer_matcher.normalize_answer("«Straße»") == "strasse"
+    assert answer_matcher.normalize_answer("(Don't) stop.") == "dont stop"
+    assert answer_matcher.normalize_answer("-3.14") == "-3.14"
+    
+    matcher = answer_matcher.AnswerMatcher.for_question(Question(1, "Organelle", "Mitochondria", aliases=["Powerhouse of the cell"]))
+    assert all(matcher.matches(answer) for answer in ["mitochondria.", "MITOCHONDRIA", "mitocondria", "mitochodnria", "mitocohndira", "powerhouse of the cel"])
+    assert not any(matcher.matches(answer) for answer in ["mtcondria", "cell", ""])
+    # Short answers, answers with digits and quiz answers accept no typos
+    assert question_helper.is_correct_answer(Question(2, "Capital of France", "Paris"), "pariss")
+    assert not question_helper.is_correct_answer(Question(3, "Animal", "Cat"), "cap")
+    assert not question_helper.is_correct_answer(Question(4, "Year", "Year 1945"), "year 1946")
+    assert not question_helper.is_correct_answer(Question(5, "Quiz", "Pentagon", choices=["Hexagon", "Octagon"]), "pentagn")
+    
+    # The banded distance agrees with the full optimal string alignment table
+    def distance(first, second):
+        table = [[max(row, column) if not row or not column else 0 for column in range(len(second) + 1)] for row in range(len(first) + 1)]
+        for row in range(1, len(first) + 1):
+            for column in range(1, len(second) + 1):
+                table[row][column] = min(table[row - 1][column] + 1, table[row][column - 1] + 1,
+                                         table[row - 1][column - 1] + (first[row - 1] != second[column - 1]))
+                if row > 1 and column > 1 and first[row - 1] == second[column - 2] and first[row - 2] == second[column - 1]:
+                    table[row][column] = min(table[row][column], table[row - 2][column - 2] + 1)
+        return table[-1][-1]
+    
+    # Larger alphabets reach the check of the distinct characters
+    rng = random.Random(22)
+    for _ in range(2000):
+        alphabet = rng.choice(["abc", "abcdef"])
+        first = "".join(rng.choices(alphabet, k=rng.randint(0, 7)))
+        second = "".join(rng.choices(alphabet, k=rng.randint(0, 7)))
+        max_distance = rng.randint(0, 3)
+        assert answer_matcher.within_distance(first, second, max_distance) == (distance(first, second) <= max_distance)
+    
+    # Aliases are stored by every storage, questions files without the aliases column are upgraded in place
+    file_path = csv_helper.QUESTIONS_FILE_PATH
+    with open(file_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "answer", "enabled", "choices"])
+        writer.writerow([1, "Capital of France", "Paris", "True", ""])
+        writer.writerow([2, "Quiz", "a", "False", "b|c"])
+    try:
+        questions = csv_helper.load_question_bank()
+        assert [(q.id, q.enabled, q.choices, q.aliases) for q in questions] == [(1, True, [], []), (2, False, ["b", "c"], [])]
+        with open(file_path) as file:
+            assert next(csv.reader(file)) == ["id", "title", "answer", "enabled", "choices", "aliases", "tags"]
+        csv_helper.append_questions([Question(3, "Cell organelle", "Mitochondria", aliases=["Mitochondrion", "Powerhouse"])])
+        assert csv_helper.load_question_bank().get(3).aliases == ["Mitochondrion", "Powerhouse"]
+    finally:
+        os.remove(file_path)
+    
+    folder_path = tempfile.mkdtemp()
+    question = Question(3, "Cell organelle", "Mitochondria", aliases=["Mitochondrion", "Powerhouse"])
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    try:
+        snapshot.write_questions_snapshot(os.path.join(folder_path, "questions.snapshot"), [question])
+        snapshot_questions = snapshot.SnapshotQuestionBank(os.path.join(folder_path, "questions.snapshot"))
+        assert snapshot_questions.get(3).aliases == question.aliases
+        assert snapshot_questions.answer_matcher(3).matches("mitochondrion")
+        snapshot_questions.close()
+        repository.save_questions([question])
+        assert repository.load_questions().get(3).aliases == question.aliases
+        assert import_helper.question_from_row(0, {"title": "t", "answer": "a", "aliases": " b | |c"}).aliases == ["b", "c"]
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+
+def test_paper_generator():
+    # Every third question is disabled
+    questions = QuestionBank(Question(i, f"Question {i}", str(i), enabled=i % 3 != 0) for i in range(60))
+    order = questions.ids()
+    rng = random.Random(23)
+    for k in [1, 5, 39, 40]:
+        drawn = question_helper.sample_enabled_ids(questions, k, rng)
+        assert len(set(drawn)) == k and all(questions.is_enabled(question_id) for question_id in drawn)
+    counts = {}
+    for _ in range(4000):
+        question_id = question_helper.sample_enabled_ids(questions, 1, rng)[0]
+        counts[question_id] = counts.get(question_id, 0) + 1
+    assert len(counts) == 40 and min(counts.values()) > 50
+    session = engine.create_test_session(Profile(0, "default", {}), questions, 10, rng)
+    assert all(questions.is_enabled(question_id) for question_id in session.question_ids)
+    assert questions.ids() == order
+    
+    papers = paper_generator.generate_papers(questions, 30, 5, seed=7, workers=2)
+    assert [paper.number for paper in papers] == list(range(1, 31))
+    assert len({frozenset(paper.question_ids) for paper in papers}) == 30
+    assert all(questions.is_enabled(question_id) for paper in papers for question_id in paper.question_ids)
+    assert [paper.question_ids for paper in paper_generator.generate_papers(questions, 30, 5, seed=7, workers=1)] == [paper.question_ids for paper in papers]
+    try:
+        paper_generator.generate_papers(questions, 41, 1, seed=7, workers=1)
+        assert False, "Only 40 different papers of one question exist"
+    except engine.SessionError:
+        pass
+    
+    # Questions 1 and 2 are hard, 4 and 5 easy, the other enabled ones were never answered
+    aggregates = QuestionAggregates()
+    for question_id, correct in [(1, 0), (2, 1), (4, 5), (5, 4)]:
+        aggregates.add(question_id, 5, correct, 1.0)
+    strata = paper_generator.build_strata(questions, aggregates)
+    assert strata["hard"] == [1, 2] and strata["easy"] == [4, 5] and len(strata["unanswered"]) == 36
+    assert paper_generator.stratum_quotas(strata, 20) == {"hard": 1, "easy": 1, "unanswered": 18}
+    papers = paper_generator.generate_papers(questions, 4, 20, seed=1, aggregates=aggregates, workers=1)
+    assert all(len(set(paper.question_ids) & {1, 2}) == 1 and len(set(paper.question_ids) & {4, 5}) == 1 for paper in papers)
+    
+    folder_path = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(folder_path, "papers.jsonl")
+        paper_generator.write_papers(questions, papers, file_path)
+        with open(file_path) as file:
+            written = [json.loads(line) for line in file]
+        assert [[entry["question_id"] for entry in paper["questions"]] for paper in written] == [paper.question_ids for paper in papers]
+        assert written[0]["seed"] == papers[0].seed and written[0]["questions"][0]["choices"] is None
+    finally:
+        shutil.rmtree(folder_path)
+
+def test_weight_policy():
+    day = 86400.0
+    policy = create_weight_policy(10)
+    assert policy.effective_weight(0.2, 0.0, 100 * day) == 0.2
+    assert policy.effective_weight(0.2, 5 * day, 5 * day) == 0.2
+    assert abs(policy.effective_weight(0.2, 5 * day, 15 * day) - 0.6) < 1e-9
+    assert type(create_weight_policy(0)) is WeightPolicy
+    
+    # Question 1 was answered wrong 10 days ago, question 2 right now, question 3 never
+    questions = QuestionBank([Question(question_id, "Title", "Answer") for question_id in (1, 2, 3)])
+    profile = Profile(1, "decay", {1: QuestionStatistics(1, 0, 0.2, 10 * day), 2: QuestionStatistics(1, 0, 0.2, 20 * day)})
+    profile.init_statistics(questions, policy)
+    random.seed(24)
+    counts = {question_id: 0 for question_id in (1, 2, 3)}
+    for question_id in profile.sample_questions(6000, now=20 * day):
+        counts[question_id] += 1
+    # Expected shares 0.6, 0.2 and 1.0 of 1.8
+    assert abs(counts[1] / 6000 - 1 / 3) < 0.03 and abs(counts[2] / 6000 - 1 / 9) < 0.03
+    assert len(question_helper.get_random_questions(profile, questions, 3, now=20 * day)) == 3
+    
+    # Answering keeps the decayed weight
+    profile.update_statistics(1, True, now=20 * day)
+    statistics = profile.get_statistics_for_question(1)
+    assert abs(statistics.weight - 0.8) < 1e-9 and statistics.last_answered == 20 * day
+    
+    # Bounds follow the decay for a part of the half life, so questions of low weight are rarely rejected
+    now = time.time()
+    bank = QuestionBank([Question(question_id, "Title", "Answer") for question_id in range(100)])
+    profile = Profile(2, "low", {question_id: QuestionStatistics(5, 5, QuestionStatistics.MIN_WEIGHT, now) for question_id in range(100)})
+    profile.init_statistics(bank, policy)
+    sample = profile.sampler.sample
+    draws = []
+    profile.sampler.sample = lambda k=1: draws.append(k) or sample(k)
+    profile.sample_questions(1000, now=now)
+    assert len(draws) < 1000 / 0.8
+    
+    # Bounds are set again once they expire
+    later = now + policy.bound_lifetime + day
+    profile.sample_questions(1, now=later)
+    assert profile.bounds_until == later + policy.bound_lifetime
+    bound = profile.sampler.get_weight(1)
+    assert policy.effective_weight(QuestionStatistics.MIN_WEIGHT, now, later) < bound
+    assert abs(bound - policy.effective_weight(QuestionStatistics.MIN_WEIGHT, now, profile.bounds_until)) < 1e-9
+    
+    folder_path = tempfile.mkdtemp()
+    original_path = csv_helper.QUESTIONS_STATISTICS_DIR_PATH
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = folder_path
+    try:
+        # Statistics files of earlier versions have no last_answered column
+        with open(csv_helper.get_profile_statistics_file_path(4), "w") as file:
+            writer = csv.DictWriter(file, csv_helper.LEGACY_STATISTICS_HEADERS[0])
+            writer.writeheader()
+            writer.writerow({"profile_id": 4, "question_id": 1, "times_answered": 3, "times_answered_correctly": 2, "weight": 0.5})
+        loaded = csv_helper.load_profile_statistics(Profile(4, "legacy", {}))
+        statistics = loaded.get_statistics_for_question(1)
+        assert (statistics.times_answered, statistics.weight, statistics.last_answered) == (3, 0.5, 0.0)
+        loaded.init_statistics(questions)
+        loaded.update_statistics(1, False, now=30 * day)
+        csv_helper.save_question_statistics(loaded)
+        csv_helper.close_statistics_journal(loaded)
+        assert csv_helper.load_profile_statistics(Profile(4, "legacy", {})).get_statistics_for_question(1).last_answered == 30 * day
+    finally:
+        csv_helper.QUESTIONS_STATISTICS_DIR_PATH = original_path
+        shutil.rmtree(folder_path)
+
+def test_question_tags():
+    # Even questions are about networking, every third one is in chapter 3
+    questions = QuestionBank(
+        Question(i, f"Question {i}", str(i), tags=(["Networking"] if i % 2 == 0 else []) + (["chapter  3"] if i % 3 == 0 else []))
+        for i in range(30)
+    )
+    assert questions.tags() == ["chapter 3", "networking"]
+    assert questions.tagged_ids("Chapter 3") == [0, 3, 6, 9, 12, 15, 18, 21, 24, 27]
+    assert questions.tagged_ids("history") == [] and questions.tag_enabled_count("history") == 0
+    questions.append(Question(30, "Question 30", "30", tags=["networking"]))
+    assert len(questions.tagged_ids("networking")) == 16 and questions.tag_enabled_count("networking") == 16
+    
+    changes = []
+    questions.on_change = lambda: changes.append(True)
+    assert questions.set_tag_enabled("chapter 3", False) == [0, 3, 6, 9, 12, 15, 18, 21, 24, 27]
+    assert len(changes) == 1 and questions.enabled_count == 21
+    assert questions.tag_enabled_count("networking") == 11 and questions.tag_enabled_count("chapter 3") == 0
+    assert questions.set_tag_enabled("chapter 3", False) == [] and len(changes) == 1
+    
+    profile = Profile(1, "tags", {})
+    profile.init_statistics(questions)
+    drawn = {q.id for q in question_helper.get_random_questions(profile, questions, 500, tag="networking")}
+    assert drawn == set(questions.tagged_ids("networking")) - set(questions.tagged_ids("chapter 3"))
+    changed_ids = questions.set_tag_enabled("chapter 3", True)
+    profile.set_questions_enabled(changed_ids, True)
+    drawn = {q.id for q in question_helper.get_random_questions(profile, questions, 500, tag="networking")}
+    assert drawn == set(questions.tagged_ids("networking"))
+    
+    session = engine.create_test_session(profile, questions, 3, random.Random(25), tag="chapter 3")
+    assert len(session.question_ids) == 3 and all(question_id % 3 == 0 for question_id in session.question_ids)
+    try:
+        engine.create_practice_session(profile, questions, tag="history")
+        assert False, "A tag without questions can not be practiced"
+    except engine.SessionError:
+        pass
+    
+    # Tags are stored by every storage, questions files with aliases but without tags are upgraded in place
+    file_path = csv_helper.QUESTIONS_FILE_PATH
+    with open(file_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "answer", "enabled", "choices", "aliases"])
+        writer.writerow([1, "Capital of France", "Paris", "True", "", "Paris city"])
+    try:
+        assert [(q.aliases, q.tags) for q in csv_helper.load_question_bank()] == [(["Paris city"], [])]
+        csv_helper.append_questions([Question(2, "Port of HTTPS", "443", tags=["networking", "ports"])])
+        assert csv_helper.load_question_bank(lazy=True).tagged_ids("ports") == [2]
+    finally:
+        os.remove(file_path)
+    
+    folder_path = tempfile.mkdtemp()
+    question = Question(3, "Port of SSH", "22", tags=["networking", "ports"])
+    repository = SqliteRepository(os.path.join(folder_path, "quizly.db"))
+    try:
+        snapshot.write_questions_snapshot(os.path.join(folder_path, "questions.snapshot"), [Question(1, "Title", "Answer"), question])
+        snapshot_questions = snapshot.SnapshotQuestionBank(os.path.join(folder_path, "questions.snapshot"))
+        assert list(snapshot_questions.question_tags()) == [(1, []), (3, ["networking", "ports"])]
+        assert snapshot_questions.tagged_ids("ports") == [3] and snapshot_questions.get(3).tags == question.tags
+        snapshot_questions.close()
+        repository.save_questions([question])
+        assert repository.load_questions().get(3).tags == question.tags
+        assert import_helper.question_from_row(0, {"title": "t", "answer": "a", "tags": " Ports | |ports|SSH"}).tags == ["ports", "ssh"]
+    finally:
+        repository.close()
+        shutil.rmtree(folder_path)
+
+def test_snapshot_conversion():
+    # CSV files -> snapshots -> CSV files, with the CSV files removed in between
+    folder_path = tempfile.mkdtemp()
+    names = ["QUESTIONS_FILE_PATH", "QUESTIONS_SNAPSHOT_FILE_PATH", "QUESTIONS_STATISTICS_DIR_PATH", "PROFILES_FILE_PATH"]
+    original_paths = [getattr(csv_helper, name) for name in names]
+    csv_helper.QUESTIONS_FILE_PATH = os.path.join(folder_path, "questions.csv")
+    csv_helper.QUESTIONS_SNAPSHOT_FILE_PATH = os.path.join(folder_path, "questions.snapshot")
+    csv_helper.QUESTIONS_STATISTICS_DIR_PATH = os.path.join(folder_path, "statistics")
+    csv_helper.PROFILES_FILE_PATH = os.path.join(folder_path, "profiles.csv")
+    try:
+        questions = QuestionBank([Question(1, "Capital of France", "Paris", tags=["geography"]), Question(2, "Quiz", "a", choices=["b", "c"])])
+        csv_helper.save_questions(questions)
+        csv_helper.create_new_profile(Profile(0, "default", {}))
+        profile = csv_helper.load_profile_statistics(Profile(0, "default", {}))
+        profile.init_statistics(questions)
+        profile.update_statistics(1, True, now=100.0)
+        csv_helper.save_question_statistics(profile)
+        csv_helper.close_statistics_journal(profile)
+        
+        csv_to_snapshot.convert_to_snapshots()
+        os.remove(csv_helper.QUESTIONS_FILE_PATH)
+        os.remove(csv_helper.get_profile_statistics_file_path(0))
+        csv_to_snapshot.convert_to_csv()
+        
+        loaded = csv_helper.load_questions()
+        assert [(q.id, q.title, q.choices, q.tags) for q in loaded] == [(1, "Capital of France", [], ["geography"]), (2, "Quiz", ["b", "c"], [])]
+        profile = csv_helper.load_profile_statistics(Profile(0, "default", {}))
+        statistics = profile.get_statistics_for_question(1)
+        assert (statistics.times_answered, statistics.times_answered_correctly, statistics.last_answered) == (1, 1, 100.0)
+        csv_helper.close_statistics_journal(profile)
+    finally:
+        for name, path in zip(names, original_paths):
+            setattr(csv_helper, name, path)
+        shutil.rmtree(folder_path)
+
 if __name__ == "__main__":
     main()
     
-    
\ No newline at end of file